@@ -0,0 +1,167 @@
+"""
+In-process response cache for the irrigation advisor.
+Sensor readings barely change between polls, so inputs are quantized into
+buckets and recommendations are served from an LRU+TTL cache. Buckets are
+split at the model's decision thresholds, so readings that get different
+advice never share an entry. Concurrent requests for the same bucket share a
+single computation (single-flight).
+"""
+
+import asyncio
+import bisect
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+try:
+    from .models.irrigation_model import DRY_BELOW, HEAVY_RAIN_ABOVE, HOT_ABOVE, WET_FROM
+except ImportError:
+    from models.irrigation_model import DRY_BELOW, HEAVY_RAIN_ABOVE, HOT_ABOVE, WET_FROM
+
+# Bucket width per numeric input; readings inside one bucket share a cache entry
+DEFAULT_BUCKETS = {
+    "soil_moisture": 1.0,
+    "temperature": 0.5,
+    "humidity": 2.0,
+    "rainfall": 1.0
+}
+
+# Thresholds predict_irrigation compares each input against, and whether it tests
+# value > edge (True) or value < edge (False)
+DECISION_EDGES = {
+    "soil_moisture": ((DRY_BELOW, WET_FROM), False),
+    "temperature": ((HOT_ABOVE,), True),
+    "rainfall": ((HEAVY_RAIN_ABOVE,), True)
+}
+
+def parse_buckets(spec: str) -> Dict[str, float]:
+    """
+    Parse a bucket spec such as "soil_moisture=2,temperature=0.25" into
+    bucket widths, falling back to DEFAULT_BUCKETS for unlisted fields.
+    """
+    buckets = dict(DEFAULT_BUCKETS)
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, width = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_BUCKETS:
+            raise ValueError(f"Unknown cache bucket field: {name}")
+        buckets[name] = float(width)
+        if buckets[name] <= 0:
+            raise ValueError(f"Bucket width for {name} must be positive")
+    return buckets
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # Marks a failure as retrieved when every caller waiting on it was cancelled
+    if not task.cancelled():
+        task.exception()
+
+class AdvisorCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0,
+                 buckets: Optional[Dict[str, float]] = None,
+                 edges: Optional[Dict[str, tuple]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.buckets = dict(DEFAULT_BUCKETS if buckets is None else buckets)
+        self.edges = dict(DECISION_EDGES if edges is None else edges)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _bucket(self, field: str, value: Optional[float]) -> tuple:
+        # (side of each decision edge, floor bucket): a bucket spanning an edge is split in two
+        value = value or 0.0
+        edges, strictly_above = self.edges.get(field, ((), False))
+        band = (bisect.bisect_left if strictly_above else bisect.bisect_right)(edges, value)
+        return band, math.floor(value / self.buckets[field])
+
+    def make_key(self, soil_moisture: float, temperature: float, humidity: float,
+                 crop_type: str, rainfall: Optional[float] = 0.0) -> tuple:
+        return (
+            crop_type,
+            self._bucket("soil_moisture", soil_moisture),
+            self._bucket("temperature", temperature),
+            self._bucket("humidity", humidity),
+            self._bucket("rainfall", rainfall),
+        )
+
+    def get(self, key: Hashable):
+        """
+        Return the cached value for key, or None on a miss or expired entry.
+        Does not update the hit/miss counters.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value) -> None:
+        self._entries[key] = (value, self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable]):
+        """
+        Return the cached value for key, or await compute() to produce it.
+        While a computation for key is running, other callers wait on it
+        instead of starting their own; failures are not cached. The
+        computation finishes even if the callers waiting on it are cancelled.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # Computed in its own task, so cancelling the caller that started it
+        # does not cancel the callers coalesced onto it
+        task = asyncio.ensure_future(self._compute(key, compute))
+        task.add_done_callback(_retrieve_exception)
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable]):
+        try:
+            value = await compute()
+            self.put(key, value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "inflight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
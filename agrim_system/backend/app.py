@@ -1,10 +1,40 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+import os
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import FastAPI, HTTPException, Request, Response
+from pydantic import BaseModel, Field, model_validator
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-from models.irrigation_model import predict_irrigation
+from typing import Annotated, List, Optional
+from models.irrigation_model import predict_irrigation, predict_irrigation_batch
+from advisor_cache import AdvisorCache, parse_buckets
+from streaming import RequestBodyStreamingResponse, stream_recommendations
+from inference_pool import PoolSaturated, pool_from_env
+import metrics
 
-app = FastAPI()
+# Model calls run here so CPU-bound inference never blocks the event loop
+inference_pool = pool_from_env()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inference_pool.start()
+    yield
+    inference_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Quantized response cache in front of the single-field advisor
+advisor_cache = AdvisorCache(
+    maxsize=int(os.getenv("ADVISOR_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ADVISOR_CACHE_TTL_SECONDS", "300")),
+    buckets=parse_buckets(os.getenv("ADVISOR_CACHE_BUCKETS", ""))
+)
+metrics.registry.register_collector(lambda: metrics.stats_lines(
+    "agrim_advisor_cache", "Irrigation advisor cache statistics", advisor_cache.stats(),
+    cumulative=("hits", "misses", "coalesced", "evictions", "expirations")))
+metrics.registry.register_collector(lambda: metrics.stats_lines(
+    "agrim_inference_pool", "Inference worker pool statistics", inference_pool.stats(),
+    cumulative=("completed", "failed", "rejected")))
 
 # CORS setup for frontend-backend interaction
 origins = [
@@ -28,6 +58,47 @@ class IrrigationInput(BaseModel):
     crop_type: str = Field(..., description="Crop type")
     rainfall: Optional[float] = Field(0.0, description="Recent or predicted rainfall in mm")
 
+Percentage = Annotated[float, Field(ge=0, le=100)]
+
+class IrrigationBatchInput(BaseModel):
+    """
+    A batch of irrigation inputs, either as a list of records in `items`
+    or as equal-length columnar arrays (one list per IrrigationInput field).
+    """
+    items: Optional[List[IrrigationInput]] = None
+    soil_moisture: Optional[List[Percentage]] = None
+    temperature: Optional[List[float]] = None
+    humidity: Optional[List[Percentage]] = None
+    crop_type: Optional[List[str]] = None
+    rainfall: Optional[List[Optional[float]]] = None
+
+    @model_validator(mode="after")
+    def check_layout(self):
+        columns = [self.soil_moisture, self.temperature, self.humidity, self.crop_type]
+        if self.items is not None:
+            if any(c is not None for c in columns) or self.rainfall is not None:
+                raise ValueError("Provide either 'items' or columnar arrays, not both")
+            return self
+        if any(c is None for c in columns):
+            raise ValueError("Columnar input requires soil_moisture, temperature, humidity and crop_type")
+        lengths = {len(c) for c in columns}
+        if self.rainfall is not None:
+            lengths.add(len(self.rainfall))
+        if len(lengths) != 1:
+            raise ValueError("Columnar arrays must all have the same length")
+        return self
+
+    def columns(self):
+        if self.items is not None:
+            return (
+                [item.soil_moisture for item in self.items],
+                [item.temperature for item in self.items],
+                [item.humidity for item in self.items],
+                [item.crop_type for item in self.items],
+                [item.rainfall for item in self.items],
+            )
+        return self.soil_moisture, self.temperature, self.humidity, self.crop_type, self.rainfall
+
 class IrrigationOutput(BaseModel):
     recommended_volume: float
     irrigation_timing: str
@@ -35,16 +106,84 @@ class IrrigationOutput(BaseModel):
     irrigation_status: str
     status_color: str
 
+class IrrigationBatchOutput(BaseModel):
+    recommended_volume: List[float]
+    irrigation_timing: List[str]
+    irrigation_duration_hours: List[float]
+    irrigation_status: List[str]
+    status_color: List[str]
+
 @app.post("/api/irrigation_advisor", response_model=IrrigationOutput)
 async def irrigation_advisor(input_data: IrrigationInput):
+    async def compute():
+        with metrics.stage("model"):
+            return await inference_pool.run(partial(
+                predict_irrigation,
+                soil_moisture=input_data.soil_moisture,
+                temperature=input_data.temperature,
+                humidity=input_data.humidity,
+                crop_type=input_data.crop_type,
+                rainfall=input_data.rainfall
+            ))
+
     try:
-        result = predict_irrigation(
+        key = advisor_cache.make_key(
             soil_moisture=input_data.soil_moisture,
             temperature=input_data.temperature,
             humidity=input_data.humidity,
             crop_type=input_data.crop_type,
             rainfall=input_data.rainfall
         )
-        return result
+        return await advisor_cache.get_or_compute(key, compute)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/irrigation_advisor/cache_stats")
+async def irrigation_advisor_cache_stats():
+    return advisor_cache.stats()
+
+async def timed_predict_batch(wait=False, **columns):
+    with metrics.stage("model_batch"):
+        return await inference_pool.run(partial(predict_irrigation_batch, **columns), wait=wait)
+
+@app.post("/api/irrigation_advisor/batch", response_model=IrrigationBatchOutput)
+async def irrigation_advisor_batch(input_data: IrrigationBatchInput):
+    try:
+        soil_moisture, temperature, humidity, crop_type, rainfall = input_data.columns()
+        if rainfall is not None:
+            rainfall = [0.0 if r is None else r for r in rainfall]
+        result = await timed_predict_batch(
+            soil_moisture=soil_moisture,
+            temperature=temperature,
+            humidity=humidity,
+            crop_type=crop_type,
+            rainfall=rainfall
+        )
+        with metrics.stage("serialize"):
+            return {key: values.tolist() for key, values in result.items()}
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/irrigation_advisor/stream")
+async def irrigation_advisor_stream(request: Request, chunk_size: int = 1000):
+    """
+    Stream recommendations for an NDJSON or CSV upload (selected by Content-Type)
+    back as NDJSON, one line per input row, while the body is still arriving.
+    Chunks wait for a free inference slot rather than failing the stream.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = "csv" if "csv" in content_type else "ndjson"
+    if not 1 <= chunk_size <= 100000:
+        raise HTTPException(status_code=400, detail="chunk_size must be between 1 and 100000")
+    return RequestBodyStreamingResponse(
+        stream_recommendations(request.stream(), fmt, IrrigationInput, partial(timed_predict_batch, wait=True), chunk_size),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
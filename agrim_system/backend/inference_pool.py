@@ -0,0 +1,155 @@
+"""
+Executor layer that keeps model inference off the FastAPI event loop.
+Calls are dispatched to a thread pool (for models that release the GIL, such
+as TensorFlow) or to a process pool whose workers preload their models once at
+startup. A bounded number of slots caps queued work so overload turns into
+fast 503s instead of an ever-growing backlog.
+"""
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+# Models loaded in this process (the main process for thread pools, each worker for process pools)
+_MODELS: Dict[str, object] = {}
+
+class PoolSaturated(RuntimeError):
+    """Raised when no queue slot frees up within the configured timeout."""
+
+def parse_preload(spec: str) -> Dict[str, str]:
+    """
+    Parse "name=package.module:factory,..." into a name -> factory path map.
+    Each factory is called without arguments in every worker to build a model.
+    """
+    preload = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, target = part.partition("=")
+        if not target or ":" not in target:
+            raise ValueError(f"Invalid preload entry: {part}")
+        preload[name.strip()] = target.strip()
+    return preload
+
+def _load_models(preload: Dict[str, str]) -> None:
+    for name, target in preload.items():
+        module_name, _, attr = target.partition(":")
+        factory = getattr(importlib.import_module(module_name), attr)
+        _MODELS[name] = factory()
+
+def get_model(name: str):
+    return _MODELS[name]
+
+def _call_model(name: str, method: str, args: tuple):
+    return getattr(_MODELS[name], method)(*args)
+
+class InferencePool:
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None,
+                 max_queue: int = 64, queue_timeout: float = 1.0,
+                 preload: Optional[Dict[str, str]] = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.preload = dict(preload or {})
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "thread":
+                # Threads share one copy of each model
+                _load_models(self.preload)
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="inference")
+            else:
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_load_models,
+                    initargs=(self.preload,)
+                )
+        return self._executor
+
+    def start(self) -> None:
+        """Create the executor (and load models) eagerly instead of on first use."""
+        self._get_executor()
+
+    async def run(self, fn: Callable, *args, wait: bool = False):
+        """
+        Run fn(*args) in the pool and await the result. Raises PoolSaturated when
+        all worker and queue slots stay taken for queue_timeout seconds, unless
+        wait is set, in which case the caller blocks until a slot frees up.
+        For process pools fn and args must be picklable.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        if wait:
+            await self._slots.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise PoolSaturated("Inference queue is full") from None
+
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._finish(None)
+            raise
+        # The slot is held until the job itself is done, not just until the caller
+        # stops waiting: a cancelled caller leaves a running job behind
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._finish, f))
+        return await asyncio.wrap_future(future)
+
+    def _finish(self, future: Optional[Future]) -> None:
+        self.pending -= 1
+        self._slots.release()
+        if future is None or future.cancelled():
+            return
+        if future.exception() is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    async def run_model(self, name: str, method: str, *args, wait: bool = False):
+        """Call method on the preloaded model `name` inside a worker."""
+        return await self.run(_call_model, name, method, args, wait=wait)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+def pool_from_env() -> InferencePool:
+    """
+    Build a pool from INFERENCE_EXECUTOR (thread|process), INFERENCE_WORKERS,
+    INFERENCE_QUEUE_SIZE, INFERENCE_QUEUE_TIMEOUT_SECONDS and INFERENCE_PRELOAD.
+    """
+    workers = os.getenv("INFERENCE_WORKERS")
+    return InferencePool(
+        kind=os.getenv("INFERENCE_EXECUTOR", "thread"),
+        max_workers=int(workers) if workers else None,
+        max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "64")),
+        queue_timeout=float(os.getenv("INFERENCE_QUEUE_TIMEOUT_SECONDS", "1.0")),
+        preload=parse_preload(os.getenv("INFERENCE_PRELOAD", ""))
+    )
@@ -0,0 +1,251 @@
+"""
+Lightweight in-process metrics for the irrigation backend.
+Counters, gauges and fixed-bucket histograms are kept in plain dicts behind a
+lock and rendered in the Prometheus text exposition format on demand, so the
+per-request cost is a few dict updates and one bisect.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from starlette.routing import Match
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow batches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """
+        Register a callable that returns extra exposition lines at scrape time,
+        for values that are cheaper to read on demand than to track per request.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    "agrim_http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+IN_FLIGHT = registry.gauge(
+    "agrim_http_requests_in_flight", "HTTP requests currently being handled", ("route",))
+LATENCY = registry.histogram(
+    "agrim_http_request_duration_seconds", "HTTP request latency including body streaming", ("method", "route"))
+STAGE_LATENCY = registry.histogram(
+    "agrim_stage_duration_seconds", "Time spent in individual request stages", ("stage",))
+
+def stage(name: str):
+    """
+    Time a request stage, e.g. `with stage("model"): predict_irrigation(...)`.
+    """
+    return STAGE_LATENCY.time(name)
+
+def _dict_lines(kind: str, name: str, documentation: str, values: Dict[str, float], label: str) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for key, value in values.items():
+        lines.append(f'{name}{{{label}="{_escape(key)}"}} {_format_value(value)}')
+    return lines
+
+def gauge_lines(name: str, documentation: str, values: Dict[str, float], label: str) -> List[str]:
+    """
+    Render a labelled gauge from a dict, for use in registry collectors.
+    """
+    return _dict_lines("gauge", name, documentation, values, label)
+
+def counter_lines(name: str, documentation: str, values: Dict[str, float], label: str) -> List[str]:
+    """
+    Render a labelled counter from a dict of cumulative values, for use in
+    registry collectors. name must end in _total.
+    """
+    if not name.endswith("_total"):
+        raise ValueError(f"Counter name {name!r} must end in _total")
+    return _dict_lines("counter", name, documentation, values, label)
+
+def stats_lines(name: str, documentation: str, stats: Dict[str, float], cumulative: Sequence[str]) -> List[str]:
+    """
+    Render a component's stats() dict for a registry collector: the keys in
+    cumulative (e.g. hits) become the counter {name}_events_total labelled
+    by event, and the rest the gauge name labelled by stat.
+    """
+    lines = gauge_lines(name, documentation, {k: v for k, v in stats.items() if k not in cumulative}, "stat")
+    events = {k: stats[k] for k in cumulative if k in stats}
+    if events:
+        lines.extend(counter_lines(f"{name}_events_total", f"{documentation}, counted since start", events, "event"))
+    return lines
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def _match_route(scope) -> str:
+    # The router only sets scope["route"] once the request is under way, so the
+    # in-flight gauge matches the path template against the app's routes itself
+    partial = None
+    for route in getattr(getattr(scope.get("app"), "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route request counts, latency and
+    requests in flight. Routes are labelled by their path template rather
+    than the raw URL to keep label cardinality bounded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        in_flight_route = _match_route(scope)
+        IN_FLIGHT.inc(in_flight_route)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec(in_flight_route)
+            # The route is only known once the router has matched it
+            route = _route_label(scope)
+            method = scope.get("method", "")
+            REQUESTS.inc(method, route, str(status[0]))
+            LATENCY.observe(time.perf_counter() - start, method, route)
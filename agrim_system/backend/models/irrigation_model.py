@@ -1,4 +1,22 @@
-from typing import Dict
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# Crop adjustment factors applied to the recommended volume (example factors)
+CROP_FACTORS = {
+    "Wheat": 1.0,
+    "Tomato": 1.2,
+    "Pepper": 1.1,
+    "Corn": 1.3,
+    "Rice": 1.5
+}
+
+# Decision thresholds: dry below DRY_BELOW, wet from WET_FROM, halved volume above
+# HEAVY_RAIN_ABOVE mm of rain and morning irrigation above HOT_ABOVE °C
+DRY_BELOW = 30
+WET_FROM = 60
+HEAVY_RAIN_ABOVE = 10
+HOT_ABOVE = 30
 
 def predict_irrigation(soil_moisture: float, temperature: float, humidity: float, crop_type: str, rainfall: float = 0.0) -> Dict:
     """
@@ -9,29 +27,22 @@ def predict_irrigation(soil_moisture: float, temperature: float, humidity: float
     base_volume = 20.0
 
     # Adjust volume based on soil moisture
-    if soil_moisture < 30:
+    if soil_moisture < DRY_BELOW:
         volume = base_volume * 1.5
-    elif soil_moisture < 60:
+    elif soil_moisture < WET_FROM:
         volume = base_volume
     else:
         volume = base_volume * 0.5
 
     # Adjust volume based on recent rainfall
-    if rainfall > 10:
+    if rainfall > HEAVY_RAIN_ABOVE:
         volume *= 0.5
 
-    # Adjust volume based on crop type (example factors)
-    crop_factors = {
-        "Wheat": 1.0,
-        "Tomato": 1.2,
-        "Pepper": 1.1,
-        "Corn": 1.3,
-        "Rice": 1.5
-    }
-    volume *= crop_factors.get(crop_type, 1.0)
+    # Adjust volume based on crop type
+    volume *= CROP_FACTORS.get(crop_type, 1.0)
 
     # Determine irrigation timing suggestion
-    if temperature > 30:
+    if temperature > HOT_ABOVE:
         timing = "Morning"
         duration = 2.0
     else:
@@ -39,10 +50,10 @@ def predict_irrigation(soil_moisture: float, temperature: float, humidity: float
         duration = 1.5
 
     # Determine irrigation status
-    if soil_moisture < 30:
+    if soil_moisture < DRY_BELOW:
         status = "Dry"
         color = "red"
-    elif soil_moisture < 60:
+    elif soil_moisture < WET_FROM:
         status = "Optimal"
         color = "green"
     else:
@@ -56,3 +67,50 @@ def predict_irrigation(soil_moisture: float, temperature: float, humidity: float
         "irrigation_status": status,
         "status_color": color
     }
+
+
+def _crop_factor_array(crop_type: Sequence[str]) -> np.ndarray:
+    """
+    Map crop names to volume factors with one dict lookup per distinct crop.
+    """
+    crops, inverse = np.unique(np.asarray(crop_type, dtype=str), return_inverse=True)
+    factors = np.array([CROP_FACTORS.get(c, 1.0) for c in crops], dtype=np.float64)
+    return factors[inverse.reshape(-1)]
+
+def predict_irrigation_batch(soil_moisture: Sequence[float], temperature: Sequence[float],
+                             humidity: Sequence[float], crop_type: Sequence[str],
+                             rainfall: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+    """
+    Vectorized counterpart of predict_irrigation for a whole batch of fields.
+    Takes equal-length sequences and returns a dict of column arrays with the same
+    keys as the scalar result; row i matches predict_irrigation on input row i.
+    """
+    soil_moisture = np.asarray(soil_moisture, dtype=np.float64).reshape(-1)
+    temperature = np.asarray(temperature, dtype=np.float64).reshape(-1)
+    n = soil_moisture.shape[0]
+    if rainfall is None:
+        rainfall = np.zeros(n)
+    else:
+        rainfall = np.asarray(rainfall, dtype=np.float64).reshape(-1)
+    if not (temperature.shape[0] == rainfall.shape[0] == len(crop_type) == n):
+        raise ValueError("All input columns must have the same length")
+
+    base_volume = 20.0
+    dry = soil_moisture < DRY_BELOW
+    optimal = ~dry & (soil_moisture < WET_FROM)
+
+    # Same operation order as the scalar path so the floats agree bit for bit
+    volume = np.where(dry, base_volume * 1.5, np.where(optimal, base_volume, base_volume * 0.5))
+    volume = np.where(rainfall > HEAVY_RAIN_ABOVE, volume * 0.5, volume)
+    volume = volume * _crop_factor_array(crop_type)
+
+    hot = temperature > HOT_ABOVE
+    band = np.where(dry, 0, np.where(optimal, 1, 2))
+
+    return {
+        "recommended_volume": np.round(volume, 2),
+        "irrigation_timing": np.where(hot, "Morning", "Evening"),
+        "irrigation_duration_hours": np.where(hot, 2.0, 1.5),
+        "irrigation_status": np.array(["Dry", "Optimal", "Wet"])[band],
+        "status_color": np.array(["red", "green", "blue"])[band]
+    }
@@ -0,0 +1,128 @@
+"""
+Incremental NDJSON/CSV streaming for field-wide irrigation recommendations.
+Input rows are parsed from the request body as it arrives, validated, scored
+in bounded chunks with the batch predictor and written back as NDJSON, so
+memory stays flat regardless of upload size.
+"""
+
+import codecs
+import csv
+import inspect
+import json
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+from starlette.responses import StreamingResponse
+
+FIELDS = ("soil_moisture", "temperature", "humidity", "crop_type", "rainfall")
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for generators that are still reading the request body.
+    The stock response listens for disconnects on ASGI < 2.4 servers, which
+    consumes (and drops) the body messages the generator is waiting on; here a
+    disconnect surfaces through request.stream() or a failing send instead.
+    """
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Split a byte stream into text lines without buffering the whole body.
+    Yields None after the lines of each incoming chunk so callers can flush.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    async for chunk in chunks:
+        text = tail + decoder.decode(chunk)
+        lines = text.split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+        yield None
+    tail += decoder.decode(b"", final=True)
+    if tail.strip():
+        yield tail.rstrip("\r")
+
+def _parse_ndjson(line: str) -> Dict:
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("Each NDJSON line must be a JSON object")
+    return row
+
+def _csv_row(header: List[str], line: str) -> Dict:
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} CSV columns, got {len(values)}")
+    return {name: value for name, value in zip(header, values) if value != ""}
+
+def _error_message(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+async def stream_recommendations(chunks: AsyncIterable[bytes], fmt: str, row_model: type,
+                                 predict_batch: Callable, chunk_size: int = 1000) -> AsyncIterator[bytes]:
+    """
+    Turn an NDJSON or CSV byte stream of irrigation inputs into an NDJSON byte
+    stream of recommendations, one output line per input row and in input order.
+    Rows that fail to parse or validate produce {"line": n, "error": ...} instead.
+    predict_batch may be a coroutine function, e.g. one dispatching to a worker pool.
+    """
+    pending: List = []
+    header: Optional[List[str]] = None
+    line_no = 0
+
+    async def flush() -> bytes:
+        valid = [row for row in pending if isinstance(row, BaseModel)]
+        results = None
+        if valid:
+            results = predict_batch(
+                soil_moisture=[row.soil_moisture for row in valid],
+                temperature=[row.temperature for row in valid],
+                humidity=[row.humidity for row in valid],
+                crop_type=[row.crop_type for row in valid],
+                rainfall=[0.0 if row.rainfall is None else row.rainfall for row in valid]
+            )
+            if inspect.isawaitable(results):
+                results = await results
+            results = {key: values.tolist() for key, values in results.items()}
+        out = []
+        i = 0
+        for row in pending:
+            if isinstance(row, BaseModel):
+                record = {key: values[i] for key, values in results.items()}
+                i += 1
+            else:
+                record = row
+            out.append(json.dumps(record))
+        pending.clear()
+        return ("\n".join(out) + "\n").encode("utf-8")
+
+    async for line in iter_lines(chunks):
+        if line is None:
+            if pending:
+                yield await flush()
+            continue
+        line_no += 1
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            missing = set(FIELDS[:4]) - set(header)
+            if missing:
+                message = f"CSV header is missing columns: {', '.join(sorted(missing))}"
+                yield (json.dumps({"line": line_no, "error": message}) + "\n").encode("utf-8")
+                return
+            continue
+        try:
+            row = _parse_ndjson(line) if fmt == "ndjson" else _csv_row(header, line)
+            pending.append(row_model.model_validate(row))
+        except (ValueError, ValidationError) as e:
+            pending.append({"line": line_no, "error": _error_message(e)})
+        if len(pending) >= chunk_size:
+            yield await flush()
+    if pending:
+        yield await flush()
@@ -3,15 +3,32 @@ CNN and KNN models and integration for AgriML system.
 Includes CNN for image-based crop disease detection and KNN for classification tasks.
 """
 
+import json
+import os
+
+import joblib
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.preprocessing import StandardScaler
 
+try:
+    from .embedding_index import EmbeddingIndex
+except ImportError:
+    from embedding_index import EmbeddingIndex
+
+CNN_WEIGHTS_FILE = "cnn.weights.h5"
+KNN_STATE_FILE = "knn.joblib"
+KNN_INDEX_FILE = "knn_index.npz"
+MANIFEST_FILE = "manifest.json"
+
 class CNNModel:
     def __init__(self, input_shape=(64, 64, 3), num_classes=5):
+        self.input_shape = tuple(input_shape)
+        self.num_classes = num_classes
         self.model = self.build_model(input_shape, num_classes)
+        self._embedding_model = None
 
     def build_model(self, input_shape, num_classes):
         model = models.Sequential([
@@ -35,6 +52,27 @@ class CNNModel:
         preds = self.model.predict(x)
         return np.argmax(preds, axis=1)
 
+    @property
+    def embedding_dim(self):
+        return self.model.layers[-2].units
+
+    def predict_with_embeddings(self, x):
+        """
+        One forward pass returning (predicted classes, penultimate-layer
+        embeddings); the embeddings feed the KNN EmbeddingIndex.
+        """
+        if self._embedding_model is None:
+            self._embedding_model = tf.keras.Model(self.model.inputs,
+                                                   [self.model.layers[-1].output, self.model.layers[-2].output])
+        preds, embeddings = self._embedding_model.predict(x, verbose=0)
+        return np.argmax(preds, axis=1), embeddings
+
+    def save_weights(self, path):
+        self.model.save_weights(path)
+
+    def load_weights(self, path):
+        self.model.load_weights(path)
+
 class KNNModel:
     def __init__(self, n_neighbors=3):
         self.scaler = StandardScaler()
@@ -48,6 +86,70 @@ class KNNModel:
         X_scaled = self.scaler.transform(X_test)
         return self.knn.predict(X_scaled)
 
+    def save(self, path):
+        joblib.dump({"scaler": self.scaler, "knn": self.knn}, path)
+
+    def load(self, path):
+        state = joblib.load(path)
+        self.scaler = state["scaler"]
+        self.knn = state["knn"]
+
+def save_artifacts(root, version, cnn_model, knn_model):
+    """
+    Persist both models under root/version with a manifest describing them,
+    then point root/LATEST at this version. knn_model may be a KNNModel or an
+    EmbeddingIndex over CNN embeddings. Returns the version directory.
+    """
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir, exist_ok=True)
+    cnn_model.save_weights(os.path.join(version_dir, CNN_WEIGHTS_FILE))
+    manifest = {
+        "version": version,
+        "input_shape": list(cnn_model.input_shape),
+        "num_classes": cnn_model.num_classes,
+        "cnn_weights": CNN_WEIGHTS_FILE
+    }
+    if isinstance(knn_model, EmbeddingIndex):
+        knn_model.save(os.path.join(version_dir, KNN_INDEX_FILE))
+        manifest.update(knn_type="embedding_index", knn_state=KNN_INDEX_FILE, references=knn_model.ntotal)
+    else:
+        knn_model.save(os.path.join(version_dir, KNN_STATE_FILE))
+        manifest.update(knn_type="sklearn", knn_state=KNN_STATE_FILE, n_neighbors=knn_model.knn.n_neighbors)
+    with open(os.path.join(version_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    # Write-then-rename so readers never see a partial LATEST file
+    latest_tmp = os.path.join(root, "LATEST.tmp")
+    with open(latest_tmp, "w") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(root, "LATEST"))
+    return version_dir
+
+def read_manifest(root, version=None):
+    """Manifest of the given version, or of the one named in root/LATEST."""
+    if version is None:
+        with open(os.path.join(root, "LATEST")) as f:
+            version = f.read().strip()
+    with open(os.path.join(root, version, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def load_artifacts(root, version=None):
+    """
+    Load the CNN and KNN models saved by save_artifacts; the KNN model is an
+    EmbeddingIndex or a KNNModel depending on what was saved. Without an
+    explicit version the one named in root/LATEST is used.
+    Returns (cnn_model, knn_model, manifest).
+    """
+    manifest = read_manifest(root, version)
+    version_dir = os.path.join(root, manifest["version"])
+    cnn_model = CNNModel(input_shape=tuple(manifest["input_shape"]), num_classes=manifest["num_classes"])
+    cnn_model.load_weights(os.path.join(version_dir, manifest["cnn_weights"]))
+    if manifest.get("knn_type") == "embedding_index":
+        knn_model = EmbeddingIndex.load(os.path.join(version_dir, manifest["knn_state"]))
+    else:
+        knn_model = KNNModel(n_neighbors=manifest.get("n_neighbors", 3))
+        knn_model.load(os.path.join(version_dir, manifest["knn_state"]))
+    return cnn_model, knn_model, manifest
+
 def integrate_models(cnn_model, knn_model, cnn_data, knn_data):
     """
     Example integration function combining CNN and KNN predictions.
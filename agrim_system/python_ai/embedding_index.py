@@ -0,0 +1,242 @@
+"""
+Nearest-neighbour index over CNN embeddings for the KNN disease classifier.
+Vectors live in growable per-list arrays, so labelled samples can be inserted
+incrementally without refitting. With nlist=1 every query is an exact
+brute-force BLAS search; with nlist>1 the index is an inverted file (IVF):
+k-means centroids partition the vectors and each query only scans the
+nprobe closest lists, which keeps latency sub-millisecond at millions of
+references. Queries are batched: each probed list is scored against all
+queries that probe it with a single matrix product.
+"""
+
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+class _GrowableList:
+    def __init__(self, dim, capacity=1024):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.sq_norms = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def append(self, vectors, ids, sq_norms):
+        n = len(vectors)
+        if self.size + n > len(self.ids):
+            capacity = max(2 * len(self.ids), self.size + n)
+            for name in ("vectors", "ids", "sq_norms"):
+                old = getattr(self, name)
+                new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, name, new)
+        self.vectors[self.size:self.size + n] = vectors
+        self.ids[self.size:self.size + n] = ids
+        self.sq_norms[self.size:self.size + n] = sq_norms
+        self.size += n
+
+class EmbeddingIndex:
+    def __init__(self, dim, metric="cosine", nprobe=8):
+        if metric not in ("cosine", "l2"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.dim = dim
+        self.metric = metric
+        self.nprobe = nprobe
+        self.centroids = None
+        self._lists = [_GrowableList(dim)]
+        self._labels = np.empty(1024, dtype=np.int64)
+        self.ntotal = 0
+        # Changes with every add or train; the same history of changes gives the same version
+        self.version = "0"
+        self._lock = threading.Lock()
+
+    def _bump_version(self, *arrays):
+        digest = hashlib.blake2b(self.version.encode("utf-8"), digest_size=8)
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        self.version = digest.hexdigest()
+
+    def _set_centroids(self, centroids):
+        self.centroids = centroids
+        if centroids is not None:
+            # Nearest centroid by L2 is the largest c.x - |c|^2 / 2
+            self._centroid_bias = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+
+    @property
+    def nlist(self):
+        return len(self._lists)
+
+    def _prepare(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _assign(self, vectors):
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.concatenate([
+            np.argmax(vectors[start:start + 8192] @ self.centroids.T - self._centroid_bias, axis=1)
+            for start in range(0, len(vectors), 8192)] or [np.zeros(0, dtype=np.int64)])
+
+    def add(self, vectors, labels):
+        """Insert embeddings with their integer class labels; returns their ids."""
+        vectors = self._prepare(vectors)
+        labels = np.asarray(labels, dtype=np.int64).reshape(-1)
+        if len(labels) != len(vectors):
+            raise ValueError("vectors and labels must have the same length")
+        with self._lock:
+            ids = np.arange(self.ntotal, self.ntotal + len(vectors))
+            if self.ntotal + len(labels) > len(self._labels):
+                grown = np.empty(max(2 * len(self._labels), self.ntotal + len(labels)), dtype=np.int64)
+                grown[:self.ntotal] = self._labels[:self.ntotal]
+                self._labels = grown
+            self._labels[self.ntotal:self.ntotal + len(labels)] = labels
+            assignment = self._assign(vectors)
+            sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+            order = np.argsort(assignment, kind="stable")
+            list_nos, starts = np.unique(assignment[order], return_index=True)
+            for list_no, rows in zip(list_nos, np.split(order, starts[1:])):
+                self._lists[list_no].append(vectors[rows], ids[rows], sq_norms[rows])
+            self.ntotal += len(vectors)
+            self._bump_version(vectors, labels)
+        return ids
+
+    def train(self, sample, nlist, iterations=10, seed=0):
+        """
+        Fit nlist k-means centroids on sample and redistribute stored vectors
+        into the new inverted lists. nlist=1 switches back to brute force.
+        """
+        vectors, labels = self._all_vectors()
+        sample = self._prepare(sample)
+        if nlist > 1:
+            if len(sample) < nlist:
+                raise ValueError("Need at least nlist training vectors")
+            rng = np.random.default_rng(seed)
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                bias = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+                assignment = np.concatenate([
+                    np.argmax(sample[start:start + 8192] @ centroids.T - bias, axis=1)
+                    for start in range(0, len(sample), 8192)])
+                counts = np.bincount(assignment, minlength=nlist)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+        with self._lock:
+            self._set_centroids(centroids if nlist > 1 else None)
+            self._bump_version(centroids if nlist > 1 else np.empty(0))
+            self._lists = [_GrowableList(self.dim, capacity=max(16, 2 * len(vectors) // max(nlist, 1)))
+                           for _ in range(max(nlist, 1))]
+            self.ntotal = 0
+        if len(vectors):
+            self.add(vectors, labels)
+
+    def _all_vectors(self):
+        with self._lock:
+            vectors = np.empty((self.ntotal, self.dim), dtype=np.float32)
+            for lst in self._lists:
+                vectors[lst.ids[:lst.size]] = lst.vectors[:lst.size]
+            return vectors, self._labels[:self.ntotal].copy()
+
+    def search(self, queries, k=3):
+        """
+        Return (distances, ids) of shape (len(queries), k), nearest first.
+        Distances are 1 - cosine similarity or squared L2; missing neighbours
+        have id -1 and distance inf.
+        """
+        queries = self._prepare(queries)
+        nq = len(queries)
+        if nq == 0:
+            return np.empty((0, k), dtype=np.float32), np.empty((0, k), dtype=np.int64)
+        with self._lock:
+            if self.centroids is None:
+                nprobe = 1
+                probes = {0: (np.arange(nq), np.zeros(nq, dtype=np.int64))}
+            else:
+                nprobe = min(self.nprobe, self.nlist)
+                centroid_scores = queries @ self.centroids.T - self._centroid_bias
+                probed = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+                order = np.argsort(probed, axis=None, kind="stable")
+                list_nos = probed.reshape(-1)[order]
+                starts = np.flatnonzero(np.r_[True, list_nos[1:] != list_nos[:-1]])
+                probes = {int(list_nos[s]): (order[s:e] // nprobe, order[s:e] % nprobe)
+                          for s, e in zip(starts, np.r_[starts[1:], len(order)])}
+
+            # Each probed list contributes up to k candidates into its own slot,
+            # then a single top-k over all slots picks the neighbours
+            cand_scores = np.full((nq, nprobe * k), -np.inf, dtype=np.float32)
+            cand_ids = np.full((nq, nprobe * k), -1, dtype=np.int64)
+            for list_no, (query_rows, slots) in probes.items():
+                lst = self._lists[list_no]
+                if lst.size == 0:
+                    continue
+                scores = queries[query_rows] @ lst.vectors[:lst.size].T
+                if self.metric == "l2":
+                    # -|q - x|^2 up to the per-query constant |q|^2
+                    scores = 2 * scores - lst.sq_norms[:lst.size]
+                take = min(k, lst.size)
+                if take < lst.size:
+                    top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+                else:
+                    top = np.broadcast_to(np.arange(take), (len(query_rows), take))
+                columns = slots[:, None] * k + np.arange(take)
+                cand_scores[query_rows[:, None], columns] = scores[np.arange(len(query_rows))[:, None], top]
+                cand_ids[query_rows[:, None], columns] = lst.ids[top]
+
+        if nprobe * k > k:
+            keep = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+            rows = np.arange(nq)[:, None]
+            best_scores, best_ids = cand_scores[rows, keep], cand_ids[rows, keep]
+        else:
+            best_scores, best_ids = cand_scores, cand_ids
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        if self.metric == "cosine":
+            distances = 1.0 - best_scores
+        else:
+            distances = np.einsum("ij,ij->i", queries, queries)[:, None] - best_scores
+        distances[best_ids < 0] = np.inf
+        return distances, best_ids
+
+    def classify(self, queries, k=3):
+        """
+        Majority label of the k nearest neighbours for each query, ties going to
+        the closest neighbour; -1 where the index has no vectors.
+        """
+        _, ids = self.search(queries, k)
+        labels = np.where(ids >= 0, self._labels[np.maximum(ids, 0)], -1)
+        result = np.full(len(labels), -1, dtype=np.int64)
+        for row, row_labels in enumerate(labels):
+            valid = row_labels[row_labels >= 0]
+            if len(valid):
+                values, first_seen, counts = np.unique(valid, return_index=True, return_counts=True)
+                winners = np.flatnonzero(counts == counts.max())
+                result[row] = values[winners[np.argmin(first_seen[winners])]]
+        return result
+
+    def save(self, path):
+        vectors, labels = self._all_vectors()
+        config = {"dim": self.dim, "metric": self.metric, "nprobe": self.nprobe}
+        centroids = self.centroids if self.centroids is not None else np.empty((0, self.dim), dtype=np.float32)
+        with open(path, "wb") as f:
+            np.savez(f, vectors=vectors, labels=labels, centroids=centroids, config=np.array(json.dumps(config)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            config = json.loads(str(data["config"]))
+            index = cls(config["dim"], metric=config["metric"], nprobe=config["nprobe"])
+            centroids = data["centroids"]
+            if len(centroids):
+                index._set_centroids(centroids)
+                index._lists = [_GrowableList(index.dim) for _ in range(len(centroids))]
+                index._bump_version(centroids)
+            # Stored vectors are already normalised, so they go in unchanged
+            if len(data["labels"]):
+                index.add(data["vectors"], data["labels"])
+        return index
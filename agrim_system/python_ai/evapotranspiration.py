@@ -0,0 +1,124 @@
+"""
+FAO-56 Penman-Monteith reference evapotranspiration (ET₀) over NumPy arrays.
+fao56_et0 evaluates the daily equation (FAO Irrigation and Drainage Paper 56,
+eq. 6 with G = 0) elementwise with broadcasting, e.g. (days, rows, cols)
+weather grids against (rows, cols) latitude and elevation and a (days, 1, 1)
+day of year. et0_grid runs it over memory-mapped .npy grids too large for
+memory, in blocks of days and rows, optionally across worker processes that
+each read their block from the inputs and write it straight to the output.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+# Cells computed per block; intermediates take about 20 float64 arrays of this size
+ET0_CHUNK_CELLS = int(os.getenv("ET0_CHUNK_CELLS", str(1 << 20)))
+ET0_WORKERS = int(os.getenv("ET0_WORKERS", "1"))
+
+SOLAR_CONSTANT = 0.0820  # MJ m-2 min-1
+STEFAN_BOLTZMANN = 4.903e-9  # MJ K-4 m-2 day-1
+ALBEDO = 0.23  # hypothetical grass reference crop
+
+def saturation_vapour_pressure(t):
+    """e°(T) in kPa for air temperature t in °C (eq. 11)."""
+    return 0.6108 * np.exp(17.27 * t / (t + 237.3))
+
+def extraterrestrial_radiation(latitude, doy):
+    """Daily Ra in MJ m-2 day-1 for latitude in degrees and day of year (eqs. 21-25)."""
+    phi = np.radians(latitude)
+    angle = 2 * np.pi * np.asarray(doy) / 365
+    dr = 1 + 0.033 * np.cos(angle)
+    delta = 0.409 * np.sin(angle - 1.39)
+    # Clipped so polar day and night give 24 h and 0 h of sun
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+    return 24 * 60 / np.pi * SOLAR_CONSTANT * dr * (
+        ws * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(ws))
+
+def fao56_et0(tmin, tmax, rh_mean, u2, rs, latitude, elevation, doy, ea=None):
+    """
+    Daily ET₀ in mm/day. tmin/tmax in °C, rh_mean in %, u2 wind speed at
+    2 m in m/s, rs solar radiation in MJ m-2 day-1, latitude in degrees,
+    elevation in m and doy the day of year; all broadcast together.
+    ea (actual vapour pressure, kPa) overrides the estimate from rh_mean,
+    e.g. when it was derived from dew point or RHmax/RHmin.
+    """
+    tmin = np.asarray(tmin, dtype=np.float64)
+    tmax = np.asarray(tmax, dtype=np.float64)
+    t = (tmax + tmin) / 2
+    pressure = 101.3 * ((293 - 0.0065 * np.asarray(elevation, dtype=np.float64)) / 293) ** 5.26
+    gamma = 0.000665 * pressure
+    e_tmax, e_tmin = saturation_vapour_pressure(tmax), saturation_vapour_pressure(tmin)
+    es = (e_tmax + e_tmin) / 2
+    if ea is None:
+        ea = np.asarray(rh_mean, dtype=np.float64) / 100 * es
+    slope = 4098 * saturation_vapour_pressure(t) / (t + 237.3) ** 2
+
+    ra = extraterrestrial_radiation(latitude, doy)
+    rso = (0.75 + 2e-5 * np.asarray(elevation, dtype=np.float64)) * ra
+    rs = np.asarray(rs, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative_rs = np.minimum(np.where(rso > 0, rs / rso, 1.0), 1.0)
+    rnl = STEFAN_BOLTZMANN * ((tmax + 273.16) ** 4 + (tmin + 273.16) ** 4) / 2 \
+        * (0.34 - 0.14 * np.sqrt(ea)) * (1.35 * relative_rs - 0.35)
+    rn = (1 - ALBEDO) * rs - rnl
+
+    u2 = np.asarray(u2, dtype=np.float64)
+    et0 = (0.408 * slope * rn + gamma * 900 / (t + 273) * u2 * (es - ea)) / (slope + gamma * (1 + 0.34 * u2))
+    return np.maximum(et0, 0.0)
+
+_GRID_INPUTS = ("tmin", "tmax", "rh_mean", "u2", "rs")
+
+def _static(value, rows):
+    # Latitude/elevation: scalar, (rows, cols) or (rows, 1) array, sliced to the block's rows
+    value = np.asarray(value)
+    return value[rows] if value.ndim == 2 else value
+
+def _et0_block(input_paths, output_path, days, rows, latitude, elevation, doy):
+    grids = {name: np.load(path, mmap_mode="r") for name, path in input_paths.items()}
+    output = np.load(output_path, mmap_mode="r+")
+    output[days, rows] = fao56_et0(*(grids[name][days, rows] for name in _GRID_INPUTS),
+                                   latitude, elevation, doy[:, None, None])
+    output.flush()
+
+def et0_grid(input_paths, output_path, latitude, elevation, doy, workers=ET0_WORKERS,
+             chunk_cells=ET0_CHUNK_CELLS):
+    """
+    ET₀ for (days, rows, cols) grids stored as .npy files. input_paths maps
+    tmin, tmax, rh_mean, u2 and rs to their files; latitude and elevation are
+    scalars or (rows, cols) arrays, doy the (days,) day of year. The result is
+    written to output_path as float32 and returned as a read-only memory map.
+    Blocks of about chunk_cells cells are computed in turn, or across
+    workers spawned processes, so memory stays bounded by the block size.
+    """
+    missing = set(_GRID_INPUTS) - set(input_paths)
+    if missing:
+        raise ValueError(f"Missing ET₀ inputs: {sorted(missing)}")
+    days, rows, cols = np.load(input_paths["tmin"], mmap_mode="r").shape
+    doy = np.broadcast_to(np.asarray(doy), (days,))
+    output = open_memmap(output_path, mode="w+", dtype=np.float32, shape=(days, rows, cols))
+    del output
+
+    # Whole days per block when a day fits, otherwise row bands of one day
+    cells_per_day = rows * cols
+    if cells_per_day <= chunk_cells:
+        day_step, row_step = max(1, chunk_cells // cells_per_day), rows
+    else:
+        day_step, row_step = 1, max(1, chunk_cells // cols)
+    blocks = [(slice(d, min(d + day_step, days)), slice(r, min(r + row_step, rows)))
+              for d in range(0, days, day_step) for r in range(0, rows, row_step)]
+    tasks = [(dict(input_paths), output_path, day_block, row_block, _static(latitude, row_block),
+              _static(elevation, row_block), doy[day_block]) for day_block, row_block in blocks]
+
+    if workers > 1:
+        # Spawned, since callers such as weather_models have TensorFlow loaded
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for future in [pool.submit(_et0_block, *task) for task in tasks]:
+                future.result()
+    else:
+        for task in tasks:
+            _et0_block(*task)
+    return np.load(output_path, mmap_mode="r")
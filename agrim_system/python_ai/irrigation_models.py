@@ -13,6 +13,11 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models
 
+try:
+    from .rule_engine import rule_table
+except ImportError:
+    from rule_engine import rule_table
+
 class SmartIrrigationRLAgent:
     def __init__(self, state_size, action_size):
         self.state_size = state_size
@@ -36,24 +41,30 @@ def water_requirement_prediction(soil_moisture, weather_data, crop_type):
     """
     Predict water requirement based on soil moisture, weather, and crop type.
     """
-    base_requirement = 10  # base liters per day
-    moisture_factor = max(0, 1 - soil_moisture / 100)
-    temp_factor = max(0, (weather_data.get('temperature', 25) - 20) / 20)
     crop_factor = 1.0  # Placeholder for crop-specific factor
-    requirement = base_requirement * moisture_factor * temp_factor * crop_factor
-    return f"Predicted water requirement: {requirement:.2f} liters/day"
+    requirement = water_requirement_array(soil_moisture, weather_data.get('temperature', 25), crop_factor)
+    return f"Predicted water requirement: {float(requirement):.2f} liters/day"
+
+def water_requirement_array(soil_moisture, temperature, crop_factor=1.0, out=None):
+    """
+    Water requirement in liters/day for arrays of soil moisture (%) and
+    temperature (°C), broadcast together; out may be e.g. a memory-mapped slice.
+    """
+    base_requirement = 10  # base liters per day
+    moisture_factor = 1 - np.asarray(soil_moisture, dtype=np.float64) / 100
+    temp_factor = (np.asarray(temperature, dtype=np.float64) - 20) / 20
+    requirement = base_requirement * np.where(moisture_factor > 0, moisture_factor, 0.0) \
+        * np.where(temp_factor > 0, temp_factor, 0.0) * crop_factor
+    if out is None:
+        return requirement
+    out[...] = requirement
+    return out
 
 def flooding_risk_prediction(rainfall, soil_saturation):
     """
     Predict flooding risk based on rainfall and soil saturation.
     """
-    risk_score = rainfall * soil_saturation
-    if risk_score > 100:
-        return "High flooding risk"
-    elif risk_score > 50:
-        return "Moderate flooding risk"
-    else:
-        return "Low flooding risk"
+    return rule_table("flooding_risk").evaluate_one({"rainfall": rainfall, "soil_saturation": soil_saturation})
 
 def irrigation_rainfall_overlap_optimization(irrigation_schedule, rainfall_forecast):
     """
@@ -71,10 +82,14 @@ def et_water_loss_estimator(et0, irrigation_amount):
     """
     Estimate water loss based on evapotranspiration and irrigation.
     """
-    loss = irrigation_amount - et0
-    if loss < 0:
-        loss = 0
-    return f"Estimated water loss: {loss:.2f} liters"
+    return f"Estimated water loss: {float(et_water_loss_array(et0, irrigation_amount)):.2f} liters"
+
+def et_water_loss_array(et0, irrigation_amount, out=None):
+    """
+    Water loss for arrays of ET₀ (e.g. from evapotranspiration.et0_grid)
+    and irrigation amounts, broadcast together; out may be a memory-mapped slice.
+    """
+    return np.maximum(np.subtract(irrigation_amount, et0, dtype=np.float64), 0.0, out=out)
 
 def irrigation_efficiency_predictor(irrigation_data):
     """
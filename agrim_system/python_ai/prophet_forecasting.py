@@ -0,0 +1,189 @@
+"""
+Prophet forecasting with a persistent cache of fitted models.
+Each station's last fitted model is stored on disk with a fingerprint of the
+rows it was fitted on. Forecasting the same data again reuses the model
+without fitting; data that only appends rows to the cached ones is refitted
+warm, starting from the previous parameters; anything else is fitted from
+scratch. prophet_forecast_many spreads stations over a process pool. This
+module does not import TensorFlow, so the spawned workers stay small.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+
+PROPHET_CACHE_DIR = os.getenv("PROPHET_CACHE_DIR", "")
+PROPHET_WORKERS = int(os.getenv("PROPHET_WORKERS", str(os.cpu_count() or 1)))
+# Workers are replaced after this many stations, returning memory that Stan fits leave behind
+PROPHET_TASKS_PER_WORKER = int(os.getenv("PROPHET_TASKS_PER_WORKER", "50"))
+# max_tasks_per_child needs 3.11; before that the whole pool is replaced once it has
+# been given PROPHET_TASKS_PER_WORKER stations per worker
+_RECYCLE_POOL = sys.version_info < (3, 11)
+FORECAST_COLUMNS = ("ds", "yhat", "yhat_lower", "yhat_upper")
+
+HIT, WARM, COLD = "hit", "warm", "cold"
+# Status of a station whose fit or forecast raised; the exception takes the forecast's place
+FAILED = "failed"
+
+def data_fingerprint(df, rows=None):
+    """Hash of the first rows (default all) of a ['ds', 'y'] frame."""
+    ds = pd.to_datetime(df["ds"]).to_numpy(dtype="datetime64[ns]")[:rows].view(np.int64)
+    y = df["y"].to_numpy(dtype=np.float64)[:rows]
+    digest = hashlib.sha256(np.ascontiguousarray(ds).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+def warm_start_params(model):
+    """Fitted parameters of model in the form Prophet.fit(init=...) takes."""
+    params = {name: model.params[name][0][0] for name in ("k", "m", "sigma_obs")}
+    params.update({name: model.params[name][0] for name in ("delta", "beta")})
+    return params
+
+class ProphetModelCache:
+    """Fitted models on disk, one JSON file per station."""
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, station):
+        name = hashlib.sha1(str(station).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, station):
+        try:
+            with open(self._path(station)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, station, model, rows, fingerprint, config):
+        entry = {"station": str(station), "rows": rows, "fingerprint": fingerprint, "config": config,
+                 "model": model_to_json(model)}
+        # Write then rename, so concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._path(station))
+
+def fit_prophet(df, station=None, cache=None, **prophet_kwargs):
+    """
+    Fitted Prophet model for df and how it was obtained: HIT (cached model
+    for the same data), WARM (cached rows plus appended ones, fitted from the
+    cached parameters) or COLD. Without a station or cache this is a plain
+    Prophet(**prophet_kwargs).fit(df).
+    """
+    config = json.dumps(prophet_kwargs, sort_keys=True, default=str)
+    entry = cache.get(station) if cache is not None and station is not None else None
+    init = None
+    if entry is not None and entry["config"] == config and entry["rows"] <= len(df):
+        if data_fingerprint(df, entry["rows"]) == entry["fingerprint"]:
+            cached = model_from_json(entry["model"])
+            if entry["rows"] == len(df):
+                return cached, HIT
+            init = warm_start_params(cached)
+    model = Prophet(**prophet_kwargs)
+    if init is None:
+        model.fit(df)
+    else:
+        model.fit(df, init=init)
+    if cache is not None and station is not None:
+        cache.put(station, model, len(df), data_fingerprint(df), config)
+    return model, COLD if init is None else WARM
+
+def prophet_forecast(time_series_df, periods=24, freq="h", station=None, cache=None, **prophet_kwargs):
+    """
+    Forecast periods steps of freq after time_series_df (columns ['ds', 'y']).
+    Returns the Prophet forecast DataFrame over history and future. With a
+    station, fitted models are cached in cache (default: PROPHET_CACHE_DIR,
+    when set).
+    """
+    if cache is None and station is not None and PROPHET_CACHE_DIR:
+        cache = ProphetModelCache(PROPHET_CACHE_DIR)
+    model, _ = fit_prophet(time_series_df, station, cache, **prophet_kwargs)
+    return model.predict(model.make_future_dataframe(periods=periods, freq=freq))
+
+def _forecast_station(station, df, periods, freq, cache_dir, columns, prophet_kwargs):
+    cache = ProphetModelCache(cache_dir) if cache_dir else None
+    model, status = fit_prophet(df, station, cache, **prophet_kwargs)
+    forecast = model.predict(model.make_future_dataframe(periods=periods, freq=freq))
+    if columns is not None:
+        forecast = forecast[list(columns)]
+    return station, forecast, status
+
+def _forecast_pool(workers):
+    # Spawned, since callers such as weather_models have TensorFlow loaded
+    context = multiprocessing.get_context("spawn")
+    if not _RECYCLE_POOL:
+        return ProcessPoolExecutor(workers, mp_context=context, max_tasks_per_child=PROPHET_TASKS_PER_WORKER)
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+def iter_prophet_forecasts(series, periods=24, freq="h", cache_dir=PROPHET_CACHE_DIR, workers=PROPHET_WORKERS,
+                           max_pending=None, columns=FORECAST_COLUMNS, **prophet_kwargs):
+    """
+    Yield (station, forecast, status) for each (station, df) pair of series
+    (a dict or any iterable, e.g. a generator loading stations lazily) as
+    the forecasts complete. At most max_pending (default 2 * workers)
+    stations are in flight, so only that many frames and forecasts are held
+    at once. columns limits the returned forecast columns (None for all).
+    A station that fails is yielded as (station, exception, FAILED) and the
+    others carry on.
+    """
+    items = iter(series.items() if isinstance(series, dict) else series)
+    max_pending = max_pending or 2 * workers
+    recycle_after = PROPHET_TASKS_PER_WORKER * workers if _RECYCLE_POOL else None
+    pool = _forecast_pool(workers)
+    try:
+        pending = {}
+        submitted = 0
+        held = None
+        exhausted = False
+        while pending or held or not exhausted:
+            while len(pending) < max_pending:
+                if held is None:
+                    try:
+                        held = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                if submitted == recycle_after:
+                    # The next station waits until the current pool has drained
+                    if pending:
+                        break
+                    pool.shutdown()
+                    pool = _forecast_pool(workers)
+                    submitted = 0
+                station, df = held
+                held = None
+                pending[pool.submit(_forecast_station, station, df, periods, freq, cache_dir, columns,
+                                    prophet_kwargs)] = station
+                submitted += 1
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    station = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Prophet forecast failed for station {station}: {e}")
+                        result = station, e, FAILED
+                    yield result
+    finally:
+        pool.shutdown()
+
+def prophet_forecast_many(series, periods=24, freq="h", cache_dir=PROPHET_CACHE_DIR, workers=PROPHET_WORKERS,
+                          max_pending=None, columns=FORECAST_COLUMNS, **prophet_kwargs):
+    """
+    Forecasts for many stations, as a dict of station -> forecast DataFrame.
+    Stations whose forecast failed are left out.
+    """
+    return {station: forecast for station, forecast, status in iter_prophet_forecasts(
+        series, periods, freq, cache_dir, workers, max_pending, columns, **prophet_kwargs) if status != FAILED}
@@ -0,0 +1,145 @@
+"""
+Declarative threshold rules evaluated over NumPy columns.
+A rule table names its inputs (with the defaults the scalar models use for
+missing values), optional derived columns, and rules made of threshold
+conditions. Tables are compiled once into comparison steps and evaluate whole
+columns at a time, returning small integer codes; render() maps codes back to
+the models' messages. The default tables live in rules.json next to this
+module; RULES_FILE (env AGRIML_RULES_FILE) can replace any of them without a
+code change.
+
+Table format:
+    {"inputs": {"slope": 0, "rainfall": 0},
+     "derive": {"risk": ["mul", "slope", "rainfall"]},
+     "mode": "first",
+     "rules": [{"when": [["risk", ">", 50]], "label": "High soil erosion risk"}, ...],
+     "default": "Low soil erosion risk"}
+In "first" mode a row gets the code of the first rule whose conditions all
+hold, or len(rules) for the default. In "all" mode the code is a bit mask of
+every matching rule and the labels of the set bits are joined with
+"separator"; no match renders as the default.
+"""
+
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+RULES_FILE = os.getenv("AGRIML_RULES_FILE", "")
+
+_COMPARISONS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+                "==": np.equal, "!=": np.not_equal}
+_OPERATIONS = {"mul": np.multiply, "add": np.add, "sub": np.subtract, "div": np.divide}
+
+class RuleTable:
+    def __init__(self, name, spec):
+        """Compile a table spec (see the module docstring); raises ValueError on malformed tables."""
+        self.name = name
+        self.mode = spec.get("mode", "first")
+        if self.mode not in ("first", "all"):
+            raise ValueError(f"{name}: unknown mode {self.mode!r}")
+        self.inputs = dict(spec.get("inputs", {}))
+        known = set(self.inputs)
+        self._derive = []
+        for column, (operation, *args) in spec.get("derive", {}).items():
+            if operation not in _OPERATIONS:
+                raise ValueError(f"{name}: unknown operation {operation!r}")
+            self._derive.append((column, _OPERATIONS[operation], [self._operand(a, known) for a in args]))
+            known.add(column)
+        self._rules = []
+        for rule in spec["rules"]:
+            conditions = []
+            for column, comparison, threshold in rule["when"]:
+                if comparison not in _COMPARISONS:
+                    raise ValueError(f"{name}: unknown comparison {comparison!r}")
+                conditions.append((self._operand(column, known), _COMPARISONS[comparison], threshold))
+            self._rules.append(conditions)
+        self.labels = [rule["label"] for rule in spec["rules"]]
+        self.default = spec["default"]
+        self.separator = spec.get("separator", ", ")
+        if self.mode == "all":
+            if len(self.labels) > 64:
+                raise ValueError(f"{name}: at most 64 rules in 'all' mode")
+            self.dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64)
+                              if np.iinfo(t).bits >= len(self.labels))
+        else:
+            self.dtype = np.uint8 if len(self.labels) < 255 else np.uint16
+
+    def _operand(self, value, known):
+        if isinstance(value, str):
+            if value not in known:
+                raise ValueError(f"{self.name}: unknown column {value!r}")
+            return value
+        return float(value)
+
+    def _columns(self, data):
+        columns = {}
+        for column, default in self.inputs.items():
+            if column in data:
+                columns[column] = np.asarray(data[column], dtype=np.float64)
+            elif default is None:
+                raise KeyError(f"{self.name}: missing input {column!r}")
+            else:
+                columns[column] = np.float64(default)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for column, operation, args in self._derive:
+                columns[column] = operation(*(columns[a] if isinstance(a, str) else a for a in args))
+        return columns
+
+    def evaluate(self, data):
+        """Codes for a DataFrame or mapping of columns (scalars broadcast)."""
+        columns = self._columns(data)
+        shape = np.broadcast_shapes(*(np.shape(c) for c in columns.values()))
+        matches = []
+        for conditions in self._rules:
+            match = np.ones(shape, dtype=bool)
+            for column, comparison, threshold in conditions:
+                match &= comparison(columns[column] if isinstance(column, str) else column, threshold)
+            matches.append(match)
+        if self.mode == "first":
+            return np.select(matches, np.arange(len(matches), dtype=self.dtype),
+                             default=len(matches)).astype(self.dtype)
+        codes = np.zeros(shape, dtype=self.dtype)
+        for bit, match in enumerate(matches):
+            codes |= match.astype(self.dtype) << self.dtype(bit)
+        return codes
+
+    def label(self, code):
+        code = int(code)
+        if self.mode == "first":
+            return self.labels[code] if code < len(self.labels) else self.default
+        matched = [label for bit, label in enumerate(self.labels) if code >> bit & 1]
+        return self.separator.join(matched) if matched else self.default
+
+    def render(self, codes):
+        """Messages for an array of codes, as an object array of strings."""
+        codes = np.asarray(codes)
+        unique, inverse = np.unique(codes, return_inverse=True)
+        return np.array([self.label(code) for code in unique.tolist()], dtype=object)[inverse].reshape(codes.shape)
+
+    def evaluate_one(self, row):
+        """Message for one row given as a dict, as the scalar models return."""
+        return self.label(self.evaluate(row))
+
+def load_rules(path=None):
+    """
+    The default tables, with any tables defined in path (or RULES_FILE)
+    replacing those of the same name.
+    """
+    with open(DEFAULT_RULES_FILE) as f:
+        specs = json.load(f)
+    path = path or RULES_FILE
+    if path:
+        with open(path) as f:
+            specs.update(json.load(f))
+    return {name: RuleTable(name, spec) for name, spec in specs.items()}
+
+@lru_cache(maxsize=None)
+def _default_rules():
+    return load_rules()
+
+def rule_table(name):
+    """A compiled table from the default rules, loaded once per process."""
+    return _default_rules()[name]
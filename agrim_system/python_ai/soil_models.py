@@ -13,6 +13,11 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models
 
+try:
+    from .rule_engine import rule_table
+except ImportError:
+    from rule_engine import rule_table
+
 def build_soil_type_classification_model(input_shape=(64, 64, 3), num_classes=3):
     model = models.Sequential([
         layers.Conv2D(32, (3,3), activation='relu', input_shape=input_shape),
@@ -38,16 +43,7 @@ def soil_nutrient_deficiency_detection(nutrient_levels):
     """
     Detect nutrient deficiencies from soil nutrient levels.
     """
-    deficiencies = []
-    if nutrient_levels.get('nitrogen', 0) < 10:
-        deficiencies.append("Nitrogen deficiency")
-    if nutrient_levels.get('phosphorus', 0) < 5:
-        deficiencies.append("Phosphorus deficiency")
-    if nutrient_levels.get('potassium', 0) < 5:
-        deficiencies.append("Potassium deficiency")
-    if deficiencies:
-        return ", ".join(deficiencies)
-    return "No nutrient deficiencies detected"
+    return rule_table("soil_nutrient_deficiency").evaluate_one(nutrient_levels)
 
 def soil_moisture_estimation(image_data, sensor_data):
     """
@@ -63,23 +59,10 @@ def salinity_stress_detection(salinity_level):
     """
     Detect salinity stress based on salinity level.
     """
-    if salinity_level > 4:
-        return "High salinity stress detected"
-    elif salinity_level > 2:
-        return "Moderate salinity stress"
-    else:
-        return "No salinity stress"
+    return rule_table("salinity_stress").evaluate_one({"salinity_level": salinity_level})
 
 def soil_erosion_prediction(terrain_data):
     """
     Predict soil erosion risk based on terrain and rainfall data.
     """
-    slope = terrain_data.get('slope', 0)
-    rainfall = terrain_data.get('rainfall', 0)
-    risk = slope * rainfall
-    if risk > 50:
-        return "High soil erosion risk"
-    elif risk > 20:
-        return "Moderate soil erosion risk"
-    else:
-        return "Low soil erosion risk"
+    return rule_table("soil_erosion").evaluate_one(terrain_data)
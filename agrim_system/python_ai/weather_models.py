@@ -12,9 +12,17 @@ Includes:
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models
-from prophet import Prophet
 import pandas as pd
 
+try:
+    from .evapotranspiration import et0_grid, fao56_et0
+    from .prophet_forecasting import prophet_forecast, prophet_forecast_many
+    from .rule_engine import rule_table
+except ImportError:
+    from evapotranspiration import et0_grid, fao56_et0
+    from prophet_forecasting import prophet_forecast, prophet_forecast_many
+    from rule_engine import rule_table
+
 def build_lstm_weather_forecast_model(input_shape=(24, 5)):
     model = models.Sequential([
         layers.LSTM(64, return_sequences=True, input_shape=input_shape),
@@ -25,25 +33,12 @@ def build_lstm_weather_forecast_model(input_shape=(24, 5)):
     model.compile(optimizer='adam', loss='mse')
     return model
 
-def prophet_forecast(time_series_df):
-    """
-    Use Prophet for time series forecasting.
-    time_series_df: pandas DataFrame with columns ['ds', 'y']
-    Returns forecast DataFrame.
-    """
-    model = Prophet()
-    model.fit(time_series_df)
-    future = model.make_future_dataframe(periods=24, freq='H')
-    forecast = model.predict(future)
-    return forecast
-
 def rainfall_prediction_classification(features):
     """
     Classify rainfall occurrence (yes/no) based on features.
     """
     # Dummy classifier: threshold on humidity
-    humidity = features.get('humidity', 0)
-    return "Rain" if humidity > 70 else "No Rain"
+    return rule_table("rainfall_classification").evaluate_one(features)
 
 def rainfall_prediction_regression(features):
     """
@@ -89,6 +84,7 @@ def evapotranspiration_estimation(weather_data):
     temp = weather_data.get('temperature', 25)
     humidity = weather_data.get('humidity', 50)
     wind_speed = weather_data.get('wind_speed', 2)
+    # Quick heuristic; evapotranspiration.fao56_et0 computes FAO-56 Penman-Monteith over arrays
     et0 = 0.0023 * (temp + 17.8) * (humidity / 100) * wind_speed
     return f"Estimated ET₀: {et0:.2f} mm/day"
 
@@ -96,11 +92,4 @@ def climate_zone_classification(temperature, rainfall):
     """
     Classify climate zone for crops based on temperature and rainfall.
     """
-    if temperature > 25 and rainfall > 1000:
-        return "Tropical"
-    elif temperature > 15 and rainfall > 500:
-        return "Subtropical"
-    elif temperature > 5:
-        return "Temperate"
-    else:
-        return "Cold"
+    return rule_table("climate_zone").evaluate_one({"temperature": temperature, "rainfall": rainfall})
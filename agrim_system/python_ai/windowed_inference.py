@@ -0,0 +1,89 @@
+"""
+Sliding-window forecasting over memory-mapped station history.
+Hourly history for all stations is one .npy file of shape
+(stations, hours, features), opened as a memory map. The (window, features)
+inputs that build_lstm_weather_forecast_model and
+build_weather_prediction_model take are strided views into it, copied only
+batch by batch into one reusable buffer, and predictions go straight into a
+memory-mapped .npy output. Memory is bounded by the batch size, not by the
+number of stations; history pages are read through the OS page cache.
+"""
+
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW_HOURS = 24
+FORECAST_BATCH_SIZE = int(os.getenv("FORECAST_BATCH_SIZE", "4096"))
+
+def create_history(path, stations, hours, features=5, dtype=np.float32):
+    """Create a zero-filled history file and return it as a writable memory map."""
+    return open_memmap(path, mode="w+", dtype=dtype, shape=(stations, hours, features))
+
+def open_history(path):
+    return np.load(path, mmap_mode="r")
+
+def station_windows(history, window=WINDOW_HOURS, stride=1, last=None):
+    """
+    View of history as (stations, windows, window, features) without copying.
+    Windows start every stride hours; last keeps only the last n windows
+    of each station (last=1 is the window ending at the latest hour).
+    """
+    windows = sliding_window_view(history, window, axis=1).transpose(0, 1, 3, 2)[:, ::stride]
+    return windows if last is None else windows[:, -last:]
+
+def forecast_windows(predict_fn, history_path, output_path, window=WINDOW_HOURS, stride=1, last=None,
+                     batch_size=FORECAST_BATCH_SIZE):
+    """
+    Run predict_fn over every window of the history file and write the
+    results to output_path as a (stations, windows, outputs) float32 .npy,
+    returned as a read-only memory map. predict_fn takes a
+    (n, window, features) float32 batch and returns (n, outputs) or (n,).
+    Windows are batched across stations in station-major order.
+    """
+    history = open_history(history_path)
+    windows = station_windows(history, window, stride, last)
+    stations, per_station = windows.shape[:2]
+    total = stations * per_station
+    buffer = np.empty((min(batch_size, total),) + windows.shape[2:], dtype=np.float32)
+    output = None
+    for start in range(0, total, batch_size):
+        n = min(batch_size, total - start)
+        _gather(windows, start, n, buffer)
+        predictions = np.asarray(predict_fn(buffer[:n]), dtype=np.float32).reshape(n, -1)
+        if output is None:
+            output = open_memmap(output_path, mode="w+", dtype=np.float32,
+                                 shape=(stations, per_station, predictions.shape[1]))
+            flat = output.reshape(total, -1)
+        flat[start:start + n] = predictions
+    if output is None:
+        raise ValueError("History is shorter than one window")
+    output.flush()
+    del flat, output
+    return np.load(output_path, mmap_mode="r")
+
+def _gather(windows, start, n, buffer):
+    # Copy windows start..start+n (station-major) into buffer, one strided block per station run
+    per_station = windows.shape[1]
+    station, offset = divmod(start, per_station)
+    filled = 0
+    while filled < n:
+        if offset == 0 and n - filled >= per_station:
+            # Whole stations at once
+            count = (n - filled) // per_station
+            np.copyto(buffer[filled:filled + count * per_station].reshape((count, per_station) + windows.shape[2:]),
+                      windows[station:station + count])
+            filled += count * per_station
+            station += count
+            continue
+        count = min(per_station - offset, n - filled)
+        np.copyto(buffer[filled:filled + count], windows[station, offset:offset + count])
+        filled += count
+        station += 1
+        offset = 0
+
+def keras_predictor(model):
+    """predict_fn for a Keras model, calling it directly to skip Model.predict's per-call setup."""
+    return lambda batch: model(batch, training=False).numpy()
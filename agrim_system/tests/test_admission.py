@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+from agriml_system.python_ai.admission import AdmissionController, AdmissionRejected, SHED, EXPIRED
+
+class TestAdmissionController(unittest.TestCase):
+    def hold_slot(self, controller):
+        # Occupy the single slot until the returned event is set
+        entered, release = threading.Event(), threading.Event()
+
+        def run():
+            with controller.admit():
+                entered.set()
+                release.wait()
+        thread = threading.Thread(target=run)
+        thread.start()
+        entered.wait()
+        return release, thread
+
+    def test_sheds_requests_that_cannot_meet_their_deadline(self):
+        controller = AdmissionController(initial_estimate=0.1)
+        with self.assertRaises(AdmissionRejected) as caught:
+            with controller.admit("normal", time_remaining=0.05):
+                pass
+        self.assertEqual(caught.exception.reason, SHED)
+        with controller.admit("normal", time_remaining=1.0):
+            pass
+        self.assertEqual(controller.stats()["shed"]["normal"], 1)
+        self.assertEqual(controller.stats()["admitted"], 1)
+
+    def test_queued_request_expires_before_deadline(self):
+        controller = AdmissionController(max_in_flight=1, initial_estimate=0.01, smoothing=0.0)
+        release, thread = self.hold_slot(controller)
+        with self.assertRaises(AdmissionRejected) as caught:
+            with controller.admit("low", time_remaining=0.05):
+                pass
+        self.assertEqual(caught.exception.reason, EXPIRED)
+        release.set()
+        thread.join()
+        self.assertEqual(controller.stats()["expired"]["low"], 1)
+
+    def test_priority_order_and_displacement_when_full(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=2)
+        release, thread = self.hold_slot(controller)
+        order, errors = [], []
+
+        def request(priority):
+            try:
+                with controller.admit(priority):
+                    order.append(priority)
+            except AdmissionRejected as e:
+                errors.append((priority, e.reason))
+
+        threads = []
+        for priority in ("low", "normal", "high"):
+            threads.append(threading.Thread(target=request, args=(priority,)))
+            threads[-1].start()
+            while controller.stats()["queued"] < min(len(threads), 2) and not errors:
+                time.sleep(0.001)
+        release.set()
+        for t in threads + [thread]:
+            t.join()
+        self.assertEqual(errors, [("low", SHED)])
+        self.assertEqual(order, ["high", "normal"])
+        self.assertEqual(controller.stats()["in_flight"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
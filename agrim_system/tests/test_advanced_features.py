@@ -1,5 +1,8 @@
 import unittest
-from agrim_system.python_ai.advanced_features import (
+import numpy as np
+import pandas as pd
+from agriml_system.python_ai import advanced_features as af
+from agriml_system.python_ai.advanced_features import (
     soil_nutrient_analysis,
     pest_infestation_prediction,
     irrigation_need_forecast,
@@ -46,5 +49,67 @@ class TestAdvancedFeatures(unittest.TestCase):
 
     # Additional tests for other functions can be added similarly
 
+class TestBatchVariants(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 500
+        # Integer-valued columns hit the thresholds exactly
+        self.df = pd.DataFrame({
+            'nitrogen': rng.integers(0, 20, n), 'phosphorus': rng.integers(0, 10, n),
+            'potassium': rng.integers(0, 10, n), 'temperature': rng.integers(20, 45, n).astype(float),
+            'rainfall': rng.integers(0, 10, n), 'humidity': rng.uniform(0, 100, n),
+            'infected_area': rng.uniform(0, 25, n), 'ph': rng.choice([5.5, 6, 7, 7.5, 8], n),
+            'ndvi': rng.choice([0.3, 0.4, 0.5, 0.7, 0.9], n), 'days_after_planting': rng.integers(0, 90, n),
+            'water_used': rng.integers(0, 5, n), 'yield': rng.integers(0, 10, n),
+            'avg_temp': rng.integers(25, 35, n), 'type': rng.choice(['aphid', 'caterpillar', 'mite'], n)
+        })
+        self.moisture = rng.integers(0, 40, n).astype(float)
+        self.rows = self.df.to_dict('records')
+
+    def assertMatches(self, rendered, expected):
+        self.assertEqual(list(rendered), expected)
+
+    def test_row_features_match_scalar(self):
+        df, rows = self.df, self.rows
+        self.assertMatches(af.render(af.soil_nutrient_analysis_batch(df), af.NUTRIENT_LABELS),
+                           [soil_nutrient_analysis(r) for r in rows])
+        self.assertMatches(af.render_irrigation_need(af.irrigation_need_forecast_batch(df, self.moisture)),
+                           [irrigation_need_forecast(r, m) for r, m in zip(rows, self.moisture)])
+        codes, risk = af.disease_spread_modeling_batch(df, df)
+        self.assertMatches(af.render(codes, af.DISEASE_RISK_LABELS), [disease_spread_modeling(r, r) for r in rows])
+        self.assertMatches(af.render(af.fertilizer_recommendation_batch(df), af.FERTILIZER_LABELS),
+                           [fertilizer_recommendation(r) for r in rows])
+        self.assertMatches(af.render(af.crop_health_index_batch(df), af.CROP_HEALTH_LABELS),
+                           [crop_health_index(r) for r in rows])
+        self.assertMatches(af.render(af.water_stress_detection_batch(self.moisture), af.WATER_STRESS_LABELS),
+                           [water_stress_detection(m) for m in self.moisture])
+        self.assertMatches(af.render(af.crop_growth_stage_prediction_batch(df), af.GROWTH_STAGE_LABELS),
+                           [crop_growth_stage_prediction(r) for r in rows])
+        codes, _ = af.irrigation_efficiency_analysis_batch(df)
+        self.assertMatches(af.render(codes, af.IRRIGATION_EFFICIENCY_LABELS),
+                           [irrigation_efficiency_analysis(r) for r in rows])
+        self.assertMatches(af.render(af.crop_variety_recommendation_batch(df, df), af.CROP_VARIETY_LABELS),
+                           [crop_variety_recommendation(r, r) for r in rows])
+        self.assertMatches(af.render(af.pest_control_strategy_batch(df), af.PEST_CONTROL_LABELS),
+                           [pest_control_strategy(r) for r in rows])
+
+    def test_missing_columns_use_scalar_defaults(self):
+        self.assertEqual(af.render(af.crop_health_index_batch({}), af.CROP_HEALTH_LABELS), crop_health_index({}))
+        codes = af.disease_spread_modeling_batch({'infected_area': np.array([8.0, 30.0])}, {})[0]
+        self.assertEqual(list(codes), [0, 2])
+
+    def test_series_features_match_scalar(self):
+        rng = np.random.default_rng(1)
+        series = rng.uniform(0, 80, (200, 12))
+        series[:20] = 25.0  # flat series: the sign of a ~0 slope must agree too
+        for batch, scalar, labels in (
+                (af.pest_population_forecast_batch, pest_population_forecast, af.PEST_POPULATION_LABELS),
+                (af.temperature_anomaly_detection_batch, temperature_anomaly_detection,
+                 af.TEMPERATURE_ANOMALY_LABELS),
+                (af.rainfall_prediction_batch, rainfall_prediction, af.RAINFALL_LABELS),
+                (af.soil_moisture_trend_batch, soil_moisture_trend, af.MOISTURE_TREND_LABELS)):
+            codes, _ = batch(series)
+            self.assertMatches(af.render(codes, labels), [scalar(list(row)) for row in series])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+import asyncio
+import itertools
+import unittest
+from backend.advisor_cache import AdvisorCache, parse_buckets
+from backend.models.irrigation_model import predict_irrigation
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestAdvisorCache(unittest.TestCase):
+    def test_quantized_key(self):
+        cache = AdvisorCache(buckets=parse_buckets("soil_moisture=5"))
+        key_a = cache.make_key(soil_moisture=21, temperature=30.1, humidity=40, crop_type="Wheat", rainfall=0)
+        key_b = cache.make_key(soil_moisture=24, temperature=30.2, humidity=41, crop_type="Wheat", rainfall=0.5)
+        key_c = cache.make_key(soil_moisture=21, temperature=30.1, humidity=40, crop_type="Rice", rainfall=0)
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, key_c)
+
+    def test_buckets_do_not_span_decision_thresholds(self):
+        cache = AdvisorCache()
+        advice = {}
+
+        async def run():
+            for t, r in [(30.0, 0), (30.3, 0), (25, 10.0), (25, 10.4)]:
+                key = cache.make_key(soil_moisture=45, temperature=t, humidity=50, crop_type="Wheat", rainfall=r)
+                advice[t, r] = await cache.get_or_compute(key, compute_for(t, r))
+
+        def compute_for(t, r):
+            async def compute():
+                return predict_irrigation(45, t, 50, "Wheat", r)
+            return compute
+
+        asyncio.run(run())
+        self.assertEqual(advice[30.0, 0]["irrigation_timing"], "Evening")
+        self.assertEqual(advice[30.3, 0]["irrigation_timing"], "Morning")
+        self.assertEqual(advice[25, 10.0]["recommended_volume"], 20.0)
+        self.assertEqual(advice[25, 10.4]["recommended_volume"], 10.0)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_shared_keys_share_advice(self):
+        # Any two inputs mapped to one key get the same recommendation
+        cache = AdvisorCache(buckets=parse_buckets("soil_moisture=7,temperature=3,rainfall=4"))
+        by_key = {}
+        for moisture, t, r in itertools.product([0, 29, 29.9, 30, 30.5, 59.5, 60, 61], [28, 29.9, 30, 30.1, 32],
+                                                [0, 9.5, 10, 10.1, 12]):
+            key = cache.make_key(soil_moisture=moisture, temperature=t, humidity=50, crop_type="Corn", rainfall=r)
+            by_key.setdefault(key, []).append(predict_irrigation(moisture, t, 50, "Corn", r))
+        for results in by_key.values():
+            self.assertTrue(all(result == results[0] for result in results))
+
+    def test_lru_eviction_and_ttl(self):
+        clock = FakeClock()
+        cache = AdvisorCache(maxsize=2, ttl=10, clock=clock)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.expirations, 1)
+
+    def test_single_flight(self):
+        cache = AdvisorCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"recommended_volume": 20.0}
+
+        async def run():
+            return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"recommended_volume": 20.0} for r in results))
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["coalesced"], 4)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        cache = AdvisorCache()
+        calls = []
+
+        async def run():
+            release = asyncio.Event()
+
+            async def compute():
+                calls.append(1)
+                await release.wait()
+                return {"recommended_volume": 20.0}
+
+            leader = asyncio.ensure_future(cache.get_or_compute("k", compute))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(cache.get_or_compute("k", compute))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return leader, await follower
+
+        leader, result = asyncio.run(run())
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(result, {"recommended_volume": 20.0})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get("k"), {"recommended_volume": 20.0})
+        self.assertEqual(cache.stats()["inflight"], 0)
+
+    def test_failure_not_cached(self):
+        cache = AdvisorCache()
+
+        async def compute():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(cache.get_or_compute("k", compute))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_parse_buckets_rejects_unknown_field(self):
+        with self.assertRaises(ValueError):
+            parse_buckets("wind=2")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import asyncio
+import unittest
+from agriml_system.python_ai.async_kafka import AsyncKafkaConsumer, AsyncKafkaProducer, InMemoryBroker
+
+async def produce(broker, count, devices=8):
+    async with AsyncKafkaProducer(broker, max_in_flight=16) as producer:
+        for i in range(count):
+            device = f"dev-{i % devices}"
+            await producer.send("soil_moisture", {"device_id": device, "seq": i}, key=device)
+            assert producer.in_flight <= 16
+
+async def consume(consumer, expected):
+    task = asyncio.ensure_future(consumer.run())
+    while consumer.stats()["processed"] < expected and not task.done():
+        await asyncio.sleep(0.01)
+    consumer.stop()
+    await task
+
+class TestAsyncKafka(unittest.TestCase):
+    def test_partitions_run_in_parallel_in_order(self):
+        broker = InMemoryBroker(num_partitions=4)
+        seen = {}
+        active = set()
+        overlap = []
+
+        async def handler(record):
+            active.add(record.partition)
+            overlap.append(len(active))
+            await asyncio.sleep(0)
+            active.discard(record.partition)
+            seen.setdefault(record.value["device_id"], []).append(record.value["seq"])
+
+        async def main():
+            await produce(broker, 400)
+            consumer = AsyncKafkaConsumer(broker.consumer("soil_moisture", "g"), handler, queue_size=8)
+            await consume(consumer, 400)
+            return consumer
+
+        consumer = asyncio.run(main())
+        self.assertEqual(sum(len(s) for s in seen.values()), 400)
+        for seqs in seen.values():
+            self.assertEqual(seqs, sorted(seqs))
+        self.assertGreater(max(overlap), 1)
+        # Everything processed is committed, so a new consumer of the group starts at the end
+        ends = broker.end_offsets("soil_moisture")
+        for tp, end in ends.items():
+            self.assertEqual(broker.committed("g", tp), end)
+        self.assertEqual(broker.consumer("soil_moisture", "g").positions, ends)
+        self.assertEqual(consumer.stats()["polled"], 400)
+
+    def test_slow_partition_bounds_buffered_records(self):
+        broker = InMemoryBroker(num_partitions=1)
+        buffered = []
+
+        def handler(record):
+            # Plain functions run in the executor
+            buffered.append(consumer.polled - consumer.stats()["processed"])
+
+        async def main():
+            await produce(broker, 100)
+            await consume(consumer, 100)
+
+        consumer = AsyncKafkaConsumer(broker.consumer("soil_moisture", "g"), handler, queue_size=4,
+                                      max_poll_records=10)
+        asyncio.run(main())
+        self.assertEqual(consumer.stats()["processed"], 100)
+        # Paused at 4 queued: under 4 queued, the poll that crossed it and the record in the handler
+        self.assertLessEqual(max(buffered), 3 + 10 + 1)
+
+    def test_stuck_partition_does_not_stall_the_others(self):
+        broker = InMemoryBroker(num_partitions=2)
+        others_done = asyncio.Event()
+        done = {0: 0, 1: 0}
+
+        async def handler(record):
+            if record.partition == 0:
+                await others_done.wait()
+            done[record.partition] += 1
+            if done[1] == ends[1]:
+                others_done.set()
+
+        async def main():
+            await produce(broker, 100)
+            ends.update({tp.partition: end for tp, end in broker.end_offsets("soil_moisture").items()})
+            consumer = AsyncKafkaConsumer(broker.consumer("soil_moisture", "g"), handler, queue_size=2,
+                                          max_poll_records=4)
+            await asyncio.wait_for(consume(consumer, 100), 10)
+
+        ends = {}
+        asyncio.run(main())
+        self.assertEqual(done, ends)
+
+    def test_revoked_partition_is_neither_processed_nor_committed(self):
+        broker = InMemoryBroker(num_partitions=2)
+        source = broker.consumer("soil_moisture", "g")
+        tp0, tp1 = sorted(broker.end_offsets("soil_moisture"), key=lambda tp: tp.partition)
+        processed = {0: [], 1: []}
+
+        async def handler(record):
+            processed[record.partition].append(record.offset)
+            if record.partition == 0 and record.offset == 2:
+                # Rebalanced away while the third record is in the handler
+                source.revoke([tp0])
+            await asyncio.sleep(0)
+
+        async def main():
+            await produce(broker, 100)
+            consumer = AsyncKafkaConsumer(source, handler, queue_size=8, max_poll_records=16)
+            task = asyncio.ensure_future(consumer.run())
+            while len(processed[1]) < broker.end_offsets("soil_moisture")[tp1] and not task.done():
+                await asyncio.sleep(0.01)
+            consumer.stop()
+            await task
+
+        asyncio.run(main())
+        self.assertEqual(processed[0], [0, 1, 2])
+        # Only records finished before the revocation are committed for the revoked partition
+        self.assertEqual(broker.committed("g", tp0), 2)
+        self.assertEqual(broker.committed("g", tp1), broker.end_offsets("soil_moisture")[tp1])
+
+    def test_commit_failure_does_not_stop_periodic_commits(self):
+        broker = InMemoryBroker(num_partitions=1)
+        source = broker.consumer("soil_moisture", "g")
+        (tp,) = broker.end_offsets("soil_moisture")
+        commit = source.commit
+        attempts = []
+
+        async def flaky_commit(offsets):
+            attempts.append(offsets)
+            if len(attempts) == 1:
+                raise RuntimeError("coordinator moved")
+            await commit(offsets)
+
+        async def handler(record):
+            pass
+
+        async def main():
+            source.commit = flaky_commit
+            await produce(broker, 10)
+            consumer = AsyncKafkaConsumer(source, handler, commit_interval=0.01)
+            task = asyncio.ensure_future(consumer.run())
+            while broker.committed("g", tp) != 10 and not task.done():
+                await asyncio.sleep(0.01)
+            committed = broker.committed("g", tp)
+            consumer.stop()
+            await task
+            return consumer, committed
+
+        consumer, committed = asyncio.run(main())
+        # Committed by the periodic task after the failure, not only on shutdown
+        self.assertEqual(committed, 10)
+        self.assertEqual(consumer.commit_failures, 1)
+
+    def test_handler_error_commits_only_processed_records(self):
+        broker = InMemoryBroker(num_partitions=1)
+
+        async def handler(record):
+            if record.value["seq"] == 5:
+                raise ValueError("bad record")
+
+        async def main():
+            await produce(broker, 10)
+            consumer = AsyncKafkaConsumer(broker.consumer("soil_moisture", "g"), handler)
+            await consumer.run()
+
+        with self.assertRaises(ValueError):
+            asyncio.run(main())
+        (tp,) = broker.end_offsets("soil_moisture")
+        self.assertEqual(broker.committed("g", tp), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import threading
+import unittest
+import numpy as np
+from agriml_system.python_ai.batching import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_requests_share_a_batch(self):
+        batch_sizes = []
+        release = threading.Event()
+
+        def predict(batch):
+            release.wait(1)
+            batch_sizes.append(len(batch))
+            return batch.sum(axis=(1, 2))
+
+        batcher = MicroBatcher(predict, max_batch_size=8, max_wait_us=200000)
+        try:
+            futures = [batcher.submit(np.full((2, 2), i, dtype=np.float32)) for i in range(5)]
+            release.set()
+            results = [f.result(2) for f in futures]
+        finally:
+            batcher.close(1)
+        self.assertEqual(results, [4.0 * i for i in range(5)])
+        self.assertEqual(batch_sizes, [5])
+        stats = batcher.stats()
+        self.assertEqual(stats["items"], 5)
+        self.assertEqual(stats["size_histogram"], {5: 1})
+
+    def test_max_batch_size_is_respected(self):
+        batch_sizes = []
+
+        def predict(batch):
+            batch_sizes.append(len(batch))
+            return list(batch)
+
+        batcher = MicroBatcher(predict, max_batch_size=3, max_wait_us=100000)
+        try:
+            futures = [batcher.submit(np.array([i])) for i in range(7)]
+            results = [int(f.result(2)[0]) for f in futures]
+        finally:
+            batcher.close(1)
+        self.assertEqual(results, list(range(7)))
+        self.assertTrue(all(size <= 3 for size in batch_sizes))
+        self.assertEqual(sum(batch_sizes), 7)
+
+    def test_errors_propagate_to_callers(self):
+        def predict(batch):
+            raise RuntimeError("model failure")
+
+        batcher = MicroBatcher(predict, max_batch_size=4, max_wait_us=0)
+        try:
+            with self.assertRaises(RuntimeError):
+                batcher.predict(np.zeros(3), timeout=2)
+        finally:
+            batcher.close(1)
+
+if __name__ == '__main__':
+    unittest.main()
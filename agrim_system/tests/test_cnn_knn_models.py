@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from agrim_system.python_ai.cnn_knn_models import CNNModel, KNNModel, save_artifacts, load_artifacts
+from agrim_system.python_ai.embedding_index import EmbeddingIndex
+
+class TestModelArtifacts(unittest.TestCase):
+    def test_save_and_load_round_trip(self):
+        cnn = CNNModel(input_shape=(16, 16, 3), num_classes=3)
+        knn = KNNModel(n_neighbors=1)
+        knn.train(np.array([[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]]), np.array([0, 1, 2]))
+        x = np.random.default_rng(0).random((2, 16, 16, 3)).astype(np.float32)
+
+        with tempfile.TemporaryDirectory() as root:
+            save_artifacts(root, "v1", cnn, knn)
+            save_artifacts(root, "v2", cnn, knn)
+            with open(os.path.join(root, "LATEST")) as f:
+                self.assertEqual(f.read(), "v2")
+
+            loaded_cnn, loaded_knn, manifest = load_artifacts(root)
+            self.assertEqual(manifest["version"], "v2")
+            self.assertEqual(loaded_cnn.input_shape, (16, 16, 3))
+            np.testing.assert_allclose(loaded_cnn.model.predict(x, verbose=0), cnn.model.predict(x, verbose=0))
+            np.testing.assert_array_equal(loaded_knn.predict([[1.9, 2.1]]), [2])
+
+            _, _, manifest = load_artifacts(root, "v1")
+            self.assertEqual(manifest["version"], "v1")
+
+    def test_embedding_index_artifacts(self):
+        cnn = CNNModel(input_shape=(16, 16, 3), num_classes=3)
+        x = np.random.default_rng(0).random((4, 16, 16, 3)).astype(np.float32)
+        classes, embeddings = cnn.predict_with_embeddings(x)
+        np.testing.assert_array_equal(classes, cnn.predict(x))
+        self.assertEqual(embeddings.shape, (4, cnn.embedding_dim))
+
+        index = EmbeddingIndex(cnn.embedding_dim)
+        index.add(embeddings, [0, 1, 2, 1])
+        with tempfile.TemporaryDirectory() as root:
+            save_artifacts(root, "v1", cnn, index)
+            _, loaded_index, manifest = load_artifacts(root)
+        self.assertEqual(manifest["knn_type"], "embedding_index")
+        self.assertIsInstance(loaded_index, EmbeddingIndex)
+        self.assertEqual(loaded_index.ntotal, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import importlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent import futures
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+PROTO_DIR = os.path.join(ROOT, "agriml_system", "proto")
+# The service imports its siblings as top-level modules, as it does when run from its directory
+SERVICE_DIRS = [os.path.join(ROOT, "agriml_system", "python_ai"), os.path.join(ROOT, "agrim_system", "python_ai")]
+
+def png_frame(value):
+    buffer = io.BytesIO()
+    Image.fromarray(np.full((64, 64, 3), value, dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class TestDetectDiseaseStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Generate agriml_pb2 and agriml_pb2_grpc from the proto, as the service build does
+        try:
+            import grpc  # noqa: F401
+            import grpc_tools  # noqa: F401
+        except ImportError:
+            raise unittest.SkipTest("grpcio-tools is not installed")
+        cls.out_dir = tempfile.TemporaryDirectory()
+        subprocess.run([sys.executable, "-m", "grpc_tools.protoc", f"-I{PROTO_DIR}",
+                        f"--python_out={cls.out_dir.name}", f"--grpc_python_out={cls.out_dir.name}",
+                        os.path.join(PROTO_DIR, "agriml.proto")], check=True)
+        cls.paths = [cls.out_dir.name] + SERVICE_DIRS
+        sys.path[:0] = cls.paths
+        importlib.invalidate_caches()
+        cls.service = importlib.import_module("crop_disease_detection")
+
+    @classmethod
+    def tearDownClass(cls):
+        for path in cls.paths:
+            sys.path.remove(path)
+        for name in ("agriml_pb2", "agriml_pb2_grpc"):
+            sys.modules.pop(name, None)
+        cls.out_dir.cleanup()
+
+    def start_server(self, servicer):
+        import grpc
+        pb2_grpc = sys.modules["agriml_pb2_grpc"]
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        pb2_grpc.add_CropDiseaseDetectionServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        channel = grpc.insecure_channel(f"localhost:{port}")
+        self.addCleanup(channel.close)
+        return server, pb2_grpc.CropDiseaseDetectionServiceStub(channel)
+
+    def test_cancelled_stream_releases_the_handler(self):
+        pb2 = sys.modules["agriml_pb2"]
+        handler_done = threading.Event()
+
+        class Servicer(self.service.CropDiseaseDetectionServicer):
+            def DetectDiseaseStream(self, request_iterator, context):
+                try:
+                    yield from super().DetectDiseaseStream(request_iterator, context)
+                finally:
+                    handler_done.set()
+
+        servicer = Servicer(max_batch_wait_us=100, decode_threads=1)
+        self.addCleanup(servicer.preprocessor.close)
+        self.addCleanup(servicer.batcher.close)
+        server, stub = self.start_server(servicer)
+        stop_frames = threading.Event()
+
+        def frames():
+            yield pb2.CropImage(image_data=png_frame(1), request_id="first")
+            # The client stays connected without sending, so the handler is waiting for frames
+            stop_frames.wait(10)
+
+        call = stub.DetectDiseaseStream(frames())
+        self.assertEqual(next(call).request_id, "first")
+        call.cancel()
+        self.assertTrue(handler_done.wait(5))
+        stop_frames.set()
+        self.assertTrue(server.stop(0).wait(5))
+
+    def test_stream_frames_pass_admission_control(self):
+        import grpc
+        from admission import AdmissionController
+        pb2 = sys.modules["agriml_pb2"]
+        # Any deadline under the 60s estimated service time is shed
+        admission = AdmissionController(initial_estimate=60.0)
+        servicer = self.service.CropDiseaseDetectionServicer(max_batch_wait_us=100, decode_threads=1,
+                                                             admission=admission)
+        self.addCleanup(servicer.preprocessor.close)
+        self.addCleanup(servicer.batcher.close)
+        server, stub = self.start_server(servicer)
+        self.addCleanup(server.stop, 0)
+
+        call = stub.DetectDiseaseStream(iter([pb2.CropImage(image_data=png_frame(3), request_id="a")]),
+                                        timeout=5, metadata=[("x-priority", "low")])
+        with self.assertRaises(grpc.RpcError) as raised:
+            list(call)
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.RESOURCE_EXHAUSTED)
+        self.assertEqual(admission.stats()["shed"]["low"], 1)
+
+        # Without a deadline the frame is admitted, and its slot is released with the result
+        predictions = list(stub.DetectDiseaseStream(iter([pb2.CropImage(image_data=png_frame(3), request_id="b")])))
+        self.assertEqual([p.request_id for p in predictions], ["b"])
+        self.assertEqual((admission.stats()["admitted"], admission.stats()["in_flight"]), (1, 0))
+
+    def test_added_references_change_index_and_cache_key(self):
+        import grpc
+        pb2 = sys.modules["agriml_pb2"]
+        servicer = self.service.CropDiseaseDetectionServicer(max_batch_wait_us=100, decode_threads=1)
+        self.addCleanup(servicer.preprocessor.close)
+        self.addCleanup(servicer.batcher.close)
+        server, stub = self.start_server(servicer)
+        self.addCleanup(server.stop, 0)
+        frame = pb2.CropImage(image_data=png_frame(7), crop_type="maize")
+        stub.DetectDisease(frame)
+        key = servicer.cache_key(frame.image_data, frame.crop_type)
+
+        update = stub.AddReferences(pb2.ReferenceImages(images=[
+            pb2.ReferenceImage(image_data=png_frame(v), disease_name=name)
+            for v, name in ((7, "DiseaseC"), (200, "DiseaseA"))]))
+        self.assertEqual(update.references, 2)
+        self.assertEqual(update.index_version, servicer.knn_model.version)
+        self.assertNotEqual(servicer.cache_key(frame.image_data, frame.crop_type), key)
+        # Disease names map to the CNN's class indices
+        self.assertEqual(servicer.knn_model._all_vectors()[1].tolist(), [2, 0])
+
+        with self.assertRaises(grpc.RpcError) as raised:
+            stub.AddReferences(pb2.ReferenceImages(images=[
+                pb2.ReferenceImage(image_data=png_frame(1), disease_name="Rust")]))
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+        self.assertEqual(servicer.knn_model.ntotal, 2)
+
+if __name__ == '__main__':
+    unittest.main()
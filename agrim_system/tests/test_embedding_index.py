@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from agrim_system.python_ai.embedding_index import EmbeddingIndex
+
+def clustered(n, dim=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, n)
+    return (centers[labels] + 0.05 * rng.normal(size=(n, dim))).astype(np.float32), labels
+
+class TestEmbeddingIndex(unittest.TestCase):
+    def test_brute_force_matches_exact_search(self):
+        vectors, labels = clustered(500)
+        index = EmbeddingIndex(16)
+        index.add(vectors, labels)
+        queries = vectors[:10] + 0.01
+        distances, ids = index.search(queries, k=5)
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        expected = np.argsort(-(q @ normed.T), axis=1)[:, :5]
+        np.testing.assert_array_equal(ids, expected)
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+
+    def test_ivf_recall_and_incremental_add(self):
+        vectors, labels = clustered(2000)
+        index = EmbeddingIndex(16, nprobe=4)
+        index.add(vectors[:1000], labels[:1000])
+        index.train(vectors[:1000], nlist=16)
+        index.add(vectors[1000:], labels[1000:])
+        self.assertEqual(index.ntotal, 2000)
+        _, ids = index.search(vectors[::10], k=1)
+        self.assertGreater(np.mean(ids[:, 0] == np.arange(0, 2000, 10)), 0.95)
+        np.testing.assert_array_equal(index.classify(vectors[1000:1100]), labels[1000:1100])
+
+    def test_version_follows_inserts(self):
+        vectors, labels = clustered(100)
+        a, b = EmbeddingIndex(16), EmbeddingIndex(16)
+        versions = {a.version}
+        a.add(vectors[:50], labels[:50])
+        versions.add(a.version)
+        a.add(vectors[50:], labels[50:])
+        versions.add(a.version)
+        self.assertEqual(len(versions), 3)
+        b.add(vectors[:50], labels[:50])
+        b.add(vectors[50:], labels[50:])
+        self.assertEqual(a.version, b.version)
+
+    def test_empty_query_batch(self):
+        vectors, labels = clustered(200)
+        for nlist in (1, 4):
+            index = EmbeddingIndex(16, nprobe=2)
+            index.train(vectors, nlist=nlist)
+            index.add(vectors, labels)
+            distances, ids = index.search(np.empty((0, 16)), k=3)
+            self.assertEqual((distances.shape, ids.shape), ((0, 3), (0, 3)))
+            self.assertEqual(len(index.classify(np.empty((0, 16)))), 0)
+
+    def test_l2_metric_and_missing_neighbours(self):
+        index = EmbeddingIndex(2, metric="l2")
+        index.add([[0.0, 0.0], [3.0, 4.0]], [7, 8])
+        distances, ids = index.search([[0.0, 1.0]], k=3)
+        np.testing.assert_array_equal(ids, [[0, 1, -1]])
+        np.testing.assert_allclose(distances[0, :2], [1.0, 18.0], rtol=1e-6)
+        self.assertEqual(distances[0, 2], np.inf)
+        np.testing.assert_array_equal(EmbeddingIndex(2).classify([[1.0, 0.0]]), [-1])
+
+    def test_save_and_load_round_trip(self):
+        vectors, labels = clustered(300)
+        index = EmbeddingIndex(16, nprobe=2)
+        index.train(vectors, nlist=4)
+        index.add(vectors, labels)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.npz")
+            index.save(path)
+            loaded = EmbeddingIndex.load(path)
+        self.assertEqual((loaded.ntotal, loaded.nlist, loaded.nprobe), (300, 4, 2))
+        np.testing.assert_array_equal(loaded.search(vectors[:20], 3)[1], index.search(vectors[:20], 3)[1])
+
+if __name__ == '__main__':
+    unittest.main()
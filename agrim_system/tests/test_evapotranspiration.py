@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from numpy.lib.format import open_memmap
+from agrim_system.python_ai.evapotranspiration import et0_grid, extraterrestrial_radiation, fao56_et0
+from agrim_system.python_ai.irrigation_models import (
+    et_water_loss_array, et_water_loss_estimator, water_requirement_array, water_requirement_prediction
+)
+
+class TestEvapotranspiration(unittest.TestCase):
+    def test_fao56_worked_examples(self):
+        # Example 8: Ra at 20°S on 3 September
+        self.assertAlmostEqual(extraterrestrial_radiation(-20, 246), 32.2, places=1)
+        # Example 18: Brussels, 6 July
+        self.assertAlmostEqual(fao56_et0(12.3, 21.5, None, 2.078, 22.07, 50.8, 100, 187, ea=1.409), 3.9, places=1)
+
+    def test_grid_matches_direct_evaluation(self):
+        rng = np.random.default_rng(0)
+        shape = (6, 30, 20)
+        inputs = {"tmin": rng.uniform(0, 15, shape), "tmax": rng.uniform(16, 35, shape),
+                  "rh_mean": rng.uniform(20, 90, shape), "u2": rng.uniform(0.5, 5, shape),
+                  "rs": rng.uniform(5, 28, shape)}
+        latitude = np.repeat(np.linspace(-40, 60, 30)[:, None], 20, axis=1)
+        elevation = rng.uniform(0, 2000, shape[1:])
+        doy = np.arange(100, 106)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {}
+            for name, values in inputs.items():
+                paths[name] = os.path.join(tmp, f"{name}.npy")
+                grid = open_memmap(paths[name], mode="w+", dtype=np.float32, shape=shape)
+                grid[:] = values
+                grid.flush()
+                del grid
+            expected = fao56_et0(*(np.load(p) for p in paths.values()), latitude, elevation, doy[:, None, None])
+            # Several days per block, row bands within a day, and row bands across processes
+            for chunk_cells, workers in ((1500, 1), (250, 1), (250, 2)):
+                output = et0_grid(paths, os.path.join(tmp, "et0.npy"), latitude, elevation, doy,
+                                  workers=workers, chunk_cells=chunk_cells)
+                np.testing.assert_allclose(output, expected, rtol=1e-6)
+                del output
+
+    def test_water_arrays_match_scalar_functions(self):
+        et0 = np.array([3.0, 5.0, 12.0, np.nan])
+        np.testing.assert_array_equal(et_water_loss_array(et0, 10), [7.0, 5.0, 0.0, np.nan])
+        self.assertEqual(et_water_loss_estimator(12, 10), "Estimated water loss: 0.00 liters")
+        moisture = np.array([20.0, 120.0, 50.0])
+        temperature = np.array([35.0, 35.0, 15.0])
+        requirement = water_requirement_array(moisture, temperature)
+        for m, t, r in zip(moisture, temperature, requirement):
+            self.assertEqual(water_requirement_prediction(m, {'temperature': t}, 'Wheat'),
+                             f"Predicted water requirement: {r:.2f} liters/day")
+        out = np.empty(3)
+        self.assertIs(water_requirement_array(moisture, temperature, out=out), out)
+
+if __name__ == '__main__':
+    unittest.main()
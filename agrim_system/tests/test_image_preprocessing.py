@@ -0,0 +1,47 @@
+import io
+import unittest
+import numpy as np
+from PIL import Image
+from agriml_system.python_ai.image_preprocessing import ImagePreprocessor
+
+def encode(pixels, fmt):
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, fmt)
+    return buf.getvalue()
+
+def gradient(width, height):
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 255 // width, y * 255 // height, np.full_like(x, 128)], axis=-1).astype(np.uint8)
+
+class TestImagePreprocessor(unittest.TestCase):
+    def setUp(self):
+        self.preprocessor = ImagePreprocessor(size=(64, 64), num_threads=2)
+
+    def tearDown(self):
+        self.preprocessor.close()
+
+    def test_draft_decode_close_to_full_decode(self):
+        jpeg = encode(gradient(1024, 768), "JPEG")
+        reference = np.asarray(Image.open(io.BytesIO(jpeg)).convert("RGB").resize((64, 64)), dtype=np.float32)
+        result = self.preprocessor.decode(jpeg)
+        self.assertEqual(result.shape, (64, 64, 3))
+        self.assertEqual(result.dtype, np.float32)
+        self.assertLess(np.abs(result - reference).mean(), 2.0)
+
+    def test_decode_batch_writes_into_buffer(self):
+        images = [encode(gradient(200, 100), "JPEG"), encode(gradient(64, 64), "PNG")]
+        buffer = np.zeros((4, 64, 64, 3), dtype=np.float32)
+        result = self.preprocessor.decode_batch(images, out=buffer)
+        self.assertEqual(result.shape, (2, 64, 64, 3))
+        self.assertTrue(np.shares_memory(result, buffer))
+        np.testing.assert_array_equal(buffer[1], gradient(64, 64))
+        self.assertFalse(buffer[2:].any())
+
+    def test_invalid_image_raises(self):
+        with self.assertRaises(Exception):
+            self.preprocessor.decode_batch([b"not an image"])
+        with self.assertRaises(ValueError):
+            self.preprocessor.decode_batch([b""] * 3, out=np.empty((2, 64, 64, 3), dtype=np.float32))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import unittest
+from backend.inference_pool import InferencePool, PoolSaturated, parse_preload
+
+def blocking_work(release, started=None):
+    # Occupies a worker until release is set; True unless it timed out
+    if started is not None:
+        started.wait(5)
+    return release.wait(5)
+
+class TestInferencePool(unittest.TestCase):
+    def test_event_loop_stays_responsive(self):
+        pool = InferencePool(kind="thread", max_workers=2)
+        release = threading.Event()
+        # Both workers and the test reach the barrier once both calls are blocking in the pool
+        started = threading.Barrier(3)
+
+        async def run():
+            ticks = []
+
+            async def heartbeat():
+                await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+                # The loop keeps running coroutines while both workers are busy
+                for _ in range(5):
+                    ticks.append(pool.pending)
+                    await asyncio.sleep(0)
+                release.set()
+
+            results = await asyncio.gather(pool.run(blocking_work, release, started),
+                                           pool.run(blocking_work, release, started), heartbeat())
+            return results, ticks
+
+        try:
+            results, ticks = asyncio.run(run())
+        finally:
+            release.set()
+            pool.shutdown()
+        self.assertEqual(results[:2], [True, True])
+        self.assertEqual(ticks, [2] * 5)
+
+    def test_saturated_pool_rejects(self):
+        pool = InferencePool(kind="thread", max_workers=1, max_queue=0, queue_timeout=0.01)
+        release = threading.Event()
+
+        async def run():
+            first = asyncio.ensure_future(pool.run(blocking_work, release))
+            await asyncio.sleep(0)
+            with self.assertRaises(PoolSaturated):
+                await pool.run(blocking_work, release)
+            release.set()
+            return await first
+
+        try:
+            self.assertTrue(asyncio.run(run()))
+        finally:
+            release.set()
+            pool.shutdown()
+        self.assertEqual(pool.stats()["rejected"], 1)
+        self.assertEqual(pool.stats()["completed"], 1)
+
+    def test_cancelled_callers_keep_their_slots_until_the_job_ends(self):
+        pool = InferencePool(kind="thread", max_workers=1, max_queue=1, queue_timeout=0.01)
+        release = threading.Event()
+
+        async def until_pending(count):
+            while pool.pending != count:
+                await asyncio.sleep(0.001)
+
+        async def run():
+            running = asyncio.ensure_future(pool.run(blocking_work, release))
+            queued = asyncio.ensure_future(pool.run(blocking_work, release))
+            await asyncio.wait_for(until_pending(2), 5)
+            # The job keeps its worker after its caller is cancelled
+            running.cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(pool.pending, 2)
+            with self.assertRaises(PoolSaturated):
+                await pool.run(blocking_work, release)
+            # A job still in the queue is dropped along with its caller
+            queued.cancel()
+            await asyncio.wait_for(until_pending(1), 5)
+            last = asyncio.ensure_future(pool.run(blocking_work, release))
+            await asyncio.wait_for(until_pending(2), 5)
+            release.set()
+            result = await last
+            await asyncio.wait_for(until_pending(0), 5)
+            return result
+
+        try:
+            self.assertTrue(asyncio.run(run()))
+        finally:
+            release.set()
+            pool.shutdown()
+        stats = pool.stats()
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["failed"], 0)
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_preloaded_model(self):
+        pool = InferencePool(kind="thread", max_workers=1, preload=parse_preload("counts=collections:Counter"))
+        try:
+            self.assertEqual(asyncio.run(pool.run_model("counts", "total")), 0)
+        finally:
+            pool.shutdown()
+
+    def test_parse_preload_rejects_bad_entry(self):
+        with self.assertRaises(ValueError):
+            parse_preload("model=no_colon")
+
+if __name__ == '__main__':
+    unittest.main()
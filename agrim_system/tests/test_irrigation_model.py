@@ -1,5 +1,6 @@
+import itertools
 import unittest
-from backend.models.irrigation_model import predict_irrigation
+from backend.models.irrigation_model import predict_irrigation, predict_irrigation_batch
 
 class TestIrrigationModel(unittest.TestCase):
     def test_predict_irrigation_dry(self):
@@ -16,5 +17,28 @@ class TestIrrigationModel(unittest.TestCase):
         result = predict_irrigation(soil_moisture=50, temperature=25, humidity=50, crop_type="Unknown", rainfall=0)
         self.assertIn('recommended_volume', result)
 
+    def test_batch_matches_scalar(self):
+        rows = list(itertools.product(
+            [0, 29.9, 30, 59.9, 60, 100],
+            [25, 30, 30.5],
+            [0, 10, 15],
+            ["Wheat", "Tomato", "Pepper", "Corn", "Rice", "Unknown"]
+        ))
+        batch = predict_irrigation_batch(
+            soil_moisture=[r[0] for r in rows],
+            temperature=[r[1] for r in rows],
+            humidity=[50] * len(rows),
+            crop_type=[r[3] for r in rows],
+            rainfall=[r[2] for r in rows]
+        )
+        for i, (moisture, temp, rain, crop) in enumerate(rows):
+            expected = predict_irrigation(soil_moisture=moisture, temperature=temp, humidity=50, crop_type=crop, rainfall=rain)
+            for key, value in expected.items():
+                self.assertEqual(batch[key][i], value, (key, rows[i]))
+
+    def test_batch_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            predict_irrigation_batch([20, 30], [25], [50, 50], ["Wheat", "Rice"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,144 @@
+import json
+import unittest
+import numpy as np
+from kafka.future import Future
+from kafka.structs import TopicPartition
+from agriml_system.python_ai.kafka_integration import KafkaClient
+
+class FakeProducer:
+    """Records sends and resolves their futures on flush, like a batching producer."""
+    def __init__(self, fail_topics=()):
+        self.fail_topics = fail_topics
+        self.pending = []
+        self.sent = []
+        self.flushes = 0
+        self.closed = False
+
+    def send(self, topic, value, key=None, headers=None):
+        future = Future()
+        self.pending.append((topic, (value, headers), future))
+        return future
+
+    def flush(self, timeout=None):
+        self.flushes += 1
+        for topic, value, future in self.pending:
+            if topic in self.fail_topics:
+                future.failure(RuntimeError("broker down"))
+            else:
+                self.sent.append((topic, value))
+                future.success(len(self.sent) - 1)
+        self.pending = []
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        self.closed = True
+
+class Record:
+    def __init__(self, offset, value, headers=()):
+        self.offset = offset
+        self.value = value
+        self.headers = list(headers)
+
+class FakeConsumer:
+    """Serves records per partition from its position, like KafkaConsumer.poll."""
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.positions = {tp: 0 for tp in partitions}
+        self.committed = {}
+
+    def poll(self, timeout_ms=0, max_records=None):
+        polled = {}
+        for tp, records in self.partitions.items():
+            taken = records[self.positions[tp]:self.positions[tp] + max_records - sum(map(len, polled.values()))]
+            if taken:
+                polled[tp] = taken
+                self.positions[tp] += len(taken)
+        return polled
+
+    def seek(self, tp, offset):
+        self.positions[tp] = offset
+
+    def commit(self, offsets):
+        self.committed.update({tp: meta.offset for tp, meta in offsets.items()})
+
+class TestKafkaClientProducer(unittest.TestCase):
+    def test_async_sends_resolve_on_flush(self):
+        producer = FakeProducer(fail_topics=("bad",))
+        client = KafkaClient(producer=producer)
+        delivered, errors = [], []
+        futures = [client.send_message("soil_moisture", {"i": i}, on_delivery=delivered.append) for i in range(3)]
+        client.send_message("bad", {}, on_error=errors.append)
+        client.send_message("bad", {})
+        self.assertEqual(producer.flushes, 0)
+        self.assertFalse(any(f.is_done for f in futures))
+        client.flush()
+        self.assertEqual(delivered, [0, 1, 2])
+        self.assertEqual(futures[2].value, 2)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(client.failed, 1)
+
+    def test_sync_mode_flushes_every_message(self):
+        producer = FakeProducer()
+        with KafkaClient(producer=producer, sync=True) as client:
+            self.assertTrue(client.send_message("weather_data", {"t": 20}).succeeded())
+            client.send_message("weather_data", {"t": 21}, sync=False)
+            self.assertEqual(producer.flushes, 1)
+        self.assertTrue(producer.closed)
+        self.assertEqual(len(producer.sent), 2)
+
+    def test_json_records_carry_content_type_header(self):
+        producer = FakeProducer()
+        client = KafkaClient(producer=producer)
+        client.send_message("soil_moisture", {"device_id": "d1", "moisture_level": 21.5})
+        client.flush()
+        _, (value, headers) = producer.sent[0]
+        self.assertEqual(headers, [("content-type", b"application/json;version=1")])
+        self.assertEqual(client.decoder.decode(value, headers), {"device_id": "d1", "moisture_level": 21.5})
+        # Records from producers that send no header are read as JSON
+        self.assertEqual(client.decoder.decode(b'{"a": 1}', []), {"a": 1})
+
+class TestKafkaClientBatchConsumer(unittest.TestCase):
+    def test_batches_are_columnar_and_committed_on_ack(self):
+        p0, p1 = TopicPartition("soil_moisture", 0), TopicPartition("soil_moisture", 1)
+        reading = lambda i: json.dumps({"device_id": f"d{i}", "timestamp": i, "moisture_level": i / 2,
+                                        "temperature": 20.0}).encode()
+        consumer = FakeConsumer({p0: [Record(i, reading(i)) for i in range(3)],
+                                 p1: [Record(i, reading(10 + i), [("content-type", b"application/json;version=1")])
+                                      for i in range(2)]})
+        client = KafkaClient(producer=FakeProducer())
+        client.start_consumer = lambda *args, **kwargs: consumer
+        batches = client.consume_batches("soil_moisture", max_records=4)
+
+        batch = next(batches)
+        self.assertEqual(len(batch), 4)
+        np.testing.assert_array_equal(batch["device_id"], ["d0", "d1", "d2", "d10"])
+        self.assertEqual(batch["timestamp"].dtype, np.int64)
+        np.testing.assert_array_equal(batch["moisture_level"], [0.0, 0.5, 1.0, 5.0])
+        self.assertTrue(np.isnan(batch["ph_level"]).all())
+        self.assertEqual(consumer.committed, {})
+
+        # Not acked, so the same records come back
+        batch = next(batches)
+        np.testing.assert_array_equal(batch["timestamp"], [0, 1, 2, 10])
+        batch.ack()
+        self.assertEqual(consumer.committed, {p0: 3, p1: 1})
+        batch = next(batches)
+        np.testing.assert_array_equal(batch["timestamp"], [11])
+        batch.ack()
+        self.assertEqual(consumer.committed, {p0: 3, p1: 2})
+
+    def test_columns_of_any_dtype(self):
+        tp = TopicPartition("weather_data", 0)
+        consumer = FakeConsumer({tp: [Record(0, b'{"temperature": 21.5, "humidity": null}')]})
+        client = KafkaClient(producer=FakeProducer())
+        client.start_consumer = lambda *args, **kwargs: consumer
+        batch = next(client.consume_batches("weather_data", columns=[("temperature", np.float32),
+                                                                      ("humidity", np.float32),
+                                                                      ("station", np.uint16)]))
+        self.assertEqual(batch["temperature"].dtype, np.float32)
+        self.assertEqual(batch["temperature"][0], 21.5)
+        self.assertTrue(np.isnan(batch["humidity"][0]))
+        self.assertEqual(batch["station"][0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+from agriml_system.python_ai.kafka_serializers import (
+    JsonSerializer, ProtobufSerializer, RecordDecoder, default_serializers, parse_content_type
+)
+
+PROTO_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "agriml_system", "proto")
+
+class TestKafkaSerializers(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Generate agriml_pb2 from the proto, as the service build does
+        # protoc runs in a subprocess; in-process it can crash next to TensorFlow's protobuf
+        try:
+            import grpc_tools  # noqa: F401
+        except ImportError:
+            raise unittest.SkipTest("grpcio-tools is not installed")
+        cls.out_dir = tempfile.TemporaryDirectory()
+        subprocess.run([sys.executable, "-m", "grpc_tools.protoc", f"-I{PROTO_DIR}",
+                        f"--python_out={cls.out_dir.name}", os.path.join(PROTO_DIR, "agriml.proto")], check=True)
+        sys.path.insert(0, cls.out_dir.name)
+        importlib.invalidate_caches()
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.path.remove(cls.out_dir.name)
+        sys.modules.pop("agriml_pb2", None)
+        cls.out_dir.cleanup()
+
+    def test_protobuf_round_trip_is_smaller_than_json(self):
+        reading = {"device_id": "edge-17", "moisture_level": 23.25, "timestamp": 1760000000,
+                   "temperature": 21.5, "ph_level": 6.75}
+        serializer = default_serializers("protobuf")["soil_moisture"]
+        data = serializer.serialize(reading)
+        self.assertLess(len(data), len(JsonSerializer().serialize(reading)))
+
+        content_type, params = parse_content_type(serializer.header)
+        self.assertEqual(content_type, "application/x-protobuf")
+        self.assertEqual(params, {"schema": "agriml.SoilMoistureData", "version": "1"})
+        decoded = RecordDecoder().decode(data, [("content-type", serializer.header)])
+        self.assertEqual(decoded, reading)
+
+    def test_polls_decode_straight_to_columns(self):
+        serializer = default_serializers("protobuf")["soil_moisture"]
+        readings = [{"device_id": f"edge-{i}", "moisture_level": i / 4, "timestamp": 1760000000 + i,
+                     "temperature": 20.0 + i, "ph_level": 6.5} for i in range(5)]
+        # One long enough to need a two-byte length prefix
+        readings[3]["device_id"] = "edge-" + "x" * 200
+        columns = [("device_id", str), ("timestamp", np.int64), ("moisture_level", np.float32),
+                   ("wind_speed", np.float32), ("flag", np.int16)]
+        values = [serializer.serialize(r) for r in readings]
+        headers = [[("content-type", serializer.header)]] * len(values)
+        decoded = RecordDecoder().decode_columns(values, headers, columns)
+        np.testing.assert_array_equal(decoded["device_id"], [r["device_id"] for r in readings])
+        np.testing.assert_array_equal(decoded["timestamp"], [r["timestamp"] for r in readings])
+        self.assertEqual(decoded["moisture_level"].dtype, np.float32)
+        np.testing.assert_array_equal(decoded["moisture_level"], [r["moisture_level"] for r in readings])
+        self.assertTrue(np.isnan(decoded["wind_speed"]).all())
+        np.testing.assert_array_equal(decoded["flag"], np.zeros(5, dtype=np.int16))
+
+        # A poll mixing JSON and protobuf records during a migration
+        values[1] = JsonSerializer().serialize({"device_id": "json-1", "timestamp": 7})
+        headers = list(headers)
+        headers[1] = []
+        mixed = RecordDecoder().decode_columns(values, headers, columns)
+        np.testing.assert_array_equal(mixed["timestamp"][:2], [1760000000, 7])
+        self.assertTrue(np.isnan(mixed["moisture_level"][1]))
+        self.assertEqual(mixed["moisture_level"][2], 0.5)
+
+    def test_unknown_formats_are_rejected(self):
+        decoder = RecordDecoder()
+        with self.assertRaises(ValueError):
+            decoder.decode(b"", [("content-type", b"application/x-protobuf;schema=other.Message")])
+        with self.assertRaises(ValueError):
+            decoder.decode(b"", [("content-type", b"text/csv")])
+        with self.assertRaises(ValueError):
+            default_serializers("avro")
+        self.assertEqual(ProtobufSerializer("WeatherData").header,
+                         b"application/x-protobuf;schema=agriml.WeatherData;version=1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from backend.metrics import MetricsRegistry, MetricsMiddleware, REQUESTS, LATENCY, IN_FLIGHT, stats_lines
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_histogram_exposition(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("demo_total", "Demo counter", ("route",))
+        histogram = registry.histogram("demo_seconds", "Demo latency", buckets=(0.1, 1.0))
+        counter.inc("/a")
+        counter.inc("/a")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        text = registry.render()
+        self.assertIn("# TYPE demo_total counter", text)
+        self.assertIn('demo_total{route="/a"} 2', text)
+        self.assertIn('demo_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('demo_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("demo_seconds_count 3", text)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("demo_total", "Demo", ("route",)).inc('a"b')
+        self.assertIn('demo_total{route="a\\"b"} 1', registry.render())
+
+    def test_middleware_records_route_template(self):
+        async def app(scope, receive, send):
+            scope["route"] = SimpleNamespace(path="/api/items/{item_id}")
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        before = REQUESTS.value("POST", "/api/items/{item_id}", "201")
+        scope = {"type": "http", "method": "POST", "path": "/api/items/7"}
+        asyncio.run(MetricsMiddleware(app)(scope, None, send))
+        self.assertEqual(REQUESTS.value("POST", "/api/items/{item_id}", "201"), before + 1)
+        self.assertGreaterEqual(LATENCY.count("POST", "/api/items/{item_id}"), 1)
+        self.assertEqual(IN_FLIGHT.value("unmatched"), 0)
+
+    def test_in_flight_is_labelled_by_route_template(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+        seen = []
+
+        @app.get("/api/fields/{field_id}")
+        async def field(field_id: int):
+            seen.append(IN_FLIGHT.value("/api/fields/{field_id}"))
+            return {}
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "GET", "path": "/api/fields/7", "raw_path": b"/api/fields/7",
+                 "root_path": "", "query_string": b"", "headers": [], "scheme": "http",
+                 "server": ("test", 80), "http_version": "1.1"}
+        asyncio.run(app(scope, receive, send))
+        self.assertEqual(seen, [1])
+        self.assertEqual(IN_FLIGHT.value("/api/fields/{field_id}"), 0)
+
+    def test_cumulative_stats_are_counters(self):
+        text = "\n".join(stats_lines("demo_cache", "Demo cache", {"size": 3, "hits": 10, "misses": 2},
+                                     cumulative=("hits", "misses")))
+        self.assertIn('# TYPE demo_cache gauge\ndemo_cache{stat="size"} 3', text)
+        self.assertIn("# TYPE demo_cache_events_total counter", text)
+        self.assertIn('demo_cache_events_total{event="hits"} 10', text)
+        self.assertNotIn('demo_cache{stat="hits"}', text)
+
+if __name__ == '__main__':
+    unittest.main()
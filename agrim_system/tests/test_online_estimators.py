@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from agriml_system.python_ai.advanced_features import crop_yield_prediction
+from agriml_system.python_ai.online_estimators import SensorStats, YieldEstimator
+
+class TestSensorStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.histories = {f"s{i}": rng.normal(30, 5, 40) + rng.normal(0, 0.5) * np.arange(40) for i in range(20)}
+
+    def feed(self, stats, per_batch):
+        # Interleave the sensors, with several readings of a sensor per batch
+        sensors = np.repeat(list(self.histories), 40).reshape(20, 40).T.reshape(-1)
+        values = np.array(list(self.histories.values())).T.reshape(-1)
+        for start in range(0, len(values), per_batch):
+            stats.update(sensors[start:start + per_batch], values[start:start + per_batch])
+
+    def test_matches_full_history_fits(self):
+        stats = SensorStats()
+        self.feed(stats, per_batch=70)
+        sensors = list(self.histories)
+        expected_slope = [np.polyfit(range(40), h, 1)[0] for h in self.histories.values()]
+        np.testing.assert_allclose(stats.slope(sensors), expected_slope, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(stats.mean(sensors), [np.mean(h) for h in self.histories.values()])
+        self.assertEqual(list(stats.count(sensors)), [40] * 20)
+
+    def test_batch_order_does_not_change_results(self):
+        one, many = SensorStats(half_life=10), SensorStats(half_life=10)
+        self.feed(one, per_batch=1)
+        self.feed(many, per_batch=300)
+        sensors = list(self.histories)
+        np.testing.assert_allclose(one.slope(sensors), many.slope(sensors))
+        np.testing.assert_allclose(one.ewma(sensors)[0], many.ewma(sensors)[0])
+
+    def test_zscore_flags_spike(self):
+        stats = SensorStats(alpha=0.2, warmup=5)
+        rng = np.random.default_rng(1)
+        z = stats.update(["a"] * 30, rng.normal(20, 1, 30))
+        self.assertTrue((z[:5] == 0).all())
+        spike = stats.update(["a", "b"], [40.0, np.nan])
+        self.assertGreater(spike[0], 5)
+        self.assertTrue(np.isnan(spike[1]))
+
+    def test_decay_follows_recent_trend(self):
+        t = np.arange(200.0)
+        values = np.where(t < 100, t, 200 - t)  # rises, then falls
+        plain, decayed = SensorStats(), SensorStats(half_life=10)
+        plain.update(["a"] * 200, values, t)
+        decayed.update(["a"] * 200, values, t)
+        self.assertLess(abs(plain.slope(["a"])[0]), 0.05)
+        self.assertLess(decayed.slope(["a"])[0], -0.9)
+
+    def test_snapshot_restore(self):
+        stats = SensorStats(half_life=5)
+        self.feed(stats, per_batch=100)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stats.npz")
+            stats.save(path)
+            restored = SensorStats.load(path)
+        self.assertEqual(restored.half_life, 5)
+        sensors = list(self.histories)
+        np.testing.assert_array_equal(restored.slope(sensors), stats.slope(sensors))
+        np.testing.assert_array_equal(restored.update(sensors, np.full(20, 30.0)),
+                                      stats.update(sensors, np.full(20, 30.0)))
+        with self.assertRaises(KeyError):
+            restored.slope(["missing"])
+
+class TestYieldEstimator(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.fields = [f"field-{i}" for i in range(50)]
+        self.true_coef = rng.uniform(0.5, 2.0, (50, 3))
+        self.X = rng.uniform(1, 10, (50, 12, 3))
+        self.y = np.einsum("fsi,fi->fs", self.X, self.true_coef) + rng.normal(0, 0.1, (50, 12))
+
+    def test_matches_lstsq_refit(self):
+        estimator = YieldEstimator(3, delta=1e8)
+        # One season (a row for every field) per update call
+        for season in range(12):
+            estimator.update(self.fields, self.X[:, season], self.y[:, season])
+        for f in (0, 17, 49):
+            expected = np.linalg.lstsq(self.X[f], self.y[f], rcond=None)[0]
+            np.testing.assert_allclose(estimator.coefficients([self.fields[f]])[0], expected, rtol=1e-5)
+            self.assertEqual(crop_yield_prediction({'features': self.X[f], 'yields': self.y[f]}),
+                             f"Estimated crop yield: {estimator.predict([self.fields[f]], self.X[f, -1])[0]:.2f} tons")
+        self.assertEqual(list(estimator.rows(self.fields[:2])), [12, 12])
+
+    def test_rows_of_one_field_in_one_call(self):
+        sequential, batched = YieldEstimator(3), YieldEstimator(3)
+        for season in range(12):
+            sequential.update(self.fields[:5], self.X[:5, season], self.y[:5, season])
+        batched.update(np.repeat(self.fields[:5], 12), self.X[:5].reshape(-1, 3), self.y[:5].reshape(-1))
+        np.testing.assert_allclose(batched.coefficients(self.fields[:5]), sequential.coefficients(self.fields[:5]))
+
+    def test_forgetting_tracks_changed_coefficients(self):
+        rng = np.random.default_rng(1)
+        X = rng.uniform(1, 10, (200, 2))
+        y = np.where(np.arange(200) < 100, X @ [1.0, 1.0], X @ [3.0, 0.5])
+        plain, forgetful = YieldEstimator(2), YieldEstimator(2, forgetting=0.9)
+        plain.update(["f"] * 200, X, y)
+        forgetful.update(["f"] * 200, X, y)
+        np.testing.assert_allclose(forgetful.coefficients(["f"])[0], [3.0, 0.5], atol=1e-3)
+        self.assertGreater(np.abs(plain.coefficients(["f"])[0] - [3.0, 0.5]).max(), 0.2)
+
+    def test_snapshot_restore(self):
+        estimator = YieldEstimator(3, forgetting=0.95)
+        estimator.update(self.fields, self.X[:, 0], self.y[:, 0])
+        restored = YieldEstimator.restore(estimator.snapshot())
+        self.assertEqual(restored.forgetting, 0.95)
+        np.testing.assert_array_equal(restored.update(self.fields, self.X[:, 1], self.y[:, 1]),
+                                      estimator.update(self.fields, self.X[:, 1], self.y[:, 1]))
+        np.testing.assert_array_equal(restored.predict(self.fields, self.X[:, 2]),
+                                      estimator.predict(self.fields, self.X[:, 2]))
+
+if __name__ == '__main__':
+    unittest.main()
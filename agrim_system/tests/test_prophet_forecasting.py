@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from agrim_system.python_ai import prophet_forecasting
+from agrim_system.python_ai.prophet_forecasting import (
+    COLD, FAILED, HIT, WARM, ProphetModelCache, fit_prophet, iter_prophet_forecasts
+)
+
+def hourly_series(hours, seed=0):
+    ds = pd.date_range("2024-01-01", periods=hours, freq="h")
+    noise = np.random.default_rng(seed).normal(0, 1, hours)
+    return pd.DataFrame({"ds": ds, "y": 20 + 5 * np.sin(np.arange(hours) * 2 * np.pi / 24) + noise})
+
+class TestProphetForecasting(unittest.TestCase):
+    def test_cache_hit_warm_and_cold(self):
+        df = hourly_series(24 * 14)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ProphetModelCache(tmp)
+            model, status = fit_prophet(df, "station-1", cache)
+            self.assertEqual(status, COLD)
+            cached, status = fit_prophet(df, "station-1", cache)
+            self.assertEqual(status, HIT)
+            np.testing.assert_allclose(cached.params["k"], model.params["k"])
+            # Appending rows refits from the previous parameters
+            _, status = fit_prophet(hourly_series(24 * 15), "station-1", cache)
+            self.assertEqual(status, WARM)
+            # Changed history, or changed model settings, fit from scratch
+            _, status = fit_prophet(hourly_series(24 * 15, seed=1), "station-1", cache)
+            self.assertEqual(status, COLD)
+            _, status = fit_prophet(hourly_series(24 * 15, seed=1), "station-1", cache, daily_seasonality=False)
+            self.assertEqual(status, COLD)
+
+    def test_many_stations_in_pool(self):
+        series = [(f"station-{i}", hourly_series(24 * 7, seed=i)) for i in range(3)]
+        # Too short to fit; fails on its own without stopping the other stations
+        series.insert(1, ("broken", hourly_series(1)))
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {station: (forecast, status) for station, forecast, status in
+                       iter_prophet_forecasts(iter(series), periods=12, cache_dir=tmp, workers=2, max_pending=2)}
+            self.assertEqual(sorted(results), ["broken", "station-0", "station-1", "station-2"])
+            self.assertEqual(results["broken"][1], FAILED)
+            self.assertIsInstance(results["broken"][0], ValueError)
+            forecast, status = results["station-0"]
+            self.assertEqual(status, COLD)
+            self.assertEqual(list(forecast.columns), ["ds", "yhat", "yhat_lower", "yhat_upper"])
+            self.assertEqual(len(forecast), 24 * 7 + 12)
+            again = list(iter_prophet_forecasts({"station-0": hourly_series(24 * 7, seed=0)}, periods=12,
+                                                cache_dir=tmp, workers=1))
+            self.assertEqual(again[0][2], HIT)
+            # yhat_lower/upper come from random sampling, the point forecast does not
+            pd.testing.assert_frame_equal(again[0][1][["ds", "yhat"]], forecast[["ds", "yhat"]])
+
+    def test_pool_is_replaced_without_max_tasks_per_child(self):
+        series = {f"station-{i}": hourly_series(24 * 3, seed=i) for i in range(3)}
+        pools = []
+        make_pool = prophet_forecasting._forecast_pool
+
+        def counting_pool(workers):
+            pools.append(make_pool(workers))
+            return pools[-1]
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(prophet_forecasting, "_RECYCLE_POOL", True), \
+                mock.patch.object(prophet_forecasting, "PROPHET_TASKS_PER_WORKER", 1), \
+                mock.patch.object(prophet_forecasting, "_forecast_pool", counting_pool):
+            results = list(iter_prophet_forecasts(series, periods=6, cache_dir=tmp, workers=1))
+        self.assertEqual(sorted(station for station, _, _ in results), sorted(series))
+        self.assertEqual({status for _, _, status in results}, {COLD})
+        # One station per pool with a single worker
+        self.assertEqual(len(pools), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from agriml_system.python_ai.result_cache import ResultCache
+
+class TestResultCache(unittest.TestCase):
+    def test_key_covers_image_crop_and_model_version(self):
+        cache_v1 = ResultCache(model_version="v1")
+        cache_v2 = ResultCache(model_version="v2")
+        key = cache_v1.key(b"image", "Wheat")
+        self.assertEqual(key, cache_v1.key(b"image", "Wheat"))
+        self.assertNotEqual(key, cache_v1.key(b"image", "Rice"))
+        self.assertNotEqual(key, cache_v1.key(b"image2", "Wheat"))
+        self.assertNotEqual(key, cache_v2.key(b"image", "Wheat"))
+        self.assertNotEqual(key, cache_v1.key(b"image", "Wheat", index_version="3f2a"))
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        cache = ResultCache(max_entries=10, max_bytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.get("a")
+        cache.put("c", b"1234")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"1234")
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], 10)
+
+    def test_disk_store_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "predictions.sqlite")
+            writer = ResultCache(disk_path=path)
+            reader = ResultCache(disk_path=path)
+            key = writer.key(b"frame", "Corn")
+            writer.put(key, b"prediction")
+            self.assertEqual(reader.get(key), b"prediction")
+            self.assertEqual(reader.get(key), b"prediction")
+            stats = reader.stats()
+            self.assertEqual(stats["disk_hits"], 1)
+            self.assertEqual(stats["hits"], 1)
+            self.assertIsNone(reader.get("missing"))
+            self.assertAlmostEqual(reader.stats()["hit_rate"], 2 / 3)
+            plan = writer._connection().execute(
+                "EXPLAIN QUERY PLAN SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET 10").fetchall()
+            self.assertIn("results_created", str(plan))
+
+if __name__ == '__main__':
+    unittest.main()
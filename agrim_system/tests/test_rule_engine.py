@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from agrim_system.python_ai.rule_engine import RuleTable, load_rules, rule_table
+from agrim_system.python_ai.soil_models import soil_erosion_prediction, soil_nutrient_deficiency_detection
+from agrim_system.python_ai.weather_models import climate_zone_classification
+
+def climate_zone_reference(temperature, rainfall):
+    # The if/elif chain the table replaced
+    if temperature > 25 and rainfall > 1000:
+        return "Tropical"
+    elif temperature > 15 and rainfall > 500:
+        return "Subtropical"
+    elif temperature > 5:
+        return "Temperate"
+    return "Cold"
+
+class TestRuleEngine(unittest.TestCase):
+    def test_vectorized_matches_scalar_chain(self):
+        rng = np.random.default_rng(0)
+        temperature = rng.integers(0, 35, 2000).astype(float)
+        rainfall = rng.choice([400, 500, 800, 1000, 1500], 2000).astype(float)
+        table = rule_table("climate_zone")
+        codes = table.evaluate({"temperature": temperature, "rainfall": rainfall})
+        self.assertEqual(codes.dtype, np.uint8)
+        expected = [climate_zone_reference(t, r) for t, r in zip(temperature, rainfall)]
+        self.assertEqual(list(table.render(codes)), expected)
+        self.assertEqual([climate_zone_classification(t, r) for t, r in zip(temperature[:50], rainfall[:50])],
+                         expected[:50])
+
+    def test_derived_columns_and_defaults(self):
+        self.assertEqual(soil_erosion_prediction({'slope': 6, 'rainfall': 10}), "High soil erosion risk")
+        self.assertEqual(soil_erosion_prediction({'slope': 5}), "Low soil erosion risk")
+        codes = rule_table("soil_erosion").evaluate({'slope': np.array([6.0, 3.0, 1.0]), 'rainfall': 10.0})
+        self.assertEqual(list(codes), [0, 1, 2])
+
+    def test_all_mode_joins_matches(self):
+        self.assertEqual(soil_nutrient_deficiency_detection({'nitrogen': 5, 'phosphorus': 3, 'potassium': 9}),
+                         "Nitrogen deficiency, Phosphorus deficiency")
+        self.assertEqual(soil_nutrient_deficiency_detection({'nitrogen': 20, 'phosphorus': 9, 'potassium': 9}),
+                         "No nutrient deficiencies detected")
+
+    def test_rules_file_overrides_a_table(self):
+        override = {"salinity_stress": {
+            "inputs": {"salinity_level": None},
+            "rules": [{"when": [["salinity_level", ">=", 8]], "label": "Severe"}],
+            "default": "Tolerable"
+        }}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rules.json")
+            with open(path, "w") as f:
+                json.dump(override, f)
+            rules = load_rules(path)
+        self.assertEqual(rules["salinity_stress"].evaluate_one({"salinity_level": 8}), "Severe")
+        self.assertEqual(rules["flooding_risk"].evaluate_one({"rainfall": 120, "soil_saturation": 1}),
+                         "High flooding risk")
+
+    def test_malformed_tables_are_rejected(self):
+        with self.assertRaises(ValueError):
+            RuleTable("bad", {"inputs": {"x": 0}, "rules": [{"when": [["y", ">", 1]], "label": "a"}],
+                              "default": "b"})
+        with self.assertRaises(ValueError):
+            RuleTable("bad", {"inputs": {"x": 0}, "rules": [{"when": [["x", "~", 1]], "label": "a"}],
+                              "default": "b"})
+        with self.assertRaises(KeyError):
+            rule_table("climate_zone").evaluate({"temperature": 20})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import signal
+import threading
+import time
+import unittest
+import numpy as np
+from agriml_system.python_ai.sharded_inference import ShardedInference, WorkerUnavailable, parse_cpu_sets
+
+def row_sums(batch):
+    return [(float(row.sum()), os.getpid()) for row in batch]
+
+def sum_predictor():
+    return row_sums
+
+def slow_row_sums(batch):
+    time.sleep(1.0)
+    return row_sums(batch)
+
+def slow_predictor():
+    return slow_row_sums
+
+def failing_predictor():
+    raise RuntimeError("no model")
+
+class TestShardedInference(unittest.TestCase):
+    def test_parse_cpu_sets(self):
+        self.assertEqual(parse_cpu_sets("0-1;2,4"), [{0, 1}, {2, 4}])
+        self.assertEqual(parse_cpu_sets(""), [])
+
+    def test_results_come_back_from_worker_processes(self):
+        cpus = sorted(os.sched_getaffinity(0))[:1] if hasattr(os, "sched_getaffinity") else None
+        pool = ShardedInference(sum_predictor, (4, 4), num_workers=2, slots_per_worker=4,
+                                cpu_sets=[set(cpus)] if cpus else None)
+        try:
+            pool.wait_ready(timeout=60)
+            inputs = [np.full((4, 4), i, dtype=np.float32) for i in range(20)]
+            futures = [pool.submit(x) for x in inputs]
+            results = [f.result(timeout=30) for f in futures]
+            self.assertEqual([r[0] for r in results], [16.0 * i for i in range(20)])
+            self.assertNotIn(os.getpid(), {r[1] for r in results})
+            filled = pool.submit_into(lambda out: out.fill(2.0)).result(timeout=30)
+            self.assertEqual(filled[0], 32.0)
+            stats = pool.stats()
+            self.assertEqual(stats["items"], 21)
+            self.assertEqual(stats["workers"][0]["cpus"], cpus or None)
+        finally:
+            pool.close()
+
+    def test_failed_worker_start_is_reported(self):
+        pool = ShardedInference(failing_predictor, (2,), num_workers=1)
+        try:
+            with self.assertRaises(RuntimeError):
+                pool.wait_ready(timeout=60)
+        finally:
+            pool.close()
+
+    def start_full(self, num_workers):
+        # One slot per worker, all taken by slow batches
+        pool = ShardedInference(slow_predictor, (2,), num_workers=num_workers, slots_per_worker=1)
+        pool.wait_ready(timeout=60)
+        first = [pool.submit(np.ones(2, dtype=np.float32)) for _ in range(num_workers)]
+        return pool, first
+
+    def test_waiters_fail_when_the_last_worker_dies(self):
+        pool, first = self.start_full(1)
+        try:
+            with self.assertRaises(TimeoutError):
+                pool.submit(np.ones(2, dtype=np.float32), timeout=0.01)
+            waiting = []
+            thread = threading.Thread(target=lambda: waiting.append(self.submit_error(pool)))
+            thread.start()
+            os.kill(pool.stats()["workers"][0]["pid"], signal.SIGKILL)
+            thread.join(30)
+            self.assertFalse(thread.is_alive())
+            self.assertIsInstance(waiting[0], WorkerUnavailable)
+            self.assertIsInstance(first[0].exception(timeout=30), WorkerUnavailable)
+        finally:
+            pool.close()
+
+    def test_waiters_move_to_a_live_worker(self):
+        pool, first = self.start_full(2)
+        try:
+            pids = [w["pid"] for w in pool.stats()["workers"]]
+            os.kill(pids[0], signal.SIGKILL)
+            # Waits for worker 1 to free its slot rather than for the dead worker
+            total, pid = pool.submit(np.full(2, 3.0, dtype=np.float32)).result(timeout=30)
+            self.assertEqual((total, pid), (6.0, pids[1]))
+        finally:
+            pool.close()
+
+    def submit_error(self, pool):
+        try:
+            pool.submit(np.ones(2, dtype=np.float32))
+        except Exception as e:
+            return e
+
+if __name__ == '__main__':
+    unittest.main()
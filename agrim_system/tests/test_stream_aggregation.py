@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+from kafka.structs import TopicPartition
+from agriml_system.python_ai.kafka_integration import RecordBatch
+from agriml_system.python_ai.stream_aggregation import WindowAggregator, run_stage
+
+def readings(devices, times, moisture, temperature=None):
+    return {
+        "device_id": np.array(devices),
+        "timestamp": np.array(times, dtype=np.int64),
+        "moisture_level": np.array(moisture, dtype=np.float64),
+        "temperature": np.array(temperature if temperature is not None else [30.0] * len(times))
+    }
+
+class TestWindowAggregator(unittest.TestCase):
+    def test_tumbling_windows_close_on_watermark(self):
+        drought_calls = []
+        aggregator = WindowAggregator(["moisture_level", "temperature"], size=10, allowed_lateness=2,
+                                      drought_fn=lambda d: drought_calls.append(d) or "Moderate drought risk")
+        self.assertEqual(aggregator.process(readings(["a", "a", "b"], [0, 5, 3], [10, 20, 40])), [])
+        closed = aggregator.process(readings(["a"], [12], [30]))
+        self.assertEqual([(w["key"], w["start"], w["end"]) for w in closed], [("a", 0, 10), ("b", 0, 10)])
+        stats = closed[0]["fields"]["moisture_level"]
+        self.assertEqual((stats["count"], stats["mean"], stats["min"], stats["max"]), (2, 15.0, 10.0, 20.0))
+        self.assertAlmostEqual(stats["slope"], 2.0)
+        self.assertEqual(closed[0]["drought"], "Moderate drought risk")
+        self.assertEqual(drought_calls[0], {"soil_moisture": [15.0], "temperature": [30.0]})
+
+        # t=7 falls only in the closed [0, 10) window
+        aggregator.process(readings(["a"], [7], [0]))
+        self.assertEqual(aggregator.stats()["late_records"], 1)
+        self.assertEqual([w["start"] for w in aggregator.flush()], [10])
+
+    def test_sliding_windows_and_trend_over_closed_windows(self):
+        trends = []
+        aggregator = WindowAggregator(["moisture_level"], size=10, slide=5,
+                                      trend_fn=lambda series: trends.append(series) or "Decreasing soil moisture trend")
+        closed = aggregator.process(readings(["a"] * 4, [1, 6, 11, 16], [40, 30, 20, 10]))
+        self.assertEqual([w["end"] for w in closed], [10, 15])
+        closed += aggregator.flush()
+        self.assertEqual([(w["start"], w["fields"]["moisture_level"]["count"]) for w in closed],
+                         [(0, 2), (5, 2), (10, 2), (15, 1)])
+        self.assertEqual(trends[-1], [35.0, 25.0, 15.0, 10.0])
+        self.assertEqual(closed[-1]["trend"], "Decreasing soil moisture trend")
+
+    def test_memory_is_bounded_by_keys_and_windows(self):
+        aggregator = WindowAggregator(["moisture_level"], size=60, max_keys=100)
+        rng = np.random.default_rng(0)
+        for start in range(0, 6000, 600):
+            times = np.sort(rng.integers(start, start + 600, 1000))
+            devices = [f"d{i}" for i in rng.integers(0, 500, 1000)]
+            aggregator.process(readings(devices, times, rng.random(1000), rng.random(1000)))
+        stats = aggregator.stats()
+        self.assertLessEqual(stats["keys"], 100)
+        self.assertLessEqual(stats["open_windows"], 100 * 11)
+        self.assertGreater(stats["evicted_keys"], 0)
+        # Heap entries of evicted windows are dropped rather than kept until their end
+        self.assertLessEqual(len(aggregator._closing), 2 * stats["open_windows"] + 64)
+
+    def test_reopened_window_after_eviction_closes_once(self):
+        aggregator = WindowAggregator(["moisture_level"], size=10, max_keys=1)
+        aggregator.process(readings(["a"], [1], [10]))
+        aggregator.process(readings(["b"], [2], [20]))
+        aggregator.process(readings(["a"], [3], [30]))
+        closed = aggregator.flush()
+        self.assertEqual([(w["key"], w["fields"]["moisture_level"]["count"]) for w in closed], [("a", 1)])
+        self.assertEqual(aggregator._closing, [])
+
+    def test_run_stage_commits_batches_once_their_windows_are_emitted(self):
+        tp = TopicPartition("soil_moisture", 0)
+
+        class Consumer:
+            committed = []
+
+            def commit(self, offsets):
+                self.committed.append({tp: meta.offset for tp, meta in offsets.items()})
+
+        class Client:
+            def consume_batches(self, topic, group_id, redeliver=True):
+                assert not redeliver
+                consumer = Consumer()
+                for first, times in ((0, [0, 5]), (2, [12]), (3, [25])):
+                    yield RecordBatch(consumer, readings(["a"] * len(times), times, [1.0] * len(times)),
+                                      {tp: (first, first + len(times) - 1)})
+
+        emitted = []
+        run_stage(Client(), "soil_moisture", WindowAggregator(["moisture_level"], size=10),
+                  emit=lambda w: emitted.append(w["start"]) or Consumer.committed.append(("emit", w["start"])))
+        self.assertEqual(emitted, [0, 10])
+        # [0, 10) is emitted before the first batch commits; the last batch's window is still open
+        self.assertEqual(Consumer.committed, [("emit", 0), {tp: 2}, ("emit", 10), {tp: 3}])
+
+    def test_slide_must_divide_size(self):
+        with self.assertRaises(ValueError):
+            WindowAggregator(["moisture_level"], size=10, slide=3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import unittest
+from typing import Optional
+from pydantic import BaseModel, Field
+from backend.models.irrigation_model import predict_irrigation, predict_irrigation_batch
+from backend.streaming import iter_lines, stream_recommendations
+
+class Row(BaseModel):
+    soil_moisture: float = Field(..., ge=0, le=100)
+    temperature: float
+    humidity: float = Field(..., ge=0, le=100)
+    crop_type: str
+    rainfall: Optional[float] = 0.0
+
+async def byte_chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def run_stream(data, fmt, chunk_size=1000, read_size=7):
+    async def collect():
+        out = b""
+        async for part in stream_recommendations(byte_chunks(data, read_size), fmt, Row, predict_irrigation_batch, chunk_size):
+            out += part
+        return [json.loads(line) for line in out.decode().splitlines()]
+    return asyncio.run(collect())
+
+class TestStreaming(unittest.TestCase):
+    def test_iter_lines_across_chunk_boundaries(self):
+        async def collect():
+            return [line async for line in iter_lines(byte_chunks("ab\r\ncd\né\nfinal".encode(), 3)) if line is not None]
+        self.assertEqual(asyncio.run(collect()), ["ab", "cd", "é", "final"])
+
+    def test_ndjson_matches_scalar_and_reports_errors(self):
+        rows = [
+            {"soil_moisture": 20, "temperature": 35, "humidity": 40, "crop_type": "Wheat"},
+            {"soil_moisture": 120, "temperature": 35, "humidity": 40, "crop_type": "Wheat"},
+            {"soil_moisture": 70, "temperature": 25, "humidity": 60, "crop_type": "Rice", "rainfall": 15},
+        ]
+        data = "\n".join(json.dumps(r) for r in rows).encode()
+        results = run_stream(data, "ndjson", chunk_size=2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], predict_irrigation(**rows[0]))
+        self.assertEqual(results[1]["line"], 2)
+        self.assertIn("soil_moisture", results[1]["error"])
+        self.assertEqual(results[2], predict_irrigation(**rows[2]))
+
+    def test_csv_input(self):
+        data = b"soil_moisture,temperature,humidity,crop_type,rainfall\n20,35,40,Corn,\n50,25,60,Tomato,12\n"
+        results = run_stream(data, "csv")
+        self.assertEqual(results[0], predict_irrigation(20, 35, 40, "Corn", 0.0))
+        self.assertEqual(results[1], predict_irrigation(50, 25, 60, "Tomato", 12))
+
+    def test_csv_missing_columns(self):
+        results = run_stream(b"soil_moisture,temperature\n20,35\n", "csv")
+        self.assertEqual(len(results), 1)
+        self.assertIn("crop_type", results[0]["error"])
+
+if __name__ == '__main__':
+    unittest.main()
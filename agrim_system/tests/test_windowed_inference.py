@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from agrim_system.python_ai.windowed_inference import (
+    create_history, forecast_windows, keras_predictor, open_history, station_windows
+)
+from agrim_system.python_ai.weather_models import build_lstm_weather_forecast_model
+
+def summary(batch):
+    # Last hour's first feature and the window mean of the second
+    return np.stack([batch[:, -1, 0], batch[:, :, 1].mean(axis=1)], axis=1)
+
+class TestWindowedInference(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history_path = os.path.join(self.tmp.name, "history.npy")
+        history = create_history(self.history_path, stations=37, hours=60)
+        history[:] = np.random.default_rng(0).normal(size=history.shape)
+        history.flush()
+        del history
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_windows_are_views(self):
+        history = open_history(self.history_path)
+        windows = station_windows(history, window=24, stride=2)
+        self.assertEqual(windows.shape, (37, 19, 24, 5))
+        self.assertTrue(np.shares_memory(windows, history))
+        np.testing.assert_array_equal(windows[3, 4], history[3, 8:32])
+        np.testing.assert_array_equal(station_windows(history, last=1)[:, 0], history[:, -24:])
+
+    def test_batches_match_per_window_loop(self):
+        output_path = os.path.join(self.tmp.name, "forecast.npy")
+        history = open_history(self.history_path)
+        # Batch sizes that split stations unevenly and that span several stations
+        for batch_size in (10, 100, 5000):
+            output = forecast_windows(summary, self.history_path, output_path, stride=3, batch_size=batch_size)
+            windows = station_windows(history, stride=3)
+            self.assertEqual(output.shape, (37, 13, 2))
+            for station in (0, 20, 36):
+                np.testing.assert_allclose(output[station], summary(np.asarray(windows[station])), rtol=1e-6)
+
+    def test_keras_lstm_latest_window(self):
+        model = build_lstm_weather_forecast_model()
+        output = forecast_windows(keras_predictor(model), self.history_path,
+                                  os.path.join(self.tmp.name, "lstm.npy"), last=1, batch_size=16)
+        self.assertEqual(output.shape, (37, 1, 1))
+        expected = model.predict(np.asarray(open_history(self.history_path)[:, -24:]), verbose=0)
+        np.testing.assert_allclose(output[:, 0], expected, rtol=1e-4, atol=1e-5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Deadline-aware admission control for inference requests.
+At most max_in_flight requests run at once; the rest wait in a bounded queue
+ordered by priority class and then by deadline. A request is shed up front
+when its deadline is closer than the estimated service time or when the queue
+is full of more important work, and it expires if it waits so long that it
+could no longer finish in time, so no inference is spent on answers the
+client will never read.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+SHED = "shed"
+EXPIRED = "expired"
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+class _Waiter:
+    __slots__ = ("key", "state")
+
+    def __init__(self, key):
+        self.key = key
+        self.state = "queued"
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+class AdmissionController:
+    def __init__(self, max_in_flight=32, max_queue=128, priorities=("high", "normal", "low"),
+                 default_priority="normal", initial_estimate=0.05, smoothing=0.2):
+        """
+        priorities lists the class names from most to least important; unknown
+        names get default_priority. The service time estimate starts at
+        initial_estimate seconds and follows an EWMA of observed run times.
+        """
+        if default_priority not in priorities:
+            raise ValueError(f"default_priority {default_priority!r} is not one of {list(priorities)}")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.priorities = list(priorities)
+        self.default_priority = default_priority
+        self.estimate = initial_estimate
+        self.smoothing = smoothing
+        self._cond = threading.Condition()
+        self._heap = []
+        self._queued = 0
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.shed = {name: 0 for name in self.priorities}
+        self.expired = {name: 0 for name in self.priorities}
+
+    def priority_of(self, name):
+        return name if name in self.priorities else self.default_priority
+
+    @contextmanager
+    def admit(self, priority=None, time_remaining=None):
+        """
+        Hold an inference slot for the body of the with block. time_remaining
+        is the caller's remaining deadline in seconds (None for no deadline).
+        Raises AdmissionRejected with reason SHED or EXPIRED.
+        """
+        release = self.acquire(priority, time_remaining)
+        try:
+            yield
+        finally:
+            release()
+
+    def acquire(self, priority=None, time_remaining=None):
+        """
+        Take a slot as admit() does, for work that finishes on another thread
+        (e.g. a streamed frame). Returns a function to call once when it is done.
+        """
+        self._acquire(self.priority_of(priority), time_remaining)
+        start = time.monotonic()
+        return lambda: self._release(time.monotonic() - start)
+
+    def _acquire(self, priority, time_remaining):
+        deadline = None if time_remaining is None else time.monotonic() + time_remaining
+        with self._cond:
+            if time_remaining is not None and time_remaining < self.estimate:
+                self.shed[priority] += 1
+                raise AdmissionRejected(SHED, f"Deadline in {time_remaining * 1e3:.0f}ms is shorter than "
+                                              f"the estimated {self.estimate * 1e3:.0f}ms service time")
+            if self._in_flight < self.max_in_flight and self._queued == 0:
+                self._in_flight += 1
+                self.admitted += 1
+                return
+            waiter = _Waiter((self.priorities.index(priority), deadline if deadline is not None else float("inf"),
+                              next(self._seq)))
+            if self._queued >= self.max_queue:
+                # Full: make room by dropping the least important queued request if this one outranks it
+                worst = max((w for w in self._heap if w.state == "queued"), default=None)
+                if worst is None or not waiter < worst:
+                    self.shed[priority] += 1
+                    raise AdmissionRejected(SHED, "Admission queue is full")
+                worst.state = SHED
+                self._queued -= 1
+                self.shed[self.priorities[worst.key[0]]] += 1
+                self._cond.notify_all()
+            heapq.heappush(self._heap, waiter)
+            self._queued += 1
+            while waiter.state == "queued":
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - self.estimate - time.monotonic()
+                    if timeout <= 0:
+                        waiter.state = EXPIRED
+                        self._queued -= 1
+                        self.expired[priority] += 1
+                        break
+                self._cond.wait(timeout)
+            if waiter.state == SHED:
+                raise AdmissionRejected(SHED, "Displaced from the admission queue by higher priority work")
+            if waiter.state == EXPIRED:
+                raise AdmissionRejected(EXPIRED, "Deadline would pass before inference could finish")
+
+    def _release(self, elapsed):
+        with self._cond:
+            self.estimate += self.smoothing * (elapsed - self.estimate)
+            self._in_flight -= 1
+            while self._heap and self._in_flight < self.max_in_flight:
+                waiter = heapq.heappop(self._heap)
+                if waiter.state != "queued":
+                    continue
+                waiter.state = "admitted"
+                self._queued -= 1
+                self._in_flight += 1
+                self.admitted += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "expired": dict(self.expired),
+                "estimate_ms": self.estimate * 1e3
+            }
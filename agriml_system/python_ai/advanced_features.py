@@ -190,3 +190,139 @@ def pest_control_strategy(pest_data):
     elif pest_type == 'caterpillar':
         return "Use Bacillus thuringiensis"
     return "Consult pest control expert"
+
+# Batch variants
+# Each takes a DataFrame or a mapping of equal-length NumPy columns (missing
+# columns take the scalar function's default) and returns small integer codes
+# and/or numeric arrays instead of strings. render(codes, LABELS) turns codes
+# into the scalar functions' messages when text is actually needed.
+
+# soil_nutrient_analysis_batch codes are a bit mask of these deficiencies
+NITROGEN_DEFICIENT, PHOSPHORUS_DEFICIENT, POTASSIUM_DEFICIENT = 1, 2, 4
+NUTRIENT_LABELS = tuple(
+    ", ".join(alert for bit, alert in ((NITROGEN_DEFICIENT, "Nitrogen deficiency detected"),
+                                       (PHOSPHORUS_DEFICIENT, "Phosphorus deficiency detected"),
+                                       (POTASSIUM_DEFICIENT, "Potassium deficiency detected"))
+              if code & bit) or "Nutrient levels normal"
+    for code in range(8))
+DISEASE_RISK_LABELS = ("Low disease spread risk", "Moderate disease spread risk", "High disease spread risk")
+FERTILIZER_LABELS = ("Soil pH is optimal", "Apply lime to increase soil pH", "Apply sulfur to decrease soil pH")
+CROP_HEALTH_LABELS = ("Poor crop health", "Moderate health", "Healthy crop")
+WATER_STRESS_LABELS = ("No water stress", "Water stress detected")
+PEST_POPULATION_LABELS = ("Pest population normal", "High pest population expected")
+TEMPERATURE_ANOMALY_LABELS = ("Temperature normal", "High temperature anomaly detected")
+RAINFALL_LABELS = ("Rainfall normal", "Heavy rainfall expected")
+MOISTURE_TREND_LABELS = ("Stable or increasing soil moisture", "Decreasing soil moisture trend")
+GROWTH_STAGE_LABELS = ("Vegetative stage", "Flowering stage", "Maturity stage")
+IRRIGATION_EFFICIENCY_LABELS = ("No irrigation data", "Irrigation improvement needed", "Efficient irrigation")
+CROP_VARIETY_LABELS = ("Recommend standard variety", "Recommend drought-resistant variety")
+PEST_CONTROL_TYPES = ("aphid", "caterpillar")
+PEST_CONTROL_LABELS = ("Consult pest control expert", "Use insecticidal soap", "Use Bacillus thuringiensis")
+
+def _column(data, name, default):
+    if name in data:
+        return np.asarray(data[name], dtype=np.float64)
+    return np.float64(default)
+
+def _series_rows(series):
+    series = np.asarray(series, dtype=np.float64)
+    if series.ndim != 2:
+        raise ValueError("Expected a 2-D array with one series per row")
+    return series
+
+def render(codes, labels):
+    """Messages for an array of codes, as an object array of strings."""
+    return np.asarray(labels, dtype=object)[np.asarray(codes, dtype=np.intp)]
+
+def soil_nutrient_analysis_batch(sensor_data):
+    """Deficiency bit mask per row; render with NUTRIENT_LABELS."""
+    nitrogen = _column(sensor_data, 'nitrogen', 0)
+    phosphorus = _column(sensor_data, 'phosphorus', 0)
+    potassium = _column(sensor_data, 'potassium', 0)
+    return ((nitrogen < 10) * NITROGEN_DEFICIENT + (phosphorus < 5) * PHOSPHORUS_DEFICIENT
+            + (potassium < 5) * POTASSIUM_DEFICIENT).astype(np.uint8)
+
+def irrigation_need_forecast_batch(weather_data, soil_moisture):
+    """Recommended irrigation volume per row in liters; render with render_irrigation_need."""
+    temp = _column(weather_data, 'temperature', 25)
+    rainfall = _column(weather_data, 'rainfall', 0)
+    base_need = 30 - np.asarray(soil_moisture, dtype=np.float64)
+    base_need = np.where(base_need > 0, base_need, 0.0)
+    base_need = np.where(temp > 35, base_need * 1.5, base_need)
+    return np.where(rainfall > 5, base_need * 0.5, base_need)
+
+def render_irrigation_need(volume):
+    return np.array([f"Recommended irrigation volume: {v:.2f} liters" for v in np.asarray(volume).tolist()],
+                    dtype=object)
+
+def disease_spread_modeling_batch(disease_data, weather_data):
+    """(codes, risk): risk scores and their DISEASE_RISK_LABELS level."""
+    humidity = _column(weather_data, 'humidity', 50)
+    temp = _column(weather_data, 'temperature', 25)
+    infected_area = _column(disease_data, 'infected_area', 0)
+    risk = infected_area * (humidity / 100) * (temp / 30)
+    return (np.where(risk > 10, 2, np.where(risk > 5, 1, 0)).astype(np.uint8), risk)
+
+def fertilizer_recommendation_batch(soil_data):
+    """Codes into FERTILIZER_LABELS."""
+    ph = _column(soil_data, 'ph', 7)
+    return np.where(ph < 6, 1, np.where(ph > 7.5, 2, 0)).astype(np.uint8)
+
+def crop_health_index_batch(sensor_data):
+    """Codes into CROP_HEALTH_LABELS."""
+    ndvi = _column(sensor_data, 'ndvi', 0.5)
+    return np.where(ndvi > 0.7, 2, np.where(ndvi > 0.4, 1, 0)).astype(np.uint8)
+
+def water_stress_detection_batch(soil_moisture):
+    """Codes into WATER_STRESS_LABELS."""
+    return (np.asarray(soil_moisture, dtype=np.float64) < 15).astype(np.uint8)
+
+def pest_population_forecast_batch(historical_counts):
+    """(codes, mean) per row of a 2-D array of counts; codes into PEST_POPULATION_LABELS."""
+    avg_count = np.mean(_series_rows(historical_counts), axis=1)
+    return (avg_count > 50).astype(np.uint8), avg_count
+
+def temperature_anomaly_detection_batch(temperature_data):
+    """(codes, mean) per row of a 2-D array of temperatures; codes into TEMPERATURE_ANOMALY_LABELS."""
+    mean_temp = np.mean(_series_rows(temperature_data), axis=1)
+    return (mean_temp > 35).astype(np.uint8), mean_temp
+
+def rainfall_prediction_batch(weather_history):
+    """(codes, mean) per row of a 2-D array of rainfall; codes into RAINFALL_LABELS."""
+    avg_rainfall = np.mean(_series_rows(weather_history), axis=1)
+    return (avg_rainfall > 10).astype(np.uint8), avg_rainfall
+
+def soil_moisture_trend_batch(soil_moisture_data):
+    """(codes, slope) per row of a 2-D array of moisture series; codes into MOISTURE_TREND_LABELS."""
+    series = _series_rows(soil_moisture_data)
+    # polyfit fits every column of a 2-D y at once with the same solver as the scalar version
+    trend = np.polyfit(np.arange(series.shape[1]), series.T, 1)[0]
+    return (trend < 0).astype(np.uint8), trend
+
+def crop_growth_stage_prediction_batch(sensor_data):
+    """Codes into GROWTH_STAGE_LABELS."""
+    days = _column(sensor_data, 'days_after_planting', 0)
+    return np.where(days < 30, 0, np.where(days < 60, 1, 2)).astype(np.uint8)
+
+def irrigation_efficiency_analysis_batch(irrigation_data):
+    """(codes, efficiency): yield per unit of water (NaN without water) and IRRIGATION_EFFICIENCY_LABELS codes."""
+    water_used = _column(irrigation_data, 'water_used', 0)
+    yield_amount = _column(irrigation_data, 'yield', 0)
+    no_data = water_used == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        efficiency = np.where(no_data, np.nan, yield_amount / water_used)
+    return np.where(no_data, 0, np.where(efficiency > 1, 2, 1)).astype(np.uint8), efficiency
+
+def crop_variety_recommendation_batch(soil_data, climate_data):
+    """Codes into CROP_VARIETY_LABELS."""
+    ph = _column(soil_data, 'ph', 7)
+    avg_temp = _column(climate_data, 'avg_temp', 25)
+    return ((ph < 6) & (avg_temp > 30)).astype(np.uint8)
+
+def pest_control_strategy_batch(pest_data):
+    """Codes into PEST_CONTROL_LABELS."""
+    pest_type = np.asarray(pest_data['type'], dtype=object) if 'type' in pest_data else np.asarray('unknown')
+    codes = np.zeros(pest_type.shape, dtype=np.uint8)
+    for code, name in enumerate(PEST_CONTROL_TYPES, 1):
+        codes[pest_type == name] = code
+    return codes
@@ -0,0 +1,490 @@
+"""
+Asyncio Kafka producer and consumer.
+The producer bounds the number of unacknowledged sends, so a fast coroutine
+waits for the broker instead of queueing without limit. The consumer polls in
+one task and hands each partition's records to that partition's own worker
+through a bounded queue: partitions are processed in parallel, records of a
+partition strictly in order, and a partition whose worker falls behind is
+paused until it catches up, without holding back the others. Offsets are
+committed for processed records only, and records of partitions revoked in a
+rebalance are dropped rather than processed.
+Both sides talk to either a real cluster (kafka-python, driven from a thread)
+or InMemoryBroker, a single-process stand-in for tests and benchmarks.
+"""
+
+import asyncio
+import functools
+import itertools
+import os
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from kafka.structs import TopicPartition
+
+try:
+    from .kafka_integration import WIRE_FORMAT, commit_offset
+    from .kafka_serializers import CONTENT_TYPE_HEADER, JsonSerializer, RecordDecoder, default_serializers
+except ImportError:
+    from kafka_integration import WIRE_FORMAT, commit_offset
+    from kafka_serializers import CONTENT_TYPE_HEADER, JsonSerializer, RecordDecoder, default_serializers
+
+# Unacknowledged sends per producer before send() waits
+MAX_IN_FLIGHT = int(os.getenv("KAFKA_ASYNC_MAX_IN_FLIGHT", "1000"))
+# Records buffered per partition between the poller and the partition's worker
+PARTITION_QUEUE_SIZE = int(os.getenv("KAFKA_ASYNC_PARTITION_QUEUE_SIZE", "1000"))
+# Processed offsets are committed at most this often (seconds)
+COMMIT_INTERVAL = float(os.getenv("KAFKA_ASYNC_COMMIT_INTERVAL", "1.0"))
+
+RecordMetadata = namedtuple("RecordMetadata", "topic partition offset")
+# value is decoded when the record reaches a handler
+AsyncRecord = namedtuple("AsyncRecord", "topic partition offset timestamp key value headers")
+
+class InMemoryBroker:
+    """
+    Topics with a fixed number of partitions held in lists, with per-group
+    committed offsets. Keyed records go to the partition of the key's hash,
+    others round robin, as with Kafka's default partitioner.
+    """
+    def __init__(self, num_partitions=4):
+        self.num_partitions = num_partitions
+        self._logs = {}
+        self._committed = {}
+        self._round_robin = itertools.count()
+        self._appended = asyncio.Event()
+
+    def _partitions(self, topic):
+        partitions = self._logs.get(topic)
+        if partitions is None:
+            partitions = self._logs[topic] = [[] for _ in range(self.num_partitions)]
+        return partitions
+
+    def partition_for(self, key):
+        if key is None:
+            return next(self._round_robin) % self.num_partitions
+        return zlib.crc32(key) % self.num_partitions
+
+    async def produce(self, topic, value, key=None, headers=None):
+        partition = self.partition_for(key)
+        log = self._partitions(topic)[partition]
+        offset = len(log)
+        log.append(AsyncRecord(topic, partition, offset, int(time.time() * 1000), key, value, headers or []))
+        # Wake pollers waiting for data, then arm a fresh event for the next wait
+        self._appended.set()
+        self._appended = asyncio.Event()
+        return RecordMetadata(topic, partition, offset)
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def end_offsets(self, topic):
+        return {TopicPartition(topic, p): len(log) for p, log in enumerate(self._partitions(topic))}
+
+    def committed(self, group_id, tp):
+        return self._committed.get((group_id, tp))
+
+    def consumer(self, topic, group_id="agriml-group"):
+        """A poll source over every partition of topic, starting at the group's committed offsets."""
+        return InMemorySource(self, topic, group_id)
+
+class InMemorySource:
+    def __init__(self, broker, topic, group_id):
+        self.broker = broker
+        self.group_id = group_id
+        self.positions = {tp: broker.committed(group_id, tp) or 0 for tp in broker.end_offsets(topic)}
+        self.paused = set()
+        # Set by AsyncKafkaConsumer; returns the processed offsets of revoked partitions
+        self.on_revoked = None
+
+    def pause(self, tp):
+        self.paused.add(tp)
+
+    def resume(self, tp):
+        self.paused.discard(tp)
+
+    def revoke(self, tps):
+        """Take partitions away as a rebalance would, committing what was processed first."""
+        offsets = self.on_revoked(set(tps)) if self.on_revoked is not None else {}
+        for tp, offset in offsets.items():
+            self.broker._committed[(self.group_id, tp)] = offset
+        for tp in tps:
+            self.positions.pop(tp, None)
+            self.paused.discard(tp)
+
+    def _read(self, max_records):
+        polled = {}
+        for tp, position in list(self.positions.items()):
+            if max_records <= 0:
+                break
+            if tp in self.paused:
+                continue
+            log = self.broker._partitions(tp.topic)[tp.partition]
+            records = log[position:position + max_records]
+            if records:
+                polled[tp] = records
+                self.positions[tp] = position + len(records)
+                max_records -= len(records)
+        return polled
+
+    async def poll(self, max_records, timeout_ms):
+        polled = self._read(max_records)
+        if not polled:
+            try:
+                await asyncio.wait_for(self.broker._appended.wait(), timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                return {}
+            polled = self._read(max_records)
+        return polled
+
+    async def commit(self, offsets):
+        for tp, offset in offsets.items():
+            self.broker._committed[(self.group_id, tp)] = offset
+
+    async def close(self):
+        pass
+
+class KafkaProducerBackend:
+    """kafka-python KafkaProducer whose delivery futures resolve on the event loop."""
+    def __init__(self, producer):
+        self.producer = producer
+
+    async def produce(self, topic, value, key=None, headers=None):
+        loop = asyncio.get_running_loop()
+        delivered = loop.create_future()
+        future = self.producer.send(topic, value, key=key, headers=headers)
+        future.add_callback(lambda m: loop.call_soon_threadsafe(_resolve, delivered, m, None))
+        future.add_errback(lambda e: loop.call_soon_threadsafe(_resolve, delivered, None, e))
+        metadata = await delivered
+        return RecordMetadata(metadata.topic, metadata.partition, metadata.offset)
+
+    async def flush(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.producer.flush)
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.producer.close)
+
+def _resolve(future, result, exception):
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+class _RevocationListener(ConsumerRebalanceListener):
+    def __init__(self, source):
+        self.source = source
+
+    def on_partitions_revoked(self, revoked):
+        self.source._revoked(revoked)
+
+    def on_partitions_assigned(self, assigned):
+        pass
+
+class KafkaPollSource:
+    """
+    kafka-python KafkaConsumer polled and committed on one dedicated thread,
+    as the consumer is not thread-safe. Auto-commit must be off. pause() and
+    resume() take effect on that thread before the next poll. Subscribe with
+    listener=source.rebalance_listener() so processed offsets of revoked
+    partitions are committed while the consumer still owns them.
+    """
+    def __init__(self, consumer):
+        self.consumer = consumer
+        self.paused = set()
+        # Set by AsyncKafkaConsumer; returns the processed offsets of revoked partitions
+        self.on_revoked = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="kafka-poll")
+
+    async def _call(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs))
+
+    def rebalance_listener(self):
+        return _RevocationListener(self)
+
+    def pause(self, tp):
+        self.paused.add(tp)
+
+    def resume(self, tp):
+        self.paused.discard(tp)
+
+    def _revoked(self, revoked):
+        # Runs on the poll thread, inside poll(), before the partitions move
+        if self.on_revoked is None:
+            return
+        offsets = self.on_revoked(set(revoked))
+        if offsets:
+            self.consumer.commit({tp: commit_offset(offset) for tp, offset in offsets.items()})
+
+    def _poll(self, paused, max_records, timeout_ms):
+        assigned = self.consumer.assignment()
+        current = self.consumer.paused()
+        to_pause = (paused & assigned) - current
+        to_resume = current - paused
+        if to_pause:
+            self.consumer.pause(*to_pause)
+        if to_resume:
+            self.consumer.resume(*to_resume)
+        return self.consumer.poll(timeout_ms=timeout_ms, max_records=max_records)
+
+    async def poll(self, max_records, timeout_ms):
+        return await self._call(self._poll, frozenset(self.paused), max_records, timeout_ms)
+
+    async def commit(self, offsets):
+        await self._call(self.consumer.commit, {tp: commit_offset(offset) for tp, offset in offsets.items()})
+
+    async def close(self):
+        await self._call(self.consumer.close)
+        self._executor.shutdown()
+
+def kafka_source(topic, group_id="agriml-group", bootstrap_servers="localhost:9092"):
+    source = KafkaPollSource(KafkaConsumer(bootstrap_servers=bootstrap_servers, group_id=group_id,
+                                           auto_offset_reset="earliest", enable_auto_commit=False))
+    source.consumer.subscribe([topic], listener=source.rebalance_listener())
+    return source
+
+class AsyncKafkaProducer:
+    def __init__(self, backend, max_in_flight=MAX_IN_FLIGHT, wire_format=WIRE_FORMAT, serializers=None):
+        """
+        backend is an InMemoryBroker or a KafkaProducerBackend. serializers
+        map topics to serializers as for KafkaClient.
+        """
+        self.backend = backend
+        self.serializers = default_serializers(wire_format) if serializers is None else dict(serializers)
+        self.json_serializer = JsonSerializer()
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending = set()
+        self.failed = 0
+
+    async def send(self, topic, message, key=None):
+        """
+        Queue message for topic and return an asyncio future for its
+        RecordMetadata. Waits first while max_in_flight sends are unacknowledged.
+        """
+        await self._slots.acquire()
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        serializer = self.serializers.get(topic, self.json_serializer)
+        delivery = asyncio.ensure_future(self.backend.produce(
+            topic, serializer.serialize(message), key=key, headers=[(CONTENT_TYPE_HEADER, serializer.header)]))
+        self._pending.add(delivery)
+        delivery.add_done_callback(self._delivered)
+        return delivery
+
+    async def send_and_wait(self, topic, message, key=None):
+        return await (await self.send(topic, message, key))
+
+    def _delivered(self, delivery):
+        self._pending.discard(delivery)
+        self._slots.release()
+        if not delivery.cancelled() and delivery.exception() is not None:
+            self.failed += 1
+            print(f"Kafka delivery failed: {delivery.exception()}")
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def flush(self):
+        """Wait until every queued message has been delivered or has failed."""
+        if self._pending:
+            await asyncio.wait(list(self._pending))
+        await self.backend.flush()
+
+    async def close(self):
+        await self.flush()
+        await self.backend.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+class _PartitionWorker:
+    def __init__(self, tp):
+        self.tp = tp
+        # Unbounded: the poller pauses the partition instead of waiting for room
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.processed = 0
+        self.next_offset = None
+        self.paused = False
+        self.revoked = False
+
+class AsyncKafkaConsumer:
+    def __init__(self, source, handler, queue_size=PARTITION_QUEUE_SIZE, commit_interval=COMMIT_INTERVAL,
+                 executor=None, max_poll_records=500, poll_timeout_ms=100):
+        """
+        source is InMemoryBroker.consumer(...), kafka_source(...) or another
+        object with async poll/commit/close. handler gets one AsyncRecord at
+        a time per partition: a coroutine function is awaited on the loop;
+        a plain function runs in executor (the default thread pool, or e.g. a
+        ProcessPoolExecutor for CPU-bound work, in which case it and its
+        results must be picklable). A handler exception stops the consumer
+        and is raised from run(); the failing record is not committed.
+        A partition with queue_size records queued is paused at the source
+        and resumed once its queue is half drained.
+        """
+        self.source = source
+        self.handler = handler
+        self.queue_size = queue_size
+        self.commit_interval = commit_interval
+        self.executor = executor
+        self.max_poll_records = max_poll_records
+        self.poll_timeout_ms = poll_timeout_ms
+        self.decoder = RecordDecoder()
+        self._is_coroutine = asyncio.iscoroutinefunction(handler)
+        self._workers = {}
+        self._committed = {}
+        self._stopping = None
+        self._loop = None
+        self.polled = 0
+        self.commit_failures = 0
+
+    async def run(self):
+        """Consume until stop() is called, then drain queued records and commit."""
+        self._stopping = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self.source.on_revoked = self._revoke
+        failed = self._loop.create_future()
+        committer = asyncio.ensure_future(self._commit_periodically())
+        try:
+            poller = asyncio.ensure_future(self._poll(failed))
+            stop = asyncio.ensure_future(self._stopping.wait())
+            await asyncio.wait([poller, stop, failed], return_when=asyncio.FIRST_COMPLETED)
+            self._stopping.set()
+            stop.cancel()
+            if failed.done():
+                poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+            if not failed.done():
+                poller.result()
+                drained = asyncio.ensure_future(self._drain())
+                await asyncio.wait([drained, failed], return_when=asyncio.FIRST_COMPLETED)
+                drained.cancel()
+        finally:
+            committer.cancel()
+            for worker in self._workers.values():
+                worker.task.cancel()
+            await asyncio.gather(committer, *(w.task for w in self._workers.values()), return_exceptions=True)
+            await self.commit()
+            await self.source.close()
+        if failed.done():
+            raise failed.result()
+
+    async def _drain(self):
+        # Workers finish what was already polled
+        for worker in self._workers.values():
+            worker.queue.put_nowait(None)
+        await asyncio.gather(*(w.task for w in self._workers.values()))
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _poll(self, failed):
+        while not self._stopping.is_set():
+            polled = await self.source.poll(self.max_poll_records, self.poll_timeout_ms)
+            for tp, records in polled.items():
+                worker = self._workers.get(tp)
+                if worker is None:
+                    worker = self._workers[tp] = _PartitionWorker(tp)
+                    worker.task = asyncio.ensure_future(self._work(worker, failed))
+                self.polled += len(records)
+                for record in records:
+                    worker.queue.put_nowait(record)
+                if not worker.paused and worker.queue.qsize() >= self.queue_size:
+                    # Stop fetching this partition only; the others keep polling
+                    worker.paused = True
+                    self.source.pause(tp)
+
+    async def _work(self, worker, failed):
+        loop = asyncio.get_running_loop()
+        while True:
+            record = await worker.queue.get()
+            if record is None or worker.revoked:
+                return
+            if worker.paused and worker.queue.qsize() <= self.queue_size // 2:
+                worker.paused = False
+                self.source.resume(worker.tp)
+            try:
+                decoded = AsyncRecord(record.topic, record.partition, record.offset, record.timestamp,
+                                      record.key, self.decoder.decode(record.value, record.headers),
+                                      record.headers)
+                if self._is_coroutine:
+                    await self.handler(decoded)
+                else:
+                    await loop.run_in_executor(self.executor, self.handler, decoded)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not failed.done():
+                    failed.set_result(e)
+                return
+            worker.processed += 1
+            worker.next_offset = record.offset + 1
+
+    async def _commit_periodically(self):
+        while True:
+            await asyncio.sleep(self.commit_interval)
+            try:
+                await self.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Offsets stay uncommitted and are retried on the next tick
+                self.commit_failures += 1
+                print(f"Kafka offset commit failed: {e}")
+
+    async def commit(self):
+        """Commit the offset after the last processed record of every partition that advanced."""
+        offsets = {tp: w.next_offset for tp, w in self._workers.items()
+                   if w.next_offset is not None and not w.revoked and self._committed.get(tp) != w.next_offset}
+        if offsets:
+            await self.source.commit(offsets)
+            self._committed.update(offsets)
+
+    def _revoke(self, tps):
+        """
+        Source callback for partitions taken away in a rebalance, possibly
+        from the source's poll thread. Returns the offsets processed so far so
+        the source can commit them before giving the partitions up; queued
+        records of those partitions are dropped and their workers stopped.
+        """
+        offsets = {}
+        for tp in tps:
+            worker = self._workers.get(tp)
+            if worker is None:
+                continue
+            worker.revoked = True
+            if worker.next_offset is not None and self._committed.get(tp) != worker.next_offset:
+                offsets[tp] = worker.next_offset
+        self._loop.call_soon_threadsafe(self._drop_workers, tps)
+        return offsets
+
+    def _drop_workers(self, tps):
+        for tp in tps:
+            worker = self._workers.pop(tp, None)
+            if worker is None:
+                continue
+            self._committed.pop(tp, None)
+            self.source.resume(tp)
+            # An in-flight record is abandoned too; the partition's new owner processes it again
+            worker.task.cancel()
+
+    def stats(self):
+        return {
+            "polled": self.polled,
+            "processed": sum(w.processed for w in self._workers.values()),
+            "partitions": {f"{tp.topic}-{tp.partition}": {"processed": w.processed, "queued": w.queue.qsize(),
+                                                           "committed": self._committed.get(tp)}
+                           for tp, w in self._workers.items()}
+        }
@@ -0,0 +1,121 @@
+"""
+Dynamic server-side micro-batching for model inference.
+Concurrent callers submit single inputs; a scheduler thread groups them into
+one batch (up to max_batch_size, or whatever arrived within max_wait_us of the
+first item), runs a single batched forward pass and fans the results back out.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_us=2000, name="batcher",
+                 input_shape=None, dtype=np.float32):
+        """
+        predict_fn takes an array of stacked inputs (batch on axis 0) and
+        returns a sequence with one result per row. When input_shape is given,
+        batches are stacked into one preallocated buffer instead of a fresh
+        array per batch; predict_fn must not keep a reference to it.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self._buffer = None
+        if input_shape is not None:
+            self._buffer = np.empty((max_batch_size,) + tuple(input_shape), dtype=dtype)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.size_histogram = {}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, x):
+        """
+        Queue one input (without a batch axis) and return a Future for its result.
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((x, future))
+        return future
+
+    def predict(self, x, timeout=None):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(x).result(timeout)
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the sentinel back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            live = [(x, f) for x, f in batch if f.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                inputs = [x for x, _ in live]
+                if self._buffer is not None:
+                    batch_array = np.stack(inputs, out=self._buffer[:len(inputs)])
+                else:
+                    batch_array = np.stack(inputs)
+                results = self.predict_fn(batch_array)
+                if len(results) != len(live):
+                    raise ValueError(f"predict_fn returned {len(results)} results for {len(live)} inputs")
+                for (_, future), result in zip(live, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in live:
+                    future.set_exception(e)
+            self._record(len(live))
+
+    def _record(self, size):
+        with self._stats_lock:
+            self.batches += 1
+            self.items += size
+            self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_us": self.max_wait * 1e6,
+                "queue_depth": self._queue.qsize(),
+                "size_histogram": dict(sorted(self.size_histogram.items()))
+            }
+
+    def close(self, timeout=None):
+        """Stop accepting work, finish queued batches and stop the scheduler thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,75 @@
+"""
+Benchmark the crop image preprocessing paths.
+Compares the original full-resolution decode + resize + img_to_array +
+expand_dims path with ImagePreprocessor (reduced-size JPEG decode into a
+preallocated float32 buffer), both per image and for thread-parallel batches.
+
+Usage: python benchmark_preprocessing.py [--width 4000 --height 3000 --batch 32]
+"""
+
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from image_preprocessing import ImagePreprocessor
+
+def reference_preprocess(image_bytes):
+    # The original path: full decode, resize, img_to_array, expand_dims
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    image = image.resize((64, 64))
+    image = np.asarray(image, dtype=np.float32)
+    return np.expand_dims(image, axis=0)
+
+def make_jpeg(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    # Smooth gradients plus noise compress like a field photo rather than pure noise
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels = np.clip(base + rng.integers(-20, 20, size=(height, width, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+def timeit(fn, repeat):
+    fn()  # warmup
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    jpeg = make_jpeg(args.width, args.height)
+    images = [jpeg] * args.batch
+    preprocessor = ImagePreprocessor(size=(64, 64), num_threads=args.threads)
+    buffer = np.empty((args.batch,) + preprocessor.shape, dtype=np.float32)
+    single = np.empty(preprocessor.shape, dtype=np.float32)
+
+    print(f"{args.width}x{args.height} JPEG ({len(jpeg) / 1e6:.1f} MB), batch of {args.batch}, {args.threads} threads")
+    ref_single = timeit(lambda: reference_preprocess(jpeg), args.repeat)
+    fast_single = timeit(lambda: preprocessor.decode_into(jpeg, single), args.repeat)
+    ref_batch = timeit(lambda: np.concatenate([reference_preprocess(b) for b in images]), max(1, args.repeat // 2))
+    fast_batch = timeit(lambda: preprocessor.decode_batch(images, out=buffer), max(1, args.repeat // 2))
+
+    print(f"{'path':<32}{'per image (ms)':>16}{'speedup':>10}")
+    print(f"{'reference (full decode)':<32}{ref_single * 1e3:>16.2f}{1.0:>10.1f}")
+    print(f"{'draft decode into buffer':<32}{fast_single * 1e3:>16.2f}{ref_single / fast_single:>10.1f}")
+    print(f"{'reference, batch (serial)':<32}{ref_batch * 1e3 / args.batch:>16.2f}{ref_single * args.batch / ref_batch:>10.1f}")
+    print(f"{'draft decode, batch (threads)':<32}{fast_batch * 1e3 / args.batch:>16.2f}{ref_single * args.batch / fast_batch:>10.1f}")
+
+    diff = np.abs(reference_preprocess(jpeg)[0] - preprocessor.decode(jpeg))
+    print(f"mean abs pixel difference vs reference: {diff.mean():.2f} (max {diff.max():.0f})")
+    preprocessor.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,261 @@
 import grpc
 from concurrent import futures
+import functools
+import os
+import queue
+import threading
 import time
 import agriml_pb2
 import agriml_pb2_grpc
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 import tensorflow as tf
 import numpy as np
 from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input
-from tensorflow.keras.preprocessing.image import img_to_array
-from PIL import Image
-import io
-from cnn_knn_models import CNNModel, KNNModel
+from cnn_knn_models import CNNModel, load_artifacts, read_manifest
+from embedding_index import EmbeddingIndex
+from batching import MicroBatcher
+from sharded_inference import ShardedInference, WorkerUnavailable, parse_cpu_sets
+from admission import AdmissionController, AdmissionRejected
+from image_preprocessing import ImagePreprocessor
+from result_cache import ResultCache
 
-_ONE_DAY_IN_SECONDS = 60 * 60 * 24
+# Micro-batching of concurrent DetectDisease calls into one CNN forward pass
+MAX_BATCH_SIZE = int(os.getenv("DISEASE_MAX_BATCH_SIZE", "32"))
+MAX_BATCH_WAIT_US = int(os.getenv("DISEASE_MAX_BATCH_WAIT_US", "2000"))
+STATS_INTERVAL_SECONDS = int(os.getenv("DISEASE_STATS_INTERVAL_SECONDS", "60"))
+# Frames of one DetectDiseaseStream call that may be queued or in inference at once
+STREAM_MAX_IN_FLIGHT = int(os.getenv("DISEASE_STREAM_MAX_IN_FLIGHT", "64"))
+# Threads decoding streamed frames in parallel
+DECODE_THREADS = int(os.getenv("DISEASE_DECODE_THREADS", "4"))
+# Versioned model artifacts (see cnn_knn_models.save_artifacts); LATEST is used when no version is set
+ARTIFACT_DIR = os.getenv("DISEASE_ARTIFACT_DIR")
+MODEL_VERSION = os.getenv("DISEASE_MODEL_VERSION")
+# Batch sizes run once at startup so graph tracing happens before the server reports ready
+WARMUP_BATCH_SIZES = [int(b) for b in os.getenv("DISEASE_WARMUP_BATCH_SIZES", "1,8,32").split(",") if b.strip()]
+SERVICE_NAME = "agriml.CropDiseaseDetectionService"
+# Content-hash result cache; set DISEASE_CACHE_DIR to share it between processes
+CACHE_MAX_ENTRIES = int(os.getenv("DISEASE_CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("DISEASE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DIR = os.getenv("DISEASE_CACHE_DIR")
+# Neighbours voting in the KNN classification over CNN embeddings
+KNN_NEIGHBORS = int(os.getenv("DISEASE_KNN_NEIGHBORS", "3"))
+# Multi-process serving: with DISEASE_INFERENCE_WORKERS > 0 inference runs in that many
+# worker processes fed through shared memory, pinned per DISEASE_WORKER_CPUS (e.g. "0-1;2-3")
+INFERENCE_WORKERS = int(os.getenv("DISEASE_INFERENCE_WORKERS", "0"))
+WORKER_CPUS = parse_cpu_sets(os.getenv("DISEASE_WORKER_CPUS", ""))
+WORKER_SLOTS = int(os.getenv("DISEASE_WORKER_SLOTS", "64"))
+# Longest wait for a free shared-memory slot before a request fails with UNAVAILABLE
+WORKER_SLOT_TIMEOUT_SECONDS = float(os.getenv("DISEASE_WORKER_SLOT_TIMEOUT_SECONDS", "5"))
+# Admission control for DetectDisease: requests beyond ADMISSION_MAX_IN_FLIGHT wait in a bounded
+# queue ordered by the priority class in the x-priority metadata, then by deadline
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("DISEASE_ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("DISEASE_ADMISSION_QUEUE_SIZE", "32"))
+PRIORITY_CLASSES = [p.strip() for p in os.getenv("DISEASE_PRIORITY_CLASSES", "high,normal,low").split(",") if p.strip()]
+DEFAULT_PRIORITY = os.getenv("DISEASE_DEFAULT_PRIORITY", "normal")
+PRIORITY_METADATA_KEY = "x-priority"
+# Server threads, also the cap on concurrent RPCs; gRPC rejects calls beyond it with
+# RESOURCE_EXHAUSTED instead of queueing them where no deadline is checked
+SERVER_THREADS = int(os.getenv("DISEASE_SERVER_THREADS", "64"))
+# Class index order of the CNN output and of the KNN reference labels
+DISEASE_NAMES = ['DiseaseA', 'DiseaseB', 'DiseaseC', 'DiseaseD', 'DiseaseE']
+
+def load_models(artifact_dir, model_version):
+    """
+    Load CNN and KNN models from saved artifacts when available, otherwise
+    build untrained ones. Returns (cnn_model, knn_model, model_version).
+    """
+    if artifact_dir:
+        cnn_model, knn_model, manifest = load_artifacts(artifact_dir, model_version)
+        model_version = manifest["version"]
+        print(f"Loaded model artifacts version {model_version} from {artifact_dir}")
+    else:
+        print("DISEASE_ARTIFACT_DIR not set; building untrained models")
+        cnn_model = CNNModel()
+        knn_model = EmbeddingIndex(cnn_model.embedding_dim)
+        model_version = model_version or "untrained"
+    if not isinstance(knn_model, EmbeddingIndex):
+        print("Artifacts carry no embedding index; KNN starts empty and the CNN prediction is used")
+        knn_model = EmbeddingIndex(cnn_model.embedding_dim)
+    return cnn_model, knn_model, model_version
+
+def predict_disease_batch(cnn_model, knn_model, knn_neighbors, batch):
+    """
+    CNN forward pass plus a batched KNN lookup of the penultimate-layer
+    embeddings. Returns one (cnn_pred, knn_pred) pair per row; knn_pred is
+    -1 while the index holds no labelled references.
+    """
+    cnn_preds, embeddings = cnn_model.predict_with_embeddings(batch)
+    knn_preds = knn_model.classify(embeddings, k=knn_neighbors)
+    return list(zip(cnn_preds, knn_preds))
+
+def warmup_predictor(predict_fn, input_shape, batch_sizes):
+    """
+    Run inference at each serving batch size so TensorFlow traces and
+    allocates before real traffic arrives.
+    """
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        predict_fn(np.zeros((batch_size,) + tuple(input_shape), dtype=np.float32))
+        print(f"Warmup at batch size {batch_size} took {time.perf_counter() - start:.2f}s")
+
+def worker_predictor(artifact_dir, model_version, knn_neighbors, input_shape, warmup_batch_sizes):
+    """
+    Predictor factory run in each ShardedInference worker process: sizes
+    TensorFlow's thread pool to the cores the worker is pinned to, loads the
+    models and warms them up.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        tf.config.threading.set_intra_op_parallelism_threads(len(os.sched_getaffinity(0)))
+    cnn_model, knn_model, _ = load_models(artifact_dir, model_version)
+    predict_fn = functools.partial(predict_disease_batch, cnn_model, knn_model, knn_neighbors)
+    warmup_predictor(predict_fn, input_shape, warmup_batch_sizes)
+    return predict_fn
 
 class CropDiseaseDetectionServicer(agriml_pb2_grpc.CropDiseaseDetectionServiceServicer):
-    def __init__(self):
-        # Load CNN and KNN models
-        self.cnn_model = CNNModel()
-        self.knn_model = KNNModel()
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_batch_wait_us=MAX_BATCH_WAIT_US,
+                 stream_max_in_flight=STREAM_MAX_IN_FLIGHT, decode_threads=DECODE_THREADS,
+                 result_cache=None, artifact_dir=ARTIFACT_DIR, model_version=MODEL_VERSION,
+                 knn_neighbors=KNN_NEIGHBORS, inference_workers=INFERENCE_WORKERS,
+                 worker_cpus=WORKER_CPUS, worker_slots=WORKER_SLOTS, admission=None,
+                 worker_slot_timeout=WORKER_SLOT_TIMEOUT_SECONDS):
+        self.knn_neighbors = knn_neighbors
+        self.worker_slot_timeout = worker_slot_timeout
+        if admission is None:
+            admission = AdmissionController(max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queue=ADMISSION_QUEUE_SIZE,
+                                            priorities=PRIORITY_CLASSES, default_priority=DEFAULT_PRIORITY)
+        self.admission = admission
+        self.preprocessor = ImagePreprocessor(size=(64, 64), num_threads=decode_threads)
+        self.sharded = inference_workers > 0
+        if self.sharded:
+            # Models live in the worker processes; this process decodes frames into
+            # their shared-memory rings and only needs the version for cache keys
+            self.cnn_model = self.knn_model = None
+            if artifact_dir:
+                self.model_version = read_manifest(artifact_dir, model_version)["version"]
+            else:
+                print("DISEASE_ARTIFACT_DIR not set; each inference worker builds its own untrained models")
+                self.model_version = model_version or "untrained"
+            factory = functools.partial(worker_predictor, artifact_dir, self.model_version if artifact_dir else None,
+                                        knn_neighbors, self.preprocessor.shape, WARMUP_BATCH_SIZES)
+            self.batcher = ShardedInference(factory, self.preprocessor.shape, num_workers=inference_workers,
+                                            slots_per_worker=worker_slots, max_batch_size=max_batch_size,
+                                            cpu_sets=worker_cpus, name="disease-worker")
+        else:
+            self.cnn_model, self.knn_model, self.model_version = load_models(artifact_dir, model_version)
+            self.batcher = MicroBatcher(self.predict_batch, max_batch_size=max_batch_size,
+                                        max_wait_us=max_batch_wait_us, name="cnn-batcher",
+                                        input_shape=self.preprocessor.shape)
+        self.stream_max_in_flight = stream_max_in_flight
+        if result_cache is None:
+            result_cache = ResultCache(
+                max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, model_version=self.model_version,
+                disk_path=os.path.join(CACHE_DIR, f"predictions-{self.model_version}.sqlite") if CACHE_DIR else None)
+        self.result_cache = result_cache
+
+    def warmup(self, batch_sizes=WARMUP_BATCH_SIZES):
+        """
+        Warm up the models before real traffic arrives. Inference workers warm
+        up at WARMUP_BATCH_SIZES as they start, so in sharded mode this waits
+        for all of them.
+        """
+        if self.sharded:
+            self.batcher.wait_ready()
+        else:
+            warmup_predictor(self.predict_batch, self.preprocessor.shape, batch_sizes)
 
-        # Dummy training or loading weights can be added here
+    def predict_batch(self, batch):
+        return predict_disease_batch(self.cnn_model, self.knn_model, self.knn_neighbors, batch)
 
     def preprocess_image(self, image_bytes):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        image = image.resize((64, 64))
-        image = img_to_array(image)
-        image = np.expand_dims(image, axis=0)
-        return image
+        return self.preprocessor.decode(image_bytes)[np.newaxis]
+
+    def submit_image(self, image_bytes):
+        """
+        Decode an image and queue it for batched inference; returns a Future of
+        the (cnn_pred, knn_pred) pair. In sharded mode the image is decoded
+        straight into a worker's shared-memory slot, waiting at most
+        worker_slot_timeout for one.
+        """
+        if self.sharded:
+            return self.batcher.submit_into(lambda out: self.preprocessor.decode_into(image_bytes, out),
+                                            timeout=self.worker_slot_timeout)
+        return self.batcher.submit(self.preprocess_image(image_bytes)[0])
+
+    def cache_key(self, image_bytes, crop_type):
+        # Workers load their index from the artifacts and never change it; here it grows with inserts
+        index_version = self.knn_model.version if self.knn_model is not None else ""
+        return self.result_cache.key(image_bytes, crop_type, index_version)
+
+    def add_references(self, images, labels):
+        """
+        Embed encoded images with the CNN and add them to the KNN index under
+        their integer labels. Later requests see them at once, and the index
+        version in their cache keys changes, so results cached before are not
+        served. Returns the number of references in the index.
+        """
+        if self.sharded:
+            raise RuntimeError("Inference workers load the KNN index from the artifacts; "
+                               "publish a new artifact version to add references")
+        if len(images) != len(labels):
+            raise ValueError("images and labels must have the same length")
+        if len(images):
+            _, embeddings = self.cnn_model.predict_with_embeddings(self.preprocessor.decode_batch(images))
+            self.knn_model.add(embeddings, labels)
+        return self.knn_model.ntotal
+
+    def AddReferences(self, request, context):
+        unknown = sorted({image.disease_name for image in request.images} - set(DISEASE_NAMES))
+        if unknown:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Unknown disease names: {', '.join(unknown)}")
+        if self.sharded:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION,
+                          "References cannot be added while inference runs in worker processes")
+        try:
+            references = self.add_references([image.image_data for image in request.images],
+                                             [DISEASE_NAMES.index(image.disease_name) for image in request.images])
+        except OSError as e:
+            # PIL raises UnidentifiedImageError (an OSError) for undecodable images
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Cannot decode reference image: {e}")
+        return agriml_pb2.ReferenceUpdate(references=references, index_version=self.knn_model.version)
 
     def DetectDisease(self, request, context):
         image_bytes = request.image_data
         crop_type = request.crop_type
 
-        input_data = self.preprocess_image(image_bytes)
+        cache_key = self.cache_key(image_bytes, crop_type)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return agriml_pb2.DiseasePrediction.FromString(cached)
+
+        metadata = dict(context.invocation_metadata())
+        try:
+            with self.admission.admit(metadata.get(PRIORITY_METADATA_KEY), context.time_remaining()):
+                # CNN and KNN predictions, batched with other in-flight requests
+                preds = self.submit_image(image_bytes).result()
+        except AdmissionRejected as e:
+            # Both shed and expired requests mean the server is overloaded
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        except (WorkerUnavailable, TimeoutError) as e:
+            context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
+        return self.finish_prediction(cache_key, preds)
 
-        # CNN prediction
-        cnn_pred = self.cnn_model.predict(input_data)[0]
+    def finish_prediction(self, cache_key, preds):
+        prediction = self.build_prediction(preds)
+        self.result_cache.put(cache_key, prediction.SerializeToString())
+        return prediction
 
-        # Dummy KNN feature vector (replace with real features)
-        knn_features = np.array([[0.5, 0.3, 0.2]])
-        knn_pred = self.knn_model.predict(knn_features)[0]
+    def build_prediction(self, preds, request_id=""):
+        cnn_pred, knn_pred = preds
 
         # Integration logic
-        if cnn_pred == knn_pred:
+        if knn_pred < 0:
+            final_pred = cnn_pred  # No labelled references yet
+        elif cnn_pred == knn_pred:
             final_pred = cnn_pred
         else:
             final_pred = cnn_pred  # Prefer CNN prediction
 
-        disease_names = ['DiseaseA', 'DiseaseB', 'DiseaseC', 'DiseaseD', 'DiseaseE']
-        disease_name = disease_names[final_pred]
+        disease_name = DISEASE_NAMES[final_pred]
 
         confidence = 0.9  # Dummy confidence
 
@@ -61,19 +268,136 @@ class CropDiseaseDetectionServicer(agriml_pb2_grpc.CropDiseaseDetectionServiceSe
         }
         treatment = treatments.get(disease_name, 'No treatment available')
 
-        return agriml_pb2.DiseasePrediction(disease_name=disease_name, confidence=confidence, treatment=treatment)
+        return agriml_pb2.DiseasePrediction(disease_name=disease_name, confidence=confidence,
+                                            treatment=treatment, request_id=request_id)
+
+    def submit_frame(self, request, priority=None, time_remaining=None):
+        """
+        Decode one streamed frame on the decode pool and then queue it for
+        batched inference. Returns (cache_key, future); the future holds the
+        cached DiseasePrediction on a cache hit and the (cnn_pred, knn_pred)
+        pair otherwise. Decode failures are reported through it as well.
+        A cache miss first passes admission control like DetectDisease, which
+        raises AdmissionRejected, and holds its slot until the future is done.
+        """
+        result = futures.Future()
+        cache_key = self.cache_key(request.image_data, request.crop_type)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            result.set_result(agriml_pb2.DiseasePrediction.FromString(cached))
+            return cache_key, result
+        release = self.admission.acquire(priority, time_remaining)
+        result.add_done_callback(lambda _: release())
+
+        def copy_outcome(source):
+            if source.exception() is not None:
+                result.set_exception(source.exception())
+            else:
+                result.set_result(source.result())
+
+        def submitted(submit_future):
+            if submit_future.exception() is not None:
+                result.set_exception(submit_future.exception())
+            else:
+                submit_future.result().add_done_callback(copy_outcome)
+
+        self.preprocessor.pool.submit(self.submit_image, request.image_data).add_done_callback(submitted)
+        return cache_key, result
+
+    def DetectDiseaseStream(self, request_iterator, context):
+        """
+        Bidirectional stream of frames and predictions. A reader thread decodes
+        incoming frames and submits them to the batcher while this generator
+        yields results in arrival order. At most stream_max_in_flight frames are
+        outstanding, so a fast client is throttled through gRPC flow control
+        instead of growing server memory. Frames not answered from the cache
+        are admitted one by one at the call's x-priority and remaining
+        deadline; a rejected frame ends the call with RESOURCE_EXHAUSTED after
+        the predictions of the frames before it.
+        """
+        priority = dict(context.invocation_metadata()).get(PRIORITY_METADATA_KEY)
+        pending = queue.Queue(maxsize=self.stream_max_in_flight)
+
+        def put(item):
+            while context.is_active():
+                try:
+                    pending.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_frames():
+            try:
+                for request in request_iterator:
+                    try:
+                        submitted = self.submit_frame(request, priority, context.time_remaining())
+                    except AdmissionRejected as e:
+                        put(e)
+                        return
+                    if not put((request.request_id,) + submitted):
+                        return
+            except Exception:
+                # The client went away mid-stream; stop reading
+                pass
+            finally:
+                put(None)
+
+        threading.Thread(target=read_frames, name="stream-reader", daemon=True).start()
+        while True:
+            try:
+                item = pending.get(timeout=0.5)
+            except queue.Empty:
+                # After a cancel the reader cannot queue its sentinel, so check the call itself
+                if not context.is_active():
+                    return
+                continue
+            if item is None:
+                return
+            if isinstance(item, AdmissionRejected):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(item))
+            request_id, cache_key, future = item
+            try:
+                outcome = future.result()
+                if isinstance(outcome, agriml_pb2.DiseasePrediction):
+                    prediction = outcome
+                else:
+                    prediction = self.finish_prediction(cache_key, outcome)
+                prediction.request_id = request_id
+                yield prediction
+            except Exception as e:
+                yield agriml_pb2.DiseasePrediction(request_id=request_id, error=str(e))
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    agriml_pb2_grpc.add_CropDiseaseDetectionServiceServicer_to_server(CropDiseaseDetectionServicer(), server)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=SERVER_THREADS),
+                         maximum_concurrent_rpcs=SERVER_THREADS)
+    servicer = CropDiseaseDetectionServicer()
+    agriml_pb2_grpc.add_CropDiseaseDetectionServiceServicer_to_server(servicer, server)
+
+    # Report NOT_SERVING to health checks until warmup has finished
+    health_servicer = health.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+    for name in ("", SERVICE_NAME):
+        health_servicer.set(name, health_pb2.HealthCheckResponse.NOT_SERVING)
+
     server.add_insecure_port('[::]:50053')
     server.start()
-    print("CropDiseaseDetectionService server started on port 50053.")
+    print("CropDiseaseDetectionService server started on port 50053, warming up.")
+    servicer.warmup()
+    for name in ("", SERVICE_NAME):
+        health_servicer.set(name, health_pb2.HealthCheckResponse.SERVING)
+    print("CropDiseaseDetectionService ready.")
     try:
         while True:
-            time.sleep(_ONE_DAY_IN_SECONDS)
+            time.sleep(STATS_INTERVAL_SECONDS)
+            print(f"CNN batching stats: {servicer.batcher.stats()}")
+            print(f"Result cache stats: {servicer.result_cache.stats()}")
+            print(f"Admission stats: {servicer.admission.stats()}")
     except KeyboardInterrupt:
+        health_servicer.enter_graceful_shutdown()
         server.stop(0)
+        servicer.batcher.close()
+        servicer.preprocessor.close()
 
 if __name__ == '__main__':
     serve()
@@ -4,33 +4,177 @@ Provides Kafka producer and consumer for real-time data streaming.
 """
 
 from kafka import KafkaProducer, KafkaConsumer
-import json
+from kafka.structs import OffsetAndMetadata
+import numpy as np
+import os
+from itertools import chain
+from operator import attrgetter
+
+try:
+    from .kafka_serializers import CONTENT_TYPE_HEADER, JsonSerializer, RecordDecoder, default_serializers
+except ImportError:
+    from kafka_serializers import CONTENT_TYPE_HEADER, JsonSerializer, RecordDecoder, default_serializers
+
+# Producer batching: wait up to LINGER_MS for a partition batch to fill up to BATCH_SIZE bytes
+LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "20"))
+BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", str(64 * 1024)))
+# gzip needs no extra packages; lz4, snappy and zstd need their Python codecs installed
+COMPRESSION_TYPE = os.getenv("KAFKA_COMPRESSION_TYPE", "gzip") or None
+# Flush after every send, so each send_message blocks until the broker acknowledges it
+SYNC_SEND = os.getenv("KAFKA_SYNC_SEND", "false").lower() in ("1", "true", "yes")
+# "protobuf" sends the sensor topics in kafka_serializers.TOPIC_SCHEMAS as protobuf; others stay JSON
+WIRE_FORMAT = os.getenv("KAFKA_WIRE_FORMAT", "json")
+# consume_batches polls for up to BATCH_MAX_RECORDS records or BATCH_TIMEOUT_MS milliseconds
+BATCH_MAX_RECORDS = int(os.getenv("KAFKA_BATCH_MAX_RECORDS", "500"))
+BATCH_TIMEOUT_MS = int(os.getenv("KAFKA_BATCH_TIMEOUT_MS", "100"))
+
+# Columns and dtypes decoded by consume_batches for the sensor topics
+BATCH_COLUMNS = {
+    "soil_moisture": [("device_id", str), ("timestamp", np.int64), ("moisture_level", np.float64),
+                      ("temperature", np.float64), ("ph_level", np.float64)],
+    "weather_data": [("timestamp", np.int64), ("temperature", np.float64), ("humidity", np.float64),
+                     ("rainfall", np.float64), ("wind_speed", np.float64)]
+}
+
+_value = attrgetter("value")
+_headers = attrgetter("headers")
+
+def commit_offset(offset):
+    # kafka-python 2.1+ added leader_epoch to OffsetAndMetadata
+    if "leader_epoch" in OffsetAndMetadata._fields:
+        return OffsetAndMetadata(offset, "", -1)
+    return OffsetAndMetadata(offset, "")
+
+class RecordBatch:
+    """
+    Records from one poll decoded into columnar NumPy arrays, e.g.
+    batch["moisture_level"]. Offsets are committed only by ack().
+    """
+    def __init__(self, consumer, columns, offsets):
+        self.consumer = consumer
+        self.columns = columns
+        self.offsets = offsets
+        self.acked = False
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def ack(self):
+        """Commit the batch's offsets once the caller has processed it."""
+        self.consumer.commit({tp: commit_offset(last + 1) for tp, (_, last) in self.offsets.items()})
+        self.acked = True
 
 class KafkaClient:
-    def __init__(self, bootstrap_servers='localhost:9092'):
-        self.producer = KafkaProducer(
-            bootstrap_servers=bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8')
-        )
+    def __init__(self, bootstrap_servers='localhost:9092', sync=SYNC_SEND, linger_ms=LINGER_MS,
+                 batch_size=BATCH_SIZE, compression_type=COMPRESSION_TYPE, producer=None,
+                 wire_format=WIRE_FORMAT, serializers=None):
+        """
+        By default sends are asynchronous: records are batched per partition
+        for up to linger_ms and compressed, and send_message returns a future.
+        sync=True restores the flush-per-message behaviour for callers that
+        need delivery before send_message returns.
+        serializers maps topic names to serializers (see kafka_serializers);
+        by default they follow wire_format, and unlisted topics use JSON.
+        """
+        if producer is None:
+            producer = KafkaProducer(
+                bootstrap_servers=bootstrap_servers,
+                linger_ms=linger_ms,
+                batch_size=batch_size,
+                compression_type=compression_type
+            )
+        self.producer = producer
+        self.serializers = default_serializers(wire_format) if serializers is None else dict(serializers)
+        self.json_serializer = JsonSerializer()
+        self.decoder = RecordDecoder()
+        self.sync = sync
         self.consumer = None
         self.bootstrap_servers = bootstrap_servers
+        self.failed = 0
+
+    def send_message(self, topic, message, key=None, on_delivery=None, on_error=None, sync=None):
+        """
+        Queue message for topic and return the producer future, which resolves
+        to the record metadata. on_delivery(metadata) and on_error(exception)
+        run on the producer's I/O thread; without on_error, failures are
+        counted and logged. sync overrides the client default for this call.
+        """
+        serializer = self.serializers.get(topic, self.json_serializer)
+        future = self.producer.send(topic, serializer.serialize(message), key=key,
+                                    headers=[(CONTENT_TYPE_HEADER, serializer.header)])
+        if on_delivery is not None:
+            future.add_callback(on_delivery)
+        future.add_errback(on_error if on_error is not None else self._log_failure)
+        if self.sync if sync is None else sync:
+            self.producer.flush()
+        return future
+
+    def _log_failure(self, exception):
+        self.failed += 1
+        print(f"Kafka delivery failed: {exception}")
 
-    def send_message(self, topic, message):
-        self.producer.send(topic, message)
-        self.producer.flush()
+    def flush(self, timeout=None):
+        """Block until every queued message has been delivered or has failed."""
+        self.producer.flush(timeout)
 
-    def start_consumer(self, topic, group_id='agriml-group'):
+    def close(self, timeout=None):
+        """Flush pending messages and close the producer and any consumer."""
+        self.producer.close(timeout)
+        if self.consumer is not None:
+            self.consumer.close()
+            self.consumer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start_consumer(self, topic, group_id='agriml-group', enable_auto_commit=True):
         self.consumer = KafkaConsumer(
             topic,
             bootstrap_servers=self.bootstrap_servers,
             auto_offset_reset='earliest',
-            enable_auto_commit=True,
-            group_id=group_id,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8'))
+            enable_auto_commit=enable_auto_commit,
+            group_id=group_id
         )
         return self.consumer
 
     def consume_messages(self, topic, group_id='agriml-group'):
         consumer = self.start_consumer(topic, group_id)
         for message in consumer:
-            yield message.value
+            # Decoded per record, as the format can change mid-topic during a migration
+            yield self.decoder.decode(message.value, message.headers)
+
+    def consume_batches(self, topic, group_id='agriml-group', max_records=BATCH_MAX_RECORDS,
+                        timeout_ms=BATCH_TIMEOUT_MS, columns=None, redeliver=True):
+        """
+        Yield RecordBatch objects of up to max_records records, or whatever
+        arrived within timeout_ms, decoded straight into one NumPy array per
+        column (see RecordDecoder.decode_columns). columns is a list of
+        (name, dtype) and defaults to BATCH_COLUMNS for the topic. Auto-commit
+        is off: call batch.ack() after processing. A batch that was not acked
+        when the next one is requested is delivered again, giving
+        at-least-once processing. With redeliver=False polling moves on and
+        the caller acks batches later, once their results are durable.
+        """
+        columns = columns or BATCH_COLUMNS.get(topic)
+        if columns is None:
+            raise ValueError(f"No batch columns known for topic {topic!r}")
+        consumer = self.start_consumer(topic, group_id, enable_auto_commit=False)
+        while True:
+            polled = consumer.poll(timeout_ms=timeout_ms, max_records=max_records)
+            records = list(chain.from_iterable(polled.values()))
+            if not records:
+                continue
+            batch = RecordBatch(consumer, self.decoder.decode_columns(
+                list(map(_value, records)), list(map(_headers, records)), columns
+            ), {tp: (partition_records[0].offset, partition_records[-1].offset)
+                for tp, partition_records in polled.items() if partition_records})
+            yield batch
+            if redeliver and not batch.acked:
+                for tp, (first, _) in batch.offsets.items():
+                    consumer.seek(tp, first)
@@ -0,0 +1,264 @@
+"""
+Online trend and anomaly estimators for per-sensor series.
+SensorStats keeps a fixed amount of state per sensor, in flat NumPy arrays
+indexed by slot, so each reading costs O(1) however long the history is:
+- a running least-squares fit of value over time (weighted mean and co-moments,
+  updated Welford style), whose slope is what soil_moisture_trend and
+  temperature_trend_modeling get from np.polyfit over the whole history, and
+  whose mean is what temperature_anomaly_detection gets from np.mean;
+- an EWMA mean and variance, giving each new reading a z-score against the
+  sensor's recent behaviour.
+With half_life set, older readings are exponentially down-weighted in the
+least-squares fit, so the trend follows recent readings.
+YieldEstimator keeps per-field linear yield coefficients up to date with
+recursive least squares instead of refitting every season's rows the way
+crop_yield_prediction does.
+"""
+
+import abc
+import json
+
+import numpy as np
+
+# Per-slot state arrays: reading count, last time, least-squares weight, means
+# and co-moments, EWMA mean and variance
+_FIELDS = ("count", "last_t", "weight", "mean_t", "mean_v", "c_tt", "c_tv", "ewma", "ewma_var")
+
+def _rounds(slots):
+    """
+    Split the positions of a batch into rounds that touch each slot at most
+    once, so readings of the same sensor are applied in input order.
+    """
+    n = len(slots)
+    order = np.argsort(slots, kind="stable")
+    sorted_slots = slots[order]
+    first = np.ones(n, dtype=bool)
+    first[1:] = sorted_slots[1:] != sorted_slots[:-1]
+    rank = np.arange(n) - np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    if n == 0 or rank.max() == 0:
+        return [order]
+    by_rank = order[np.argsort(rank, kind="stable")]
+    return np.split(by_rank, np.cumsum(np.bincount(rank))[:-1])
+
+class _SlotTable(abc.ABC):
+    """
+    Per-key state in NumPy arrays whose first axis is the slot; keys are
+    mapped to slots on first sight and the arrays grow by doubling.
+    """
+    def __init__(self, shapes, capacity):
+        self.size = 0
+        self._keys = []
+        self._slots = {}
+        self._state = {name: np.zeros((capacity,) + shape, dtype=dtype) for name, (shape, dtype) in shapes.items()}
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, size):
+        capacity = len(next(iter(self._state.values())))
+        if size <= capacity:
+            return
+        capacity = max(2 * capacity, size)
+        for name, old in self._state.items():
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            self._state[name] = new
+
+    def _init_slots(self, slots):
+        pass
+
+    def slots(self, keys, create=False):
+        """
+        Slots of an array of ids, with -1 for unknown ids unless create is
+        set. Each distinct id is looked up once.
+        """
+        names, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        found = np.fromiter((self._slots.get(name, -1) for name in names.tolist()), dtype=np.int64,
+                            count=len(names))
+        if create:
+            new = np.flatnonzero(found < 0)
+            if len(new):
+                self._grow(self.size + len(new))
+                found[new] = np.arange(self.size, self.size + len(new))
+                for name, slot in zip(names[new].tolist(), range(self.size, self.size + len(new))):
+                    self._slots[name] = slot
+                    self._keys.append(name)
+                self.size += len(new)
+                self._init_slots(found[new])
+        return found[inverse.reshape(-1)]
+
+    def _known(self, keys):
+        slots = self.slots(keys)
+        if (slots < 0).any():
+            raise KeyError(f"Unknown ids: {np.asarray(keys)[slots < 0][:5].tolist()}")
+        return slots
+
+    @abc.abstractmethod
+    def _config(self):
+        """Constructor arguments that restore() passes back, besides capacity."""
+
+    def snapshot(self):
+        """Copy of the state as a dict of arrays, for restore() or save()."""
+        snapshot = {name: values[:self.size].copy() for name, values in self._state.items()}
+        snapshot["keys"] = np.asarray(self._keys)
+        snapshot["config"] = np.array(json.dumps(self._config()))
+        return snapshot
+
+    @classmethod
+    def restore(cls, snapshot):
+        keys = snapshot["keys"].tolist()
+        table = cls(capacity=max(len(keys), 1), **json.loads(str(snapshot["config"])))
+        table.size = len(keys)
+        for name in table._state:
+            table._state[name][:table.size] = snapshot[name]
+        table._keys = keys
+        table._slots = {key: slot for slot, key in enumerate(keys)}
+        return table
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, **self.snapshot())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.restore(data)
+
+class SensorStats(_SlotTable):
+    def __init__(self, alpha=0.1, half_life=None, warmup=5, capacity=1024):
+        """
+        alpha is the EWMA smoothing factor per reading. half_life (in time
+        units, None for no decay) down-weights old readings in the trend fit.
+        Readings get a z-score of 0 until their sensor has warmup readings.
+        """
+        super().__init__({name: ((), np.int64 if name == "count" else np.float64) for name in _FIELDS}, capacity)
+        self.alpha = alpha
+        self.half_life = half_life
+        self.warmup = warmup
+
+    def _config(self):
+        return {"alpha": self.alpha, "half_life": self.half_life, "warmup": self.warmup}
+
+    def update(self, sensors, values, times=None):
+        """
+        Add one reading per row and return each reading's z-score against its
+        sensor's EWMA state before the reading (NaN for missing values). times
+        defaults to each sensor's reading count, i.e. the history index that
+        np.polyfit(range(len(history)), history, 1) uses.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        slots = self.slots(sensors, create=True)
+        z = np.full(len(values), np.nan)
+        valid = np.flatnonzero(~np.isnan(values))
+        s = self._state
+        for idx in _rounds(slots[valid]):
+            idx = valid[idx]
+            slot = slots[idx]
+            v = values[idx]
+            count = s["count"][slot]
+            t = count.astype(np.float64) if times is None else np.asarray(times, dtype=np.float64)[idx]
+
+            # Least-squares state, decayed by the time since the sensor's last reading
+            weight, c_tt, c_tv = s["weight"][slot], s["c_tt"][slot], s["c_tv"][slot]
+            if self.half_life:
+                decay = np.where(count > 0, 0.5 ** ((t - s["last_t"][slot]) / self.half_life), 1.0)
+                weight, c_tt, c_tv = weight * decay, c_tt * decay, c_tv * decay
+            weight = weight + 1
+            dt = t - s["mean_t"][slot]
+            dv = v - s["mean_v"][slot]
+            mean_t = s["mean_t"][slot] + dt / weight
+            mean_v = s["mean_v"][slot] + dv / weight
+            s["c_tt"][slot] = c_tt + dt * (t - mean_t)
+            s["c_tv"][slot] = c_tv + dt * (v - mean_v)
+            s["weight"][slot], s["mean_t"][slot], s["mean_v"][slot] = weight, mean_t, mean_v
+
+            # EWMA state; the first reading of a sensor initialises it
+            ewma, ewma_var = s["ewma"][slot], s["ewma_var"][slot]
+            std = np.sqrt(ewma_var)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                z[idx] = np.where((count >= self.warmup) & (std > 0), (v - ewma) / std, 0.0)
+            diff = np.where(count > 0, v - ewma, 0.0)
+            increment = self.alpha * diff
+            s["ewma"][slot] = np.where(count > 0, ewma + increment, v)
+            s["ewma_var"][slot] = (1 - self.alpha) * (ewma_var + diff * increment)
+            s["last_t"][slot] = t
+            s["count"][slot] = count + 1
+        return z
+
+    def slope(self, sensors):
+        """Least-squares slope of value over time per sensor (0 with fewer than two distinct times)."""
+        slots = self._known(sensors)
+        c_tt = self._state["c_tt"][slots]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(c_tt > 0, self._state["c_tv"][slots] / c_tt, 0.0)
+
+    def mean(self, sensors):
+        """Mean of the readings per sensor (weighted by decay when half_life is set)."""
+        return self._state["mean_v"][self._known(sensors)]
+
+    def ewma(self, sensors):
+        """(mean, std) of the EWMA state per sensor."""
+        slots = self._known(sensors)
+        return self._state["ewma"][slots], np.sqrt(self._state["ewma_var"][slots])
+
+    def count(self, sensors):
+        return self._state["count"][self._known(sensors)]
+
+class YieldEstimator(_SlotTable):
+    def __init__(self, n_features, forgetting=1.0, delta=1e4, capacity=1024):
+        """
+        Linear yield model per field, updated by recursive least squares.
+        forgetting (0 < forgetting <= 1) multiplies the weight of past rows at
+        every new row, so 0.9 lets a field's model follow changing conditions.
+        delta is the initial coefficient covariance; larger values trust the
+        first rows more, approaching the np.linalg.lstsq fit.
+        """
+        if not 0 < forgetting <= 1:
+            raise ValueError("forgetting must be in (0, 1]")
+        super().__init__({"coef": ((n_features,), np.float64), "cov": ((n_features, n_features), np.float64),
+                          "rows": ((), np.int64)}, capacity)
+        self.n_features = n_features
+        self.forgetting = forgetting
+        self.delta = delta
+
+    def _config(self):
+        return {"n_features": self.n_features, "forgetting": self.forgetting, "delta": self.delta}
+
+    def _init_slots(self, slots):
+        self._state["cov"][slots] = self.delta * np.eye(self.n_features)
+
+    def update(self, fields, features, yields):
+        """
+        Add one (features, yield) row per entry; rows of the same field are
+        applied in order. Returns each row's prediction error before its update.
+        """
+        features = np.asarray(features, dtype=np.float64).reshape(-1, self.n_features)
+        yields = np.asarray(yields, dtype=np.float64)
+        slots = self.slots(fields, create=True)
+        errors = np.empty(len(yields))
+        coef_all, cov_all = self._state["coef"], self._state["cov"]
+        for idx in _rounds(slots):
+            slot = slots[idx]
+            x = features[idx]
+            coef, cov = coef_all[slot], cov_all[slot]
+            px = np.einsum("nij,nj->ni", cov, x)
+            gain = px / (self.forgetting + np.einsum("ni,ni->n", x, px))[:, None]
+            error = yields[idx] - np.einsum("ni,ni->n", x, coef)
+            coef_all[slot] = coef + gain * error[:, None]
+            cov = (cov - gain[:, :, None] * px[:, None, :]) / self.forgetting
+            # Keep the covariance symmetric against rounding drift
+            cov_all[slot] = 0.5 * (cov + cov.transpose(0, 2, 1))
+            errors[idx] = error
+        np.add.at(self._state["rows"], slots, 1)
+        return errors
+
+    def coefficients(self, fields):
+        return self._state["coef"][self._known(fields)].copy()
+
+    def predict(self, fields, features):
+        """Predicted yield for one feature row per field, in one call."""
+        features = np.asarray(features, dtype=np.float64).reshape(-1, self.n_features)
+        return np.einsum("ni,ni->n", self._state["coef"][self._known(fields)], features)
+
+    def rows(self, fields):
+        return self._state["rows"][self._known(fields)]
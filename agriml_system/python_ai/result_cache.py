@@ -0,0 +1,130 @@
+"""
+Content-addressed result cache for crop disease predictions.
+Field devices re-upload the same frames after retries and reconnects, so
+results are cached under a BLAKE2b hash of the image bytes, crop type, model
+version and KNN reference index version. An in-memory LRU bounded by entry
+count and bytes sits in front of an optional SQLite store that several server
+processes can share.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class ResultCache:
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, model_version="v1",
+                 disk_path=None, disk_max_entries=1000000):
+        """
+        Values are opaque bytes (e.g. a serialized DiseasePrediction), which keeps
+        the memory accounting exact. With disk_path set, entries are also written
+        to a SQLite database there so other processes on the host can reuse them.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.model_version = model_version
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._connection()
+
+    def key(self, image_data, crop_type="", index_version=""):
+        """
+        Cache key for an image; index_version (e.g. EmbeddingIndex.version)
+        changes whenever labelled references are added, so KNN results from
+        an older index are not served.
+        """
+        digest = hashlib.blake2b(image_data, digest_size=16)
+        for part in (crop_type, self.model_version, index_version):
+            digest.update(b"\0" + part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.disk_path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL)")
+            # Pruning walks rows by age
+            connection.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.disk_path:
+            row = self._connection().execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value = bytes(row[0])
+                self._put_memory(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._put_memory(key, value)
+        if self.disk_path:
+            connection = self._connection()
+            connection.execute("INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                               (key, value, time.time()))
+            with self._lock:
+                self._disk_writes += 1
+                prune = self._disk_writes % 1000 == 0
+            if prune:
+                self._prune_disk(connection)
+
+    def _put_memory(self, key, value):
+        if len(value) > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _prune_disk(self, connection):
+        # Drop the oldest rows once the shared store outgrows its cap
+        connection.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
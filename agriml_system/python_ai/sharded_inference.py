@@ -0,0 +1,316 @@
+"""
+Multi-process sharded inference over shared-memory ring buffers.
+The serving process decodes each image straight into a free slot of a
+worker's shared-memory ring and sends the worker only the slot number. The
+worker stacks whatever slots are queued into one batch, runs the model and
+sends back the small per-row results, so tensors never go through pickle.
+Workers are separate processes (spawned, as TensorFlow is not fork-safe) and
+can each be pinned to their own cores.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+def parse_cpu_sets(spec):
+    """
+    Parse per-worker CPU sets such as "0-1;2-3": workers are separated by
+    semicolons, and each set is a comma list of cores and ranges.
+    Returns a list of sets, empty for an empty spec.
+    """
+    cpu_sets = []
+    for worker_spec in (spec or "").split(";"):
+        cpus = set()
+        for part in worker_spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                first, last = part.split("-", 1)
+                cpus.update(range(int(first), int(last) + 1))
+            else:
+                cpus.add(int(part))
+        if cpus:
+            cpu_sets.append(cpus)
+    return cpu_sets
+
+def _worker_main(worker_id, shm_name, slots, input_shape, dtype, predictor_factory,
+                 requests, results, max_batch_size, cpus):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # Spawned workers share the parent's resource tracker, which unlinks the
+    # segment only when the parent does
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots,) + input_shape, dtype=dtype, buffer=shm.buf)
+    buffer = np.empty((max_batch_size,) + input_shape, dtype=dtype)
+    try:
+        predict_fn = predictor_factory()
+    except Exception as e:
+        results.send((worker_id, None, False, f"{type(e).__name__}: {e}"))
+        return
+    results.send((worker_id, None, True, os.getpid()))
+
+    stopping = False
+    while not stopping:
+        slot = requests.get()
+        if slot is None:
+            break
+        batch_slots = [slot]
+        while len(batch_slots) < max_batch_size:
+            try:
+                slot = requests.get_nowait()
+            except queue.Empty:
+                break
+            if slot is None:
+                stopping = True
+                break
+            batch_slots.append(slot)
+        try:
+            first = batch_slots[0]
+            if batch_slots == list(range(first, first + len(batch_slots))):
+                batch = ring[first:first + len(batch_slots)]
+            else:
+                batch = np.take(ring, batch_slots, axis=0, out=buffer[:len(batch_slots)])
+            outputs = list(predict_fn(batch))
+            if len(outputs) != len(batch_slots):
+                raise ValueError(f"predict_fn returned {len(outputs)} results for {len(batch_slots)} inputs")
+            results.send((worker_id, batch_slots, True, outputs))
+        except Exception as e:
+            results.send((worker_id, batch_slots, False, f"{type(e).__name__}: {e}"))
+    del ring
+    shm.close()
+
+class WorkerUnavailable(RuntimeError):
+    pass
+
+class _Worker:
+    def __init__(self, worker_id, slots, input_shape, dtype, cpus):
+        self.worker_id = worker_id
+        self.cpus = cpus
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=max(1, slots * int(np.prod(input_shape)) * np.dtype(dtype).itemsize))
+        self.ring = np.ndarray((slots,) + input_shape, dtype=dtype, buffer=self.shm.buf)
+        self.free_slots = list(range(slots))
+        self.pending = {}
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.pid = None
+        self.error = None
+        self.batches = 0
+        self.items = 0
+
+class ShardedInference:
+    def __init__(self, predictor_factory, input_shape, num_workers=2, slots_per_worker=64,
+                 max_batch_size=32, cpu_sets=None, dtype=np.float32, name="inference-worker"):
+        """
+        predictor_factory is a picklable callable run once in each worker; it
+        returns a predict_fn taking a stacked batch and returning one result
+        per row, as for MicroBatcher. Results must be small picklable values.
+        cpu_sets optionally gives each worker (by index) the cores to pin to.
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        self.input_shape = tuple(input_shape)
+        self.dtype = np.dtype(dtype)
+        self.max_batch_size = max_batch_size
+        cpu_sets = list(cpu_sets or [])
+        context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        # Notified whenever a slot is freed or a worker stops
+        self._slots_changed = threading.Condition(self._lock)
+        self._ready = threading.Event()
+        self._closed = False
+        self._workers = []
+        for worker_id in range(num_workers):
+            worker = _Worker(worker_id, slots_per_worker, self.input_shape, self.dtype,
+                             cpu_sets[worker_id] if worker_id < len(cpu_sets) else None)
+            worker.requests = context.Queue()
+            # A pipe per worker: a worker killed mid-send cannot block the others' results,
+            # as it could while holding the write lock of a shared queue
+            worker.results, results = context.Pipe(duplex=False)
+            worker.process = context.Process(
+                target=_worker_main, name=f"{name}-{worker_id}", daemon=True,
+                args=(worker_id, worker.shm.name, slots_per_worker, self.input_shape, self.dtype.str,
+                      predictor_factory, worker.requests, results, max_batch_size, worker.cpus))
+            worker.process.start()
+            # Only the worker holds the write end, so its exit shows up as end of file
+            results.close()
+            self._workers.append(worker)
+        self._collector = threading.Thread(target=self._collect, name=f"{name}-results", daemon=True)
+        self._collector.start()
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until every worker has built its predictor. Raises RuntimeError if
+        a worker failed to start and TimeoutError if timeout expires first.
+        """
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Inference workers did not start in time")
+        failed = [f"worker {w.worker_id}: {w.error}" for w in self._workers if w.error]
+        if failed:
+            raise RuntimeError("Inference workers failed to start: " + "; ".join(failed))
+
+    def submit_into(self, fill, timeout=None):
+        """
+        Reserve a free ring slot on the least loaded live worker, call
+        fill(slot_array) to write one input into shared memory in place, and
+        queue it for inference. Returns a Future for its result. Blocks while
+        every live worker's ring is full, raising TimeoutError after timeout
+        and WorkerUnavailable once no worker is left; if the chosen worker
+        stops before the input is queued, fill is called again on another.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            worker, slot = self._acquire_slot(deadline)
+            try:
+                fill(worker.ring[slot])
+            except BaseException:
+                self._release_slots(worker, [slot])
+                raise
+            future = Future()
+            with self._lock:
+                if worker.error is None:
+                    worker.pending[slot] = future
+                    break
+        worker.requests.put(slot)
+        return future
+
+    def _acquire_slot(self, deadline):
+        with self._slots_changed:
+            while True:
+                if self._closed:
+                    raise RuntimeError("ShardedInference is closed")
+                live = [w for w in self._workers if w.error is None]
+                if not live:
+                    raise WorkerUnavailable("No inference worker is running")
+                free = [w for w in live if w.free_slots]
+                if free:
+                    worker = min(free, key=lambda w: len(w.pending))
+                    return worker, worker.free_slots.pop()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No free inference slot before the timeout")
+                self._slots_changed.wait(remaining)
+
+    def _release_slots(self, worker, slots):
+        with self._slots_changed:
+            worker.free_slots.extend(slots)
+            self._slots_changed.notify_all()
+
+    def submit(self, x, timeout=None):
+        """Copy one input (without a batch axis) into a ring slot; returns a Future."""
+        return self.submit_into(lambda out: np.copyto(out, x), timeout)
+
+    def predict(self, x, timeout=None):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(x).result(timeout)
+
+    def _collect(self):
+        open_results = {w.results: w for w in self._workers}
+        while open_results:
+            ready = multiprocessing.connection.wait(list(open_results), timeout=1.0)
+            if not ready:
+                self._check_workers()
+                continue
+            for connection in ready:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # The worker exited, possibly in the middle of a message
+                    worker = open_results.pop(connection)
+                    worker.process.join(1.0)
+                    if worker.error is None and not self._closed:
+                        self._fail_worker(worker, f"exited with code {worker.process.exitcode}")
+                    self._update_ready()
+                    continue
+                self._handle_result(message)
+
+    def _handle_result(self, message):
+        worker_id, slots, ok, payload = message
+        worker = self._workers[worker_id]
+        if slots is None:
+            # Startup report
+            if ok:
+                worker.pid = payload
+            else:
+                self._fail_worker(worker, payload)
+            self._update_ready()
+            return
+        with self._lock:
+            # Futures of a worker marked failed were already completed
+            finished = [worker.pending.pop(slot, None) for slot in slots]
+            worker.batches += 1
+            worker.items += len(slots)
+        self._release_slots(worker, slots)
+        for i, future in enumerate(finished):
+            if future is None:
+                continue
+            if ok:
+                future.set_result(payload[i])
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        for worker in self._workers:
+            if worker.error is None and not worker.process.is_alive() and not self._closed:
+                self._fail_worker(worker, f"exited with code {worker.process.exitcode}")
+        self._update_ready()
+
+    def _update_ready(self):
+        # Ready once every worker has either started or failed
+        if all(w.pid is not None or w.error is not None for w in self._workers):
+            self._ready.set()
+
+    def _fail_worker(self, worker, error):
+        with self._slots_changed:
+            worker.error = error
+            pending, worker.pending = worker.pending, {}
+            # Callers waiting for a slot move to the remaining workers or give up
+            self._slots_changed.notify_all()
+        for future in pending.values():
+            future.set_exception(WorkerUnavailable(f"Inference worker {worker.worker_id} stopped: {error}"))
+
+    def stats(self):
+        with self._lock:
+            workers = [{
+                "worker": w.worker_id,
+                "pid": w.pid,
+                "cpus": sorted(w.cpus) if w.cpus else None,
+                "alive": w.error is None,
+                "in_flight": len(w.pending),
+                "batches": w.batches,
+                "items": w.items,
+                "mean_batch_size": w.items / w.batches if w.batches else 0.0
+            } for w in self._workers]
+        return {"workers": workers, "items": sum(w["items"] for w in workers)}
+
+    def close(self, timeout=None):
+        """Stop the workers after their queued work and release the shared memory."""
+        with self._slots_changed:
+            if self._closed:
+                return
+            self._closed = True
+            self._slots_changed.notify_all()
+        for worker in self._workers:
+            worker.requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        # The collector returns once every worker's pipe has reached end of file
+        self._collector.join(timeout)
+        for worker in self._workers:
+            self._fail_worker(worker, "closed")
+            worker.results.close()
+            del worker.ring
+            worker.shm.close()
+            worker.shm.unlink()
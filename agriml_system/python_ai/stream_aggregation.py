@@ -0,0 +1,279 @@
+"""
+Windowed aggregation over the soil_moisture and weather_data Kafka topics.
+Records are bucketed per device into tumbling or sliding event-time windows.
+Each open window keeps running count/sum/min/max and least-squares sums per
+field, so memory depends on the number of open windows, not on the number of
+records. A watermark (latest event time minus allowed lateness) closes
+windows; records that only belong to already closed windows are dropped as
+late. On closure a window emits mean/min/max/slope per field and runs the
+drought and soil moisture trend analyses on that window.
+"""
+
+import heapq
+import os
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# Row layout of the per-window accumulator array (one column per field)
+_COUNT, _SUM, _MIN, _MAX, _SUM_T, _SUM_TT, _SUM_TV = range(7)
+
+SOIL_FIELDS = ["moisture_level", "temperature", "ph_level"]
+WEATHER_FIELDS = ["temperature", "humidity", "rainfall", "wind_speed"]
+
+class WindowAggregator:
+    def __init__(self, fields, size, slide=None, allowed_lateness=0, key_field="device_id",
+                 time_field="timestamp", drought_fn=None, trend_fn=None, trend_windows=6, max_keys=10000):
+        """
+        size, slide and allowed_lateness are in the units of time_field; slide
+        defaults to size (tumbling windows) and must divide it. key_field=None
+        aggregates all records under one key. drought_fn takes
+        {"soil_moisture": [...], "temperature": [...]} like
+        weather_models.drought_forecasting; trend_fn takes a moisture series
+        like advanced_features.soil_moisture_trend and is given the means of
+        the last trend_windows closed windows of the device. Keys beyond
+        max_keys evict the least recently updated one.
+        """
+        slide = size if slide is None else slide
+        if size <= 0 or slide <= 0 or size % slide:
+            raise ValueError("size and slide must be positive, with slide dividing size")
+        self.fields = list(fields)
+        self.size = size
+        self.slide = slide
+        self.allowed_lateness = allowed_lateness
+        self.key_field = key_field
+        self.time_field = time_field
+        self.drought_fn = drought_fn
+        self.trend_fn = trend_fn
+        self.max_keys = max_keys
+        self.trend_windows = trend_windows
+        self.watermark = None
+        # Accumulators of all open windows live in one array; _windows maps (key, start) to a row
+        self._acc = np.empty((64, 7, len(self.fields)))
+        self._free = list(range(63, -1, -1))
+        self._windows = {}
+        # Open window starts per key, so evicting a key touches only its own windows
+        self._key_windows = {}
+        # (end, key, start) of every window in _scheduled; entries of evicted windows go stale
+        self._closing = []
+        self._scheduled = set()
+        self._keys = OrderedDict()
+        self.late_records = 0
+        self.evicted_keys = 0
+
+    def _slot(self, window):
+        slot = self._windows.get(window)
+        return self._allocate(window) if slot is None else slot
+
+    def _allocate(self, window):
+        if not self._free:
+            capacity = len(self._acc)
+            grown = np.empty((2 * capacity,) + self._acc.shape[1:])
+            grown[:capacity] = self._acc
+            self._acc = grown
+            self._free = list(range(2 * capacity - 1, capacity - 1, -1))
+        slot = self._free.pop()
+        self._acc[slot] = 0.0
+        self._acc[slot, _MIN] = np.inf
+        self._acc[slot, _MAX] = -np.inf
+        self._windows[window] = slot
+        self._key_windows.setdefault(window[0], set()).add(window[1])
+        # A window reopened after its key was evicted still has its heap entry
+        if window not in self._scheduled:
+            self._scheduled.add(window)
+            heapq.heappush(self._closing, (window[1] + self.size, window[0], window[1]))
+        return slot
+
+    def _release(self, window):
+        self._free.append(self._windows.pop(window))
+        starts = self._key_windows[window[0]]
+        starts.discard(window[1])
+        if not starts:
+            del self._key_windows[window[0]]
+
+    def process(self, columns):
+        """
+        Add a batch of records given as columns (e.g. a RecordBatch from
+        KafkaClient.consume_batches) and return the windows it closed.
+        """
+        times = np.asarray(columns[self.time_field])
+        n = len(times)
+        if n == 0:
+            return []
+        keys = np.asarray(columns[self.key_field]) if self.key_field else np.full(n, "")
+        values = np.column_stack([np.asarray(columns[f], dtype=np.float64) for f in self.fields])
+
+        # Each record belongs to size/slide windows; expand to one row per (record, window)
+        per_record = self.size // self.slide
+        last_start = times // self.slide * self.slide
+        starts = (last_start[:, None] - self.slide * np.arange(per_record)).reshape(-1)
+        rows = np.repeat(np.arange(n), per_record)
+        open_rows = starts >= 0
+        if self.watermark is not None:
+            open_rows &= starts + self.size > self.watermark
+            self.late_records += int(np.count_nonzero(last_start + self.size <= self.watermark))
+        starts, rows = starts[open_rows], rows[open_rows]
+
+        if len(rows):
+            key_names, key_idx = np.unique(keys[rows], return_inverse=True)
+            groups, group_idx = np.unique(np.stack([key_idx, starts]), axis=1, return_inverse=True)
+            group_idx = group_idx.reshape(-1)
+            v = values[rows]
+            present = ~np.isnan(v)
+            v0 = np.where(present, v, 0.0)
+            # Times relative to the window start keep the least-squares sums well conditioned
+            t = np.where(present, (times[rows] - starts)[:, None].astype(np.float64), 0.0)
+            sums = np.zeros((len(groups[0]), 5, len(self.fields)))
+            for i, column in enumerate((present.astype(np.float64), v0, t, t * t, t * v0)):
+                np.add.at(sums[:, i], group_idx, column)
+            mins = np.full((len(groups[0]), len(self.fields)), np.inf)
+            maxs = np.full_like(mins, -np.inf)
+            np.minimum.at(mins, group_idx, np.where(present, v, np.inf))
+            np.maximum.at(maxs, group_idx, np.where(present, v, -np.inf))
+
+            for key in key_names:
+                self._touch(key)
+            names = key_names[groups[0]].tolist()
+            slots = np.array([self._slot(window) for window in zip(names, groups[1].tolist())])
+            acc = self._acc[slots]
+            acc[:, [_COUNT, _SUM, _SUM_T, _SUM_TT, _SUM_TV]] += sums
+            np.minimum(acc[:, _MIN], mins, out=acc[:, _MIN])
+            np.maximum(acc[:, _MAX], maxs, out=acc[:, _MAX])
+            self._acc[slots] = acc
+
+        watermark = int(times.max()) - self.allowed_lateness
+        if self.watermark is None or watermark > self.watermark:
+            self.watermark = watermark
+        return self._close(self.watermark)
+
+    def closes_at(self, times):
+        """
+        Watermark at which every window holding records at times has closed
+        and been returned, e.g. to commit a batch only once it is emitted.
+        """
+        return int(np.max(np.asarray(times)) // self.slide * self.slide) + self.size
+
+    def flush(self):
+        """Close and return every open window, e.g. at the end of a stream."""
+        return self._close(None)
+
+    def _touch(self, key):
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return
+        self._keys[key] = deque(maxlen=self.trend_windows)
+        if len(self._keys) > self.max_keys:
+            evicted, _ = self._keys.popitem(last=False)
+            self.evicted_keys += 1
+            for start in list(self._key_windows.get(evicted, ())):
+                self._release((evicted, start))
+            if len(self._closing) > 2 * len(self._windows) + 64:
+                # Drop the heap entries of evicted windows once they dominate the heap
+                self._closing = [entry for entry in self._closing if (entry[1], entry[2]) in self._windows]
+                heapq.heapify(self._closing)
+                self._scheduled = {(key, start) for _, key, start in self._closing}
+
+    def _close(self, watermark):
+        closed = []
+        while self._closing and (watermark is None or self._closing[0][0] <= watermark):
+            end, key, start = heapq.heappop(self._closing)
+            self._scheduled.discard((key, start))
+            slot = self._windows.get((key, start))
+            if slot is not None:
+                closed.append(self._summarize(key, start, end, self._acc[slot]))
+                self._release((key, start))
+        return closed
+
+    def _summarize(self, key, start, end, acc):
+        count = acc[_COUNT]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = acc[_SUM] / count
+            # Least-squares slope of value over time within the window
+            slope = (count * acc[_SUM_TV] - acc[_SUM_T] * acc[_SUM]) / (count * acc[_SUM_TT] - acc[_SUM_T] ** 2)
+        fields = {}
+        for i, name in enumerate(self.fields):
+            if count[i]:
+                fields[name] = {"count": int(count[i]), "mean": float(mean[i]), "min": float(acc[_MIN, i]),
+                                "max": float(acc[_MAX, i]),
+                                "slope": float(slope[i]) if np.isfinite(slope[i]) else 0.0}
+        result = {"key": str(key), "start": start, "end": end, "fields": fields}
+
+        moisture = fields.get("moisture_level")
+        if moisture is not None:
+            recent = self._keys.get(key)
+            if recent is not None:
+                recent.append(moisture["mean"])
+            if self.drought_fn is not None:
+                temperature = fields.get("temperature")
+                result["drought"] = self.drought_fn({
+                    "soil_moisture": [moisture["mean"]],
+                    "temperature": [temperature["mean"]] if temperature else [25]
+                })
+            if self.trend_fn is not None and recent is not None and len(recent) >= 2:
+                result["trend"] = self.trend_fn(list(recent))
+        return result
+
+    def stats(self):
+        return {
+            "open_windows": len(self._windows),
+            "keys": len(self._keys),
+            "watermark": self.watermark,
+            "late_records": self.late_records,
+            "evicted_keys": self.evicted_keys
+        }
+
+def default_analyses():
+    """
+    drought_forecasting and soil_moisture_trend from the model modules,
+    imported on first use since they pull in TensorFlow and Prophet.
+    """
+    from advanced_features import soil_moisture_trend
+    from weather_models import drought_forecasting
+    return drought_forecasting, soil_moisture_trend
+
+def run_stage(client, topic, aggregator, emit=print, output_topic=None, group_id="agriml-windows"):
+    """
+    Consume topic in batches, feed them to aggregator and pass each closed
+    window to emit (and to output_topic when set). A batch's offsets are
+    committed only once every window holding its records has been emitted,
+    and earlier batches first, so a restart replays the open windows.
+    """
+    try:
+        from .kafka_integration import RecordBatch
+    except ImportError:
+        from kafka_integration import RecordBatch
+    pending = deque()
+    for batch in client.consume_batches(topic, group_id=group_id, redeliver=False):
+        # Offsets only, so waiting batches do not keep their columns alive
+        pending.append((aggregator.closes_at(batch[aggregator.time_field]), batch.offsets))
+        for result in aggregator.process(batch.columns):
+            emit(result)
+            if output_topic:
+                client.send_message(output_topic, result)
+        emitted = {}
+        while pending and pending[0][0] <= aggregator.watermark:
+            emitted.update(pending.popleft()[1])
+        if emitted:
+            if output_topic:
+                client.flush()
+            RecordBatch(batch.consumer, {}, emitted).ack()
+
+def main():
+    try:
+        from .kafka_integration import KafkaClient
+    except ImportError:
+        from kafka_integration import KafkaClient
+    topic = os.getenv("WINDOW_TOPIC", "soil_moisture")
+    drought_fn, trend_fn = default_analyses()
+    aggregator = WindowAggregator(
+        SOIL_FIELDS if topic == "soil_moisture" else WEATHER_FIELDS,
+        size=int(os.getenv("WINDOW_SIZE", "300")),
+        slide=int(os.getenv("WINDOW_SLIDE", "0")) or None,
+        allowed_lateness=int(os.getenv("WINDOW_ALLOWED_LATENESS", "30")),
+        key_field="device_id" if topic == "soil_moisture" else None,
+        drought_fn=drought_fn, trend_fn=trend_fn)
+    with KafkaClient(os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")) as client:
+        run_stage(client, topic, aggregator, output_topic=os.getenv("WINDOW_OUTPUT_TOPIC") or None)
+
+if __name__ == '__main__':
+    main()
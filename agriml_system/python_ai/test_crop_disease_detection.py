@@ -14,5 +14,19 @@ def run():
 
     print(f"Disease: {response.disease_name}, Confidence: {response.confidence}")
 
+def run_stream(num_frames=10):
+    channel = grpc.insecure_channel('localhost:50053')
+    stub = agriml_pb2_grpc.CropDiseaseDetectionServiceStub(channel)
+
+    # Dummy frames tagged with client-side ids
+    frames = (agriml_pb2.CropImage(image_data=b'\x00' * (64 * 64 * 3), request_id=f"frame-{i}")
+              for i in range(num_frames))
+    for response in stub.DetectDiseaseStream(frames):
+        if response.error:
+            print(f"{response.request_id}: error {response.error}")
+        else:
+            print(f"{response.request_id}: Disease: {response.disease_name}, Confidence: {response.confidence}")
+
 if __name__ == '__main__':
     run()
+    run_stream()